@@ -0,0 +1,194 @@
+"""
+Admission control: cap in-flight requests per route class.
+
+Every endpoint is sync and runs on one shared threadpool, so a login storm
+(pbkdf2 burns CPU on purpose) can take every worker thread and stall reads
+that would take a millisecond. Requests are sorted into classes:
+
+  auth    /auth/*
+  export  POST /api/admin/backups   (online snapshots, which copy the db)
+  write   POST, PUT, PATCH, DELETE
+  read    everything else
+
+Each class runs at most `limit` requests at once. Up to `queue` more wait
+in FIFO order for at most ADMISSION_QUEUE_TIMEOUT seconds. Anything beyond
+that is shed at once with 503 and a Retry-After header, so clients back off
+instead of piling on. /health, /api/metrics and CORS preflights are never
+held back.
+"""
+import asyncio
+import json
+import os
+from collections import deque
+
+from .tracing import span
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "1"))
+
+# class: (default in-flight limit, default queue length). pbkdf2 releases
+# the GIL, so logins may use half the cores and no more.
+_DEFAULTS = {
+    "auth": (max(1, (os.cpu_count() or 2) // 2), 64),
+    "write": (8, 64),
+    "read": (24, 128),
+    "export": (1, 2),
+}
+
+EXEMPT_PATHS = {"/health", "/api/metrics"}
+# endpoints that copy the whole database get the small export class
+EXPORT_PATHS = {"/api/admin/backups"}
+
+
+def route_class(method: str, path: str) -> str:
+    if path.startswith("/auth/"):
+        return "auth"
+    if method == "POST" and path in EXPORT_PATHS:
+        return "export"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "read"
+
+
+class Limiter:
+    """
+    A FIFO semaphore with a bounded wait queue. Only touched from the
+    event loop thread, so it needs no locking.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            # a slot handed over just as the timeout fired is still ours
+            if not waiter.done() or waiter.cancelled():
+                self.timeouts += 1
+                self.shed += 1
+                return False
+        except asyncio.CancelledError:
+            # the client went away; pass on a slot we may have been handed
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue": self.queue,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+        }
+
+
+def _limiters_from_env() -> dict[str, Limiter]:
+    limiters = {}
+    for name, (limit, queue) in _DEFAULTS.items():
+        limit = int(os.environ.get(f"ADMISSION_{name.upper()}_LIMIT", limit))
+        queue = int(os.environ.get(f"ADMISSION_{name.upper()}_QUEUE", queue))
+        limiters[name] = Limiter(name, limit, queue)
+    return limiters
+
+
+limiters = _limiters_from_env()
+
+
+class AdmissionControlMiddleware:
+    def __init__(
+        self,
+        app,
+        limiters: dict[str, Limiter] = limiters,
+        enabled: bool = ADMISSION_ENABLED,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+    ):
+        self.app = app
+        self.limiters = limiters
+        self.enabled = enabled
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters[route_class(scope["method"], scope["path"])]
+        with span("admission.wait", route_class=limiter.name):
+            admitted = await limiter.acquire(self.queue_timeout)
+        if not admitted:
+            await self._reject(send, limiter.name)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _reject(self, send, name: str) -> None:
+        body = json.dumps(
+            {"detail": f"Server busy ({name} requests), retry shortly"}
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def reset() -> None:
+    for limiter in limiters.values():
+        limiter.reset_stats()
@@ -0,0 +1,194 @@
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .models import ClassEnrollment, IllnessLog, OutbreakAlert
+
+logger = logging.getLogger(__name__)
+
+OUTBREAK_POLL_SECONDS = float(os.environ.get("OUTBREAK_POLL_SECONDS", "60"))
+OUTBREAK_Z_THRESHOLD = float(os.environ.get("OUTBREAK_Z_THRESHOLD", "3.0"))
+OUTBREAK_MIN_REPORTS = int(os.environ.get("OUTBREAK_MIN_REPORTS", "3"))
+
+CAMPUS = "campus"  # key for the institution-wide counters
+
+SHORT_WINDOW = timedelta(hours=24)
+LONG_WINDOW = timedelta(days=7)
+BASELINE_DAYS = 6  # days of the long window before the short one
+
+
+def _as_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class OutbreakDetector:
+    """
+    Rolling 24h / 7d report counts per class and for the whole campus.
+
+    New reports are read from IllnessLog with an id cursor, so each refresh
+    only costs the reports created since the previous one. Every key keeps
+    the sorted timestamps of its reports inside the 7 day window; older ones
+    are dropped as the window slides.
+
+    A key is flagged when its 24h count is at least `min_reports` and its
+    z-score against the daily counts of the previous 6 days reaches
+    `z_threshold`.
+    """
+
+    def __init__(
+        self,
+        z_threshold: float = OUTBREAK_Z_THRESHOLD,
+        min_reports: int = OUTBREAK_MIN_REPORTS,
+    ):
+        self.z_threshold = z_threshold
+        self.min_reports = min_reports
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.cursor: int | None = None
+            self._events: dict[object, list[datetime]] = {}
+            self.processed = 0
+
+    # ---------------------- ingestion ----------------------
+
+    def refresh(self, session: Session, now: datetime | None = None) -> int:
+        """
+        Fold reports created since the last refresh into the windows.
+        Returns the number of new reports processed.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            if self.cursor is None:
+                # first run: seed from the 7 day window instead of all history
+                max_id = session.exec(select(func.max(IllnessLog.id))).one()
+                rows = session.exec(
+                    select(IllnessLog.id, IllnessLog.user_id, IllnessLog.created_at)
+                    .where(
+                        IllnessLog.created_at >= now - LONG_WINDOW,
+                        IllnessLog.id <= (max_id or 0),
+                    )
+                ).all()
+                self.cursor = max_id or 0
+            else:
+                rows = session.exec(
+                    select(IllnessLog.id, IllnessLog.user_id, IllnessLog.created_at)
+                    .where(IllnessLog.id > self.cursor)
+                    .order_by(IllnessLog.id)
+                ).all()
+                if rows:
+                    self.cursor = rows[-1][0]
+
+            self._ingest(session, rows)
+            self._evict(now)
+            self.processed += len(rows)
+            return len(rows)
+
+    def _ingest(self, session: Session, rows) -> None:
+        if not rows:
+            return
+
+        user_ids = {user_id for _, user_id, _ in rows}
+        classes_by_user: dict[int, list[int]] = {}
+        for class_id, student_id in session.exec(
+            select(ClassEnrollment.class_id, ClassEnrollment.student_id).where(
+                ClassEnrollment.student_id.in_(user_ids)
+            )
+        ).all():
+            classes_by_user.setdefault(student_id, []).append(class_id)
+
+        for _, user_id, created_at in rows:
+            created_at = _as_utc(created_at)
+            insort(self._events.setdefault(CAMPUS, []), created_at)
+            for class_id in classes_by_user.get(user_id, []):
+                insort(self._events.setdefault(class_id, []), created_at)
+
+    def _evict(self, now: datetime) -> None:
+        cutoff = now - LONG_WINDOW
+        for key in list(self._events):
+            events = self._events[key]
+            del events[: bisect_left(events, cutoff)]
+            if not events:
+                del self._events[key]
+
+    # ---------------------- scoring ----------------------
+
+    def _score(self, events: list[datetime], now: datetime) -> dict:
+        short_start = now - SHORT_WINDOW
+        count_24h = len(events) - bisect_left(events, short_start)
+        count_7d = len(events) - bisect_left(events, now - LONG_WINDOW)
+
+        daily = []
+        for day in range(BASELINE_DAYS):
+            end = short_start - timedelta(days=day)
+            daily.append(
+                bisect_left(events, end) - bisect_left(events, end - timedelta(days=1))
+            )
+        mean = sum(daily) / len(daily)
+        variance = sum((c - mean) ** 2 for c in daily) / len(daily)
+        # report counts are roughly Poisson, so never trust a spread below sqrt(mean)
+        spread = max(math.sqrt(variance), math.sqrt(mean), 1.0)
+        return {
+            "count_24h": count_24h,
+            "count_7d": count_7d,
+            "baseline_daily": round(mean, 2),
+            "z_score": round((count_24h - mean) / spread, 2),
+        }
+
+    def alerts(self, now: datetime | None = None, flagged_only: bool = True) -> list[OutbreakAlert]:
+        now = now or datetime.now(timezone.utc)
+        result = []
+        with self._lock:
+            for key, events in self._events.items():
+                stats = self._score(events, now)
+                flagged = (
+                    stats["count_24h"] >= self.min_reports
+                    and stats["z_score"] >= self.z_threshold
+                )
+                if flagged_only and not flagged:
+                    continue
+                result.append(
+                    OutbreakAlert(
+                        scope=CAMPUS if key == CAMPUS else "class",
+                        class_id=None if key == CAMPUS else key,
+                        **stats,
+                    )
+                )
+        result.sort(key=lambda a: a.z_score, reverse=True)
+        return result
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float = OUTBREAK_POLL_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.refresh(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("outbreak detector refresh failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="outbreak-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+outbreak_detector = OutbreakDetector()
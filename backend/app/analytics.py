@@ -0,0 +1,160 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .models import IllnessEpisode, IllnessLog, TrendBucket
+
+# a student counts as sick for this many days after their latest report
+SICK_DAYS = 7
+
+# where the trend endpoint gets sick intervals: "episodes" or "reports"
+TREND_SOURCE = os.environ.get("TREND_SOURCE", "episodes")
+
+
+def _bucket_expr(bucket: str):
+    """
+    SQLite expression mapping created_at to the first day of its bucket.
+    Weeks start on Monday: step back 6 days, then forward to the next Monday.
+    """
+    if bucket == "week":
+        return func.date(IllnessLog.created_at, "-6 days", "weekday 1")
+    return func.date(IllnessLog.created_at)
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def class_trend(
+    session: Session,
+    student_ids: Iterable[int],
+    days: int,
+    bucket: str = "day",
+    now: datetime | None = None,
+    source: str = "reports",
+) -> list[TrendBucket]:
+    """
+    Illness trend for a set of students over the last `days` days (UTC).
+
+    New reports and mean severity are grouped by SQL date bucketing.
+    The sick count at the end of each bucket comes from per-student sick
+    intervals: with source="reports", a single (user_id, report day)
+    query merged into intervals here; with source="episodes", the
+    intervals already kept in illnessepisode, one row per illness instead
+    of one per report day. The index is synced in the background, so
+    callers check `episode_index.current` for these students first and
+    use "reports" while it is behind (see episodes.py).
+    Every query range-scans a (user_id, ...) index.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    window_start = today - timedelta(days=days - 1)
+    student_ids = list(student_ids)
+
+    starts: list[date] = []
+    cursor = bucket_start(window_start, bucket)
+    step = timedelta(days=7 if bucket == "week" else 1)
+    while cursor <= today:
+        starts.append(cursor)
+        cursor += step
+
+    if not student_ids:
+        return [TrendBucket(start=s, sick_count=0, new_reports=0) for s in starts]
+
+    window_start_dt = datetime.combine(window_start, datetime.min.time())
+    bucket_col = _bucket_expr(bucket)
+
+    totals = session.exec(
+        select(bucket_col, func.count(IllnessLog.id), func.avg(IllnessLog.severity))
+        .where(
+            IllnessLog.user_id.in_(student_ids),
+            IllnessLog.created_at >= window_start_dt,
+        )
+        .group_by(bucket_col)
+    ).all()
+    totals_by_start = {
+        date.fromisoformat(start): (count, avg) for start, count, avg in totals
+    }
+
+    # reports up to SICK_DAYS before the window still make students sick inside it
+    lookback = window_start - timedelta(days=SICK_DAYS - 1)
+    span = (today - lookback).days + 1
+    delta = [0] * (span + SICK_DAYS + 1)
+    if source == "episodes":
+        _episode_intervals(session, student_ids, lookback, today, delta)
+    else:
+        _report_intervals(session, student_ids, lookback, delta)
+
+    sick_by_offset = []
+    running = 0
+    for d in delta[:span]:
+        running += d
+        sick_by_offset.append(running)
+
+    result: list[TrendBucket] = []
+    for start in starts:
+        end = min(start + step - timedelta(days=1), today)
+        count, avg = totals_by_start.get(start, (0, None))
+        result.append(
+            TrendBucket(
+                start=start,
+                sick_count=sick_by_offset[(end - lookback).days],
+                new_reports=count,
+                avg_severity=round(avg, 2) if avg is not None else None,
+            )
+        )
+    return result
+
+
+# both fill a difference array over days from `lookback`: +1 when a
+# student becomes sick, -1 when they recover
+
+
+def _report_intervals(
+    session: Session, student_ids: list[int], lookback: date, delta: list[int]
+) -> None:
+    day_col = func.date(IllnessLog.created_at)
+    report_days = session.exec(
+        select(IllnessLog.user_id, day_col)
+        .where(
+            IllnessLog.user_id.in_(student_ids),
+            IllnessLog.created_at >= datetime.combine(lookback, datetime.min.time()),
+        )
+        .group_by(IllnessLog.user_id, day_col)
+        .order_by(IllnessLog.user_id, day_col)
+    ).all()
+
+    open_user = None
+    open_start = open_end = 0
+    for user_id, day_str in report_days:
+        offset = (date.fromisoformat(day_str) - lookback).days
+        if user_id == open_user and offset <= open_end + 1:
+            open_end = offset + SICK_DAYS - 1
+            continue
+        if open_user is not None:
+            delta[open_start] += 1
+            delta[open_end + 1] -= 1
+        open_user, open_start, open_end = user_id, offset, offset + SICK_DAYS - 1
+    if open_user is not None:
+        delta[open_start] += 1
+        delta[open_end + 1] -= 1
+
+
+def _episode_intervals(
+    session: Session, student_ids: list[int], lookback: date, today: date, delta: list[int]
+) -> None:
+    # episodes of one student never overlap, so each counts once per day
+    for start_day, end_day in session.exec(
+        select(IllnessEpisode.start_day, IllnessEpisode.end_day).where(
+            IllnessEpisode.user_id.in_(student_ids),
+            IllnessEpisode.end_day >= lookback,
+            IllnessEpisode.start_day <= today,
+        )
+    ):
+        delta[max(0, (start_day - lookback).days)] += 1
+        delta[min((end_day - lookback).days + 1, len(delta) - 1)] -= 1
@@ -0,0 +1,158 @@
+"""
+Hot/cold split for illness reports.
+
+Summaries, student lists and trends read every report of every student in
+a class, yet only recent reports can change anything they show. Reports
+older than ARCHIVE_HORIZON_DAYS are moved from illnesslog to
+illnesslogarchive, keeping their ids, so the hot table only grows with
+recent activity.
+
+A move copies and deletes each batch in one transaction, so a report is
+always in exactly one of the two tables. The change feed logs the move
+as "archive", not as a delete. Readers that need a student's
+full history (list_reports) read both; see `user_reports`. The archive
+is not full-text indexed; symptom search covers hot reports only.
+
+The default horizon is longer than the longest trend window (366 days),
+so trends and everything else built on recent reports are unaffected.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, literal
+from sqlalchemy.schema import CreateTable
+from sqlmodel import Session, select
+
+from .analytics import SICK_DAYS
+from .cache import invalidate_on_commit
+from .changes import last_seq, mark_archived
+from .models import ClassEnrollment, IllnessLog, IllnessLogArchive
+
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS", "400"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+
+_COLUMNS = ["id", "user_id", "symptoms", "severity", "recoveryTime", "created_at"]
+
+
+def archive_cutoff(now: datetime | None = None, horizon_days: int = ARCHIVE_HORIZON_DAYS) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    # never archive a report that can still make a student sick
+    horizon = timedelta(days=max(horizon_days, SICK_DAYS))
+    # SQLite hands back naive UTC datetimes
+    return (now - horizon).replace(tzinfo=None)
+
+
+def archive_old_reports(
+    session: Session,
+    now: datetime | None = None,
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    """
+    Move reports older than the horizon to the archive, `batch_size` rows
+    per transaction so writers are never blocked for long. Returns how
+    many were moved.
+    """
+    cutoff = archive_cutoff(now, horizon_days)
+    # naive UTC, like every other datetime SQLite hands back
+    archived_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    moved = 0
+    while True:
+        ids = session.exec(
+            select(IllnessLog.id)
+            .where(IllnessLog.created_at < cutoff)
+            .order_by(IllnessLog.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+
+        # summaries only read hot reports, so a move can change a
+        # student's latest report; Core writes skip the flush listener
+        invalidate_on_commit(session, session.exec(
+            select(ClassEnrollment.class_id)
+            .distinct()
+            .where(ClassEnrollment.student_id.in_(
+                select(IllnessLog.user_id).where(IllnessLog.id.in_(ids))
+            ))
+        ).all())
+        mark = last_seq(session)
+        conn = session.connection()
+        conn.execute(
+            insert(IllnessLogArchive).from_select(
+                _COLUMNS + ["archived_at"],
+                select(
+                    *(getattr(IllnessLog, c) for c in _COLUMNS), literal(archived_at)
+                ).where(IllnessLog.id.in_(ids)),
+            )
+        )
+        conn.execute(delete(IllnessLog).where(IllnessLog.id.in_(ids)))
+        mark_archived(session, mark)
+        session.commit()
+        moved += len(ids)
+    return moved
+
+
+def migrate_report_ids(engine) -> None:
+    """
+    Rebuild an illnesslog created before it was AUTOINCREMENT. Without it
+    SQLite hands out max(id) + 1, so deleting the newest report makes its
+    id come back, and the id cursors in alerts and sketches skip the new
+    report. The sequence starts past archived ids as well.
+
+    Dropping the table drops its triggers and indexes; init_db recreates
+    them right after. Rows keep their ids, so the search index stays valid.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    table = IllnessLog.__table__
+    with engine.begin() as conn:
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            return
+        columns = ", ".join(f'"{c}"' for c in _COLUMNS)
+        create = str(CreateTable(table).compile(dialect=engine.dialect))
+        conn.exec_driver_sql(create.replace(f"TABLE {table.name} ", "TABLE illnesslog_new ", 1))
+        conn.exec_driver_sql(
+            f"INSERT INTO illnesslog_new ({columns}) SELECT {columns} FROM {table.name}"
+        )
+        conn.exec_driver_sql(f"DROP TABLE {table.name}")
+        conn.exec_driver_sql(f"ALTER TABLE illnesslog_new RENAME TO {table.name}")
+        high = conn.exec_driver_sql(
+            f"SELECT max(coalesce((SELECT max(id) FROM {table.name}), 0),"
+            f" coalesce((SELECT max(id) FROM {IllnessLogArchive.__tablename__}), 0))"
+        ).scalar()
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, high)
+        )
+
+
+def user_reports(session: Session, user_id: int) -> list:
+    """
+    Every report of a user, hot and archived, most recent first.
+    """
+    hot = session.exec(
+        select(IllnessLog)
+        .where(IllnessLog.user_id == user_id)
+        .order_by(IllnessLog.created_at.desc())
+    ).all()
+    cold = session.exec(
+        select(IllnessLogArchive)
+        .where(IllnessLogArchive.user_id == user_id)
+        .order_by(IllnessLogArchive.created_at.desc())
+    ).all()
+    if not cold:
+        return hot
+    return sorted([*hot, *cold], key=lambda log: log.created_at, reverse=True)
+
+
+def archive_stats(session: Session) -> dict:
+    hot = session.exec(select(func.count()).select_from(IllnessLog)).one()
+    cold, newest = session.exec(
+        select(func.count(), func.max(IllnessLogArchive.created_at))
+    ).one()
+    return {"hot_reports": hot, "archived_reports": cold, "archived_through": newest}
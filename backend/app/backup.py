@@ -0,0 +1,178 @@
+"""
+Online snapshots of app.db with SQLite's backup API.
+
+Copying app.db with cp while the API runs can tear the copy mid-write. The
+backup API copies pages under a read lock instead, and here it does so
+BACKUP_PAGES_PER_STEP pages at a time, sleeping between steps. Writers are
+only held off for the length of one step, a few milliseconds.
+
+A write from another connection makes SQLite restart the copy. If that
+happens more than BACKUP_MAX_RESTARTS times, the copy finishes in a single
+step so it cannot be starved by a steady write load. That step reads one
+snapshot for the whole copy, which only leaves writers alone in WAL mode
+(db.py turns it on for app.db). A database in another journal mode would
+have its writers blocked for the whole copy, so its snapshot fails
+instead.
+
+Snapshots are written to a temporary file, checked with
+PRAGMA quick_check, optionally gzipped and then renamed into BACKUP_DIR,
+so a snapshot file is always complete.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .db import DATABASE_PATH, PROJECT_ROOT
+
+BACKUP_DIR = os.environ.get("BACKUP_DIR", os.path.join(PROJECT_ROOT, "backups"))
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "128"))
+BACKUP_STEP_SLEEP = float(os.environ.get("BACKUP_STEP_SLEEP", "0.005"))
+BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", "20"))
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(source: sqlite3.Connection, dest: sqlite3.Connection, pages: int, sleep: float) -> dict:
+    stats = {"steps": 0, "restarts": 0, "max_step_ms": 0.0}
+    last = {"remaining": None, "at": time.perf_counter()}
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        stats["steps"] += 1
+        # the callback runs after each step; the sleep comes after it
+        stats["max_step_ms"] = max(stats["max_step_ms"], (now - last["at"]) * 1000)
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last["remaining"] = remaining
+        last["at"] = time.perf_counter() + sleep
+
+    try:
+        source.backup(dest, pages=pages, progress=progress, sleep=sleep)
+    except _TooManyRestarts:
+        mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode.lower() != "wal":
+            raise BackupError(
+                f"writes restarted the copy more than {BACKUP_MAX_RESTARTS} times, and "
+                f"finishing it in one step would block writers ({mode} journal)"
+            )
+        start = time.perf_counter()
+        source.backup(dest, pages=-1)
+        stats["steps"] += 1
+        stats["max_step_ms"] = max(stats["max_step_ms"], (time.perf_counter() - start) * 1000)
+    return stats
+
+
+def take_snapshot(
+    source_path: str | None = None,
+    backup_dir: str | None = None,
+    compress: bool = False,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    sleep: float = BACKUP_STEP_SLEEP,
+) -> dict:
+    """
+    Write a consistent copy of the database to backup_dir and describe it.
+    """
+    source_path = source_path or DATABASE_PATH
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"app-{stamp}.db" + (".gz" if compress else "")
+    final_path = os.path.join(backup_dir, name)
+
+    fd, tmp_path = tempfile.mkstemp(dir=backup_dir, suffix=".tmp")
+    os.close(fd)
+    started = time.perf_counter()
+    try:
+        source = sqlite3.connect(source_path, timeout=5)
+        dest = sqlite3.connect(tmp_path)
+        try:
+            stats = _copy(source, dest, pages, sleep)
+            if dest.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise BackupError("snapshot failed its integrity check")
+        finally:
+            dest.close()
+            source.close()
+
+        if compress:
+            with open(tmp_path, "rb") as raw, gzip.open(tmp_path + ".gz", "wb") as packed:
+                shutil.copyfileobj(raw, packed)
+            os.replace(tmp_path + ".gz", final_path)
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        for path in (tmp_path, tmp_path + ".gz"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    return {
+        "name": name,
+        "path": final_path,
+        "bytes": os.path.getsize(final_path),
+        "compressed": compress,
+        "seconds": round(time.perf_counter() - started, 3),
+        **stats,
+    }
+
+
+def list_snapshots(backup_dir: str | None = None) -> list[dict]:
+    backup_dir = backup_dir or BACKUP_DIR
+    if not os.path.isdir(backup_dir):
+        return []
+    return [
+        {
+            "name": name,
+            "bytes": os.path.getsize(os.path.join(backup_dir, name)),
+            "compressed": name.endswith(".gz"),
+        }
+        for name in sorted(os.listdir(backup_dir), reverse=True)
+        if name.startswith("app-") and name.endswith((".db", ".db.gz"))
+    ]
+
+
+def restore_snapshot(snapshot_path: str, target_path: str | None = None) -> None:
+    """
+    Replace the contents of the target database with a snapshot.
+
+    The copy goes through the backup API, so connections that are open on
+    the target see the restored data rather than a half-written file. Stop
+    the API first anyway: its in-process caches and cursors describe the
+    data being replaced.
+    """
+    target_path = target_path or DATABASE_PATH
+    unpacked = None
+    try:
+        if snapshot_path.endswith(".gz"):
+            fd, unpacked = tempfile.mkstemp(suffix=".db")
+            with os.fdopen(fd, "wb") as raw, gzip.open(snapshot_path, "rb") as packed:
+                shutil.copyfileobj(packed, raw)
+            snapshot_path = unpacked
+
+        source = sqlite3.connect(snapshot_path)
+        try:
+            if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise BackupError(f"{snapshot_path} failed its integrity check")
+            target = sqlite3.connect(target_path, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        if unpacked:
+            os.remove(unpacked)
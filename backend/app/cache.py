@@ -0,0 +1,310 @@
+"""
+Result cache for class summaries.
+
+Entries are keyed per class (plus a variant such as "full" or "headline")
+and hold the serialized JSON response. They are dropped:
+
+  * when a flush touches an IllnessLog of an enrolled student, an
+    enrollment, the class itself or an enrolled student's profile
+    (see the Session listeners at the bottom), applied after commit;
+  * in other workers, through the invalidation bus (invalidation.py);
+  * when their TTL runs out. The TTL never outlives the moment the oldest
+    current report crosses SICK_DAYS, since that changes who is sick.
+
+Backends: "memory" (per-process LRU, the default), "sqlite" (a file
+shared by every uvicorn worker on the host) or "none".
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session as OrmSession
+
+from .invalidation import invalidation_bus
+from .models import Class, ClassEnrollment, IllnessLog, User
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+
+SUMMARY_CACHE_BACKEND = os.environ.get("SUMMARY_CACHE_BACKEND", "memory")
+SUMMARY_CACHE_PATH = os.environ.get(
+    "SUMMARY_CACHE_PATH", os.path.join(PROJECT_ROOT, "summary_cache.db")
+)
+SUMMARY_CACHE_TTL = float(os.environ.get("SUMMARY_CACHE_TTL", "300"))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", "1024"))
+
+
+class NullBackend:
+    def get(self, class_id: int, variant: str):
+        return None
+
+    def set(self, class_id: int, variant: str, value: str, expires_at: float) -> None:
+        pass
+
+    def delete(self, class_id: int, variant: str) -> None:
+        pass
+
+    def delete_class(self, class_id: int) -> bool:
+        return False
+
+    def clear(self) -> None:
+        pass
+
+
+class LRUBackend:
+    def __init__(self, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[int, str], tuple[str, float]] = OrderedDict()
+        self._variants: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, class_id: int, variant: str):
+        key = (class_id, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, class_id: int, variant: str, value: str, expires_at: float) -> None:
+        key = (class_id, variant)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._variants.setdefault(class_id, set()).add(variant)
+            while len(self._entries) > self.max_entries:
+                (old_class, old_variant), _ = self._entries.popitem(last=False)
+                self._forget(old_class, old_variant)
+
+    def _forget(self, class_id: int, variant: str) -> None:
+        variants = self._variants.get(class_id)
+        if variants:
+            variants.discard(variant)
+            if not variants:
+                del self._variants[class_id]
+
+    def delete(self, class_id: int, variant: str) -> None:
+        with self._lock:
+            if self._entries.pop((class_id, variant), None) is not None:
+                self._forget(class_id, variant)
+
+    def delete_class(self, class_id: int) -> bool:
+        with self._lock:
+            variants = self._variants.pop(class_id, set())
+            for variant in variants:
+                self._entries.pop((class_id, variant), None)
+            return bool(variants)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._variants.clear()
+
+
+class SQLiteBackend:
+    """
+    Cache entries in a standalone SQLite file, separate from app.db so
+    cache writes never contend with the application's write lock.
+    """
+
+    def __init__(self, path: str = SUMMARY_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS summary_cache ("
+            " class_id INTEGER NOT NULL,"
+            " variant TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (class_id, variant))"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, class_id: int, variant: str):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM summary_cache WHERE class_id = ? AND variant = ?",
+            (class_id, variant),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, class_id: int, variant: str, value: str, expires_at: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO summary_cache (class_id, variant, value, expires_at)"
+            " VALUES (?, ?, ?, ?)",
+            (class_id, variant, value, expires_at),
+        )
+        conn.execute("DELETE FROM summary_cache WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, class_id: int, variant: str) -> None:
+        self._conn().execute(
+            "DELETE FROM summary_cache WHERE class_id = ? AND variant = ?",
+            (class_id, variant),
+        )
+
+    def delete_class(self, class_id: int) -> bool:
+        cur = self._conn().execute(
+            "DELETE FROM summary_cache WHERE class_id = ?", (class_id,)
+        )
+        return cur.rowcount > 0
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM summary_cache")
+
+
+def make_backend(name: str = SUMMARY_CACHE_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "none":
+        return NullBackend()
+    return LRUBackend()
+
+
+class ResultCache:
+    def __init__(self, backend=None, ttl: float = SUMMARY_CACHE_TTL):
+        self.backend = backend if backend is not None else make_backend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # bumped on every invalidation, so a read that raced a write cannot
+        # store a result computed from the old data
+        self._generations: dict[int, int] = {}
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, class_id: int) -> int:
+        return self._generations.get(class_id, 0)
+
+    def get(self, class_id: int, variant: str):
+        entry = self.backend.get(class_id, variant)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self.hits += 1
+                return value
+            self.expirations += 1
+            self.backend.delete(class_id, variant)
+        self.misses += 1
+        return None
+
+    def set(
+        self,
+        class_id: int,
+        variant: str,
+        value: str,
+        generation: int,
+        ttl: float | None = None,
+    ) -> bool:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return False
+        with self._lock:
+            if self.generation(class_id) != generation:
+                return False
+            self.backend.set(class_id, variant, value, time.time() + ttl)
+        return True
+
+    def invalidate_class(self, class_id: int) -> None:
+        with self._lock:
+            self._generations[class_id] = self.generation(class_id) + 1
+            dropped = self.backend.delete_class(class_id)
+        if dropped:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations.clear()
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+summary_cache = ResultCache()
+
+# other workers' writes arrive through the bus
+invalidation_bus.subscribe("summary", lambda key: summary_cache.invalidate_class(int(key)))
+
+
+# ---------------------- write-driven invalidation ----------------------
+
+_PENDING_KEY = "summary_cache_invalidate"
+
+
+def affected_class_ids(session: OrmSession) -> set[int]:
+    """
+    Classes whose summary may change because of the objects pending in
+    this flush.
+    """
+    class_ids: set[int] = set()
+    user_ids: set[int] = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, IllnessLog):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, ClassEnrollment):
+            class_ids.add(obj.class_id)
+        elif isinstance(obj, Class) and obj.id is not None:
+            class_ids.add(obj.id)
+        elif isinstance(obj, User) and obj.id is not None and obj not in session.new:
+            user_ids.add(obj.id)
+
+    if user_ids:
+        # run on the flush's connection: no ORM autoflush while flushing
+        rows = session.connection().execute(
+            select(ClassEnrollment.class_id).where(ClassEnrollment.student_id.in_(user_ids))
+        )
+        class_ids.update(row[0] for row in rows)
+    return class_ids
+
+
+def invalidate_on_commit(session: OrmSession, class_ids) -> None:
+    """
+    Drop these classes' summaries when the session commits. The flush
+    listener below does this for ORM writes; Core statements must call it.
+    """
+    class_ids = set(class_ids)
+    if class_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(class_ids)
+        invalidation_bus.publish(session, "summary", class_ids)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _collect_invalidations(session, flush_context, instances):
+    # before_flush still sees the objects queued for this flush
+    invalidate_on_commit(session, affected_class_ids(session))
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_invalidations(session):
+    for class_id in session.info.pop(_PENDING_KEY, ()):
+        summary_cache.invalidate_class(class_id)
+
+
+@event.listens_for(OrmSession, "after_soft_rollback")
+def _discard_invalidations(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,236 @@
+"""
+Change-data capture for external consumers.
+
+Triggers on illnesslog, classenrollment, class and friend append a row to
+changelog for every insert, update and delete, in the same transaction as
+the change. The changelog id is the sequence number: AUTOINCREMENT keeps
+it increasing and SQLite's single writer makes id order commit order.
+Because the log is written by triggers, it also sees Core writes that
+bypass the ORM, such as enrollment by code and bulk friend imports.
+
+Consumers page through GET /api/changes?since=<seq>, starting at 0 and
+passing back next_cursor each time. Each page is a primary key range scan.
+
+Reports moved to illnesslogarchive are logged as op "archive", not
+"delete": the report still exists. Deleting an archived report logs a
+"delete" on illnesslog.
+
+Entries older than CHANGELOG_RETENTION_DAYS are compacted away. A
+consumer whose cursor falls behind the oldest retained entry gets 410
+and must resync from scratch.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DDL, delete, event, func, update
+from sqlmodel import Session, select
+
+from .models import (
+    ChangeLog,
+    ChangeRead,
+    ChangesResponse,
+    Class,
+    ClassEnrollment,
+    Friend,
+    IllnessLog,
+    IllnessLogArchive,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANGELOG_RETENTION_DAYS = float(os.environ.get("CHANGELOG_RETENTION_DAYS", "30"))
+CHANGELOG_COMPACT_SECONDS = float(os.environ.get("CHANGELOG_COMPACT_SECONDS", "3600"))
+CHANGES_MAX_LIMIT = 5000
+
+# table -> columns carried in each entry's data
+TRACKED = {
+    IllnessLog.__table__: ["user_id", "symptoms", "severity", "recoveryTime", "created_at"],
+    ClassEnrollment.__table__: ["class_id", "student_id"],
+    Class.__table__: ["name", "code", "professor_id"],
+    Friend.__table__: ["owner_user_id", "friend_name", "friend_email"],
+}
+
+_TIMESTAMP = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _trigger(name: str, event_sql: str, table: str, logged_as: str, op: str, row: str, columns) -> str:
+    data = ", ".join(f"'{c}', {row}.\"{c}\"" for c in columns)
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event_sql} ON \"{table}\" BEGIN"
+        f" INSERT INTO changelog (table_name, op, row_id, data, created_at)"
+        f" VALUES ('{logged_as}', '{op}', {row}.id, json_object({data}), {_TIMESTAMP});"
+        " END"
+    )
+
+
+def _triggers(table) -> list[str]:
+    columns = TRACKED[table]
+    name = table.name
+    return [
+        _trigger(f"{name}_changelog_insert", "INSERT", name, name, "insert", "new", columns),
+        _trigger(f"{name}_changelog_update", "UPDATE", name, name, "update", "new", columns),
+        _trigger(f"{name}_changelog_delete", "DELETE", name, name, "delete", "old", columns),
+    ]
+
+
+# archived reports are still reports: only deleting one is a change
+_ARCHIVE_TRIGGERS = [
+    _trigger(
+        "illnesslogarchive_changelog_delete", "DELETE", IllnessLogArchive.__tablename__,
+        IllnessLog.__tablename__, "delete", "old", TRACKED[IllnessLog.__table__],
+    )
+]
+
+
+def _ddl(statement: str) -> DDL:
+    # DDL %-formats its text
+    return DDL(statement.replace("%", "%%")).execute_if(dialect="sqlite")
+
+
+for _table in TRACKED:
+    for _statement in _triggers(_table):
+        event.listen(_table, "after_create", _ddl(_statement))
+for _statement in _ARCHIVE_TRIGGERS:
+    event.listen(IllnessLogArchive.__table__, "after_create", _ddl(_statement))
+
+
+def ensure_change_log(engine) -> None:
+    """
+    Create the triggers on databases whose tables predate the change log.
+    Changes made before that were never logged; consumers start with a
+    full export.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for table in TRACKED:
+            for statement in _triggers(table):
+                conn.exec_driver_sql(statement)
+        for statement in _ARCHIVE_TRIGGERS:
+            conn.exec_driver_sql(statement)
+
+
+def mark_archived(session: Session, after_seq: int) -> None:
+    """
+    Relabel the report deletes logged since `after_seq` as archive moves.
+    Call inside the transaction that moved them.
+    """
+    session.exec(
+        update(ChangeLog)
+        .where(
+            ChangeLog.id > after_seq,
+            ChangeLog.table_name == IllnessLog.__tablename__,
+            ChangeLog.op == "delete",
+        )
+        .values(op="archive")
+    )
+
+
+def last_seq(session: Session) -> int:
+    return session.exec(select(func.max(ChangeLog.id))).one() or 0
+
+
+class CursorExpired(Exception):
+    pass
+
+
+class ChangeFeed:
+    def __init__(self, retention_days: float = CHANGELOG_RETENTION_DAYS):
+        self.retention = timedelta(days=retention_days)
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.served = 0
+        self.compacted = 0
+
+    def horizon(self, session: Session) -> int:
+        """
+        Highest sequence number compacted away. Compaction only removes a
+        prefix of the log, so it ends just before the oldest entry left,
+        or at the last number handed out when nothing is left.
+        """
+        oldest = session.exec(select(func.min(ChangeLog.id))).one()
+        if oldest is not None:
+            return oldest - 1
+        return session.connection().exec_driver_sql(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changelog'"
+        ).scalar() or 0
+
+    def read(self, session: Session, since: int, limit: int) -> ChangesResponse:
+        rows = session.exec(
+            select(ChangeLog)
+            .where(ChangeLog.id > since)
+            .order_by(ChangeLog.id)
+            .limit(limit + 1)
+        ).all()
+        # the usual case, the next entry is right after the cursor, needs
+        # no further checks
+        if not (rows and rows[0].id == since + 1):
+            horizon = self.horizon(session)
+            if since < horizon:
+                raise CursorExpired(f"changes up to {horizon} were compacted; resync")
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        self.served += len(rows)
+        return ChangesResponse(
+            changes=[
+                ChangeRead(
+                    seq=row.id,
+                    table=row.table_name,
+                    op=row.op,
+                    row_id=row.row_id,
+                    data=row.data,
+                    created_at=row.created_at,
+                )
+                for row in rows
+            ],
+            next_cursor=rows[-1].id if rows else since,
+            has_more=has_more,
+        )
+
+    def compact(self, session: Session, now: datetime | None = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        through = session.exec(
+            select(func.max(ChangeLog.id)).where(ChangeLog.created_at < now - self.retention)
+        ).one()
+        if through is None:
+            return 0
+        # by id range: entries are appended in time order, so this is the
+        # same set and costs a primary key range delete
+        result = session.exec(delete(ChangeLog).where(ChangeLog.id <= through))
+        session.commit()
+        self.compacted += result.rowcount
+        return result.rowcount
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float = CHANGELOG_COMPACT_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.compact(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("change log compaction failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="changelog-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"served": self.served, "compacted": self.compacted}
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,189 @@
+"""
+Class codes: normalization, an in-memory resolver and enrollment by code.
+
+Students type codes by hand, so "cs101 a1", "CS101A1" and " CS101 A1 " all
+name the same class. Class.code keeps what the professor typed;
+Class.code_key holds the normalized form, is unique and indexed, and is
+set on every flush that touches a class.
+
+At the start of term thousands of students join by code within minutes.
+`class_resolver` keeps code_key -> (id, name) in memory, loaded in one
+query on first use. Misses fall through to the code_key index, so a new
+class is joinable at once. Any flush that creates, edits or deletes a class
+clears the resolver on commit, in this worker directly and in the others
+through the invalidation bus.
+"""
+import re
+import threading
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+
+from .cache import invalidate_on_commit
+from .invalidation import invalidation_bus
+from .models import Class, ClassEnrollment
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_code(code: str | None) -> str | None:
+    if code is None:
+        return None
+    key = _WHITESPACE.sub("", code).upper()
+    return key or None
+
+
+class ClassCodeResolver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classes: dict[str, tuple[int, str]] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            self._classes = None
+
+    def resolve(self, session: Session, code: str) -> tuple[int, str] | None:
+        """
+        (class id, class name) for a code as typed by a student.
+        """
+        key = normalize_code(code)
+        if key is None:
+            return None
+
+        with self._lock:
+            classes = self._classes
+        if classes is None:
+            classes = {
+                code_key: (class_id, name)
+                for code_key, class_id, name in session.exec(
+                    select(Class.code_key, Class.id, Class.name).where(Class.code_key.is_not(None))
+                ).all()
+            }
+            with self._lock:
+                self._classes = classes
+
+        found = classes.get(key)
+        if found is not None:
+            self.hits += 1
+            return found
+
+        self.misses += 1
+        row = session.exec(select(Class.id, Class.name).where(Class.code_key == key)).first()
+        if row is None:
+            return None
+        found = (row[0], row[1])
+        with self._lock:
+            if self._classes is classes:
+                classes[key] = found
+        return found
+
+    def stats(self) -> dict:
+        return {
+            "warm": self._classes is not None,
+            "codes": len(self._classes or ()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class_resolver = ClassCodeResolver()
+invalidation_bus.subscribe("class_codes", class_resolver.invalidate)
+
+_PENDING_KEY = "class_codes_invalidate"
+
+
+@event.listens_for(Class, "before_insert")
+@event.listens_for(Class, "before_update")
+def _set_code_key(mapper, connection, target):
+    target.code_key = normalize_code(target.code)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _collect_class_changes(session, flush_context, instances):
+    changed = [
+        obj
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Class)
+    ]
+    if changed and not session.info.get(_PENDING_KEY):
+        session.info[_PENDING_KEY] = True
+        invalidation_bus.publish(session, "class_codes", ["*"])
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_class_changes(session):
+    if session.info.pop(_PENDING_KEY, False):
+        class_resolver.invalidate()
+
+
+@event.listens_for(OrmSession, "after_soft_rollback")
+def _discard_class_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def enroll(session: Session, class_id: int, student_id: int) -> int | None:
+    """
+    Enroll a student in one statement. Returns the new enrollment id, or
+    None when the student was already enrolled. Commits.
+    """
+    enrollment_id = session.exec(
+        sqlite_insert(ClassEnrollment)
+        .values(class_id=class_id, student_id=student_id)
+        .on_conflict_do_nothing(index_elements=["class_id", "student_id"])
+        .returning(ClassEnrollment.id)
+    ).scalar()
+    if enrollment_id is not None:
+        # a Core insert skips the ORM flush that normally drops the summary
+        invalidate_on_commit(session, [class_id])
+    session.commit()
+    return enrollment_id
+
+
+def migrate_class_codes(engine) -> list[tuple[int, str]]:
+    """
+    Bring databases from before code_key up to date: add and fill the
+    column and drop duplicate enrollments, so the unique indexes that
+    init_db creates next can be built. Returns (class id, code) for the
+    classes whose code duplicates an older class's; they are left
+    unjoinable until given a new code.
+    """
+    conflicts: list[tuple[int, str]] = []
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info('class')")}
+        if "code_key" not in columns:
+            conn.exec_driver_sql("ALTER TABLE class ADD COLUMN code_key VARCHAR")
+
+        taken: set[str] = set()
+        rows = conn.exec_driver_sql(
+            "SELECT id, code FROM class WHERE code_key IS NULL ORDER BY id"
+        ).all()
+        taken.update(
+            key for (key,) in conn.exec_driver_sql(
+                "SELECT code_key FROM class WHERE code_key IS NOT NULL"
+            )
+        )
+        for class_id, code in rows:
+            key = normalize_code(code)
+            if key is None:
+                continue
+            if key in taken:
+                # an older class owns the code; this one must be given a new one
+                conflicts.append((class_id, code))
+                continue
+            taken.add(key)
+            conn.exec_driver_sql("UPDATE class SET code_key = ? WHERE id = ?", (key, class_id))
+
+        conn.execute(
+            ClassEnrollment.__table__.delete().where(
+                ClassEnrollment.id.not_in(
+                    select(func.min(ClassEnrollment.id)).group_by(
+                        ClassEnrollment.class_id, ClassEnrollment.student_id
+                    )
+                )
+            )
+        )
+    return conflicts
@@ -1,31 +1,126 @@
+import logging
 import os
+import zlib
+from contextlib import contextmanager
+
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
 from .models import IllnessLog, LogCreate
+from .archive import migrate_report_ids
+from .changes import ensure_change_log
+from .classes import migrate_class_codes
+from .digest import migrate_pending_notifications
+from .friends import migrate_friend_emails
+from .search import ensure_search_index
+from .severity import ensure_severity_counts
+
+logger = logging.getLogger(__name__)
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
-DATABASE_PATH = os.path.join(PROJECT_ROOT, "app.db")
+DATABASE_PATH = os.environ.get("DATABASE_PATH", os.path.join(PROJECT_ROOT, "app.db"))
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+DATABASE_ECHO = os.environ.get("DATABASE_ECHO", "true").lower() == "true"
 
 engine = create_engine(
     DATABASE_URL,
-    echo=True,
+    echo=DATABASE_ECHO,
     connect_args={"check_same_thread": False}
 )
 
 
+@event.listens_for(engine, "connect")
+def _use_wal(dbapi_connection, connection_record):
+    # readers, backups included, never block writers and vice versa;
+    # the setting sticks to the file, this just makes sure it is on
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+
 def get_session():
     with Session(engine) as session:
         yield session
 
 
+@contextmanager
+def read_transaction(session: Session):
+    """
+    Run several SELECTs against one consistent SQLite snapshot.
+    pysqlite only opens a transaction before writes, so without an explicit
+    BEGIN every read would see whatever was committed at that moment.
+    """
+    conn = session.connection()
+    began = not conn.connection.dbapi_connection.in_transaction
+    if began:
+        conn.exec_driver_sql("BEGIN")
+    try:
+        yield session
+    finally:
+        if began and conn.connection.dbapi_connection.in_transaction:
+            conn.exec_driver_sql("COMMIT")
+
+
+# bump when a data migration changes without the models changing
+MIGRATIONS_REVISION = 2
+
+
+def schema_version() -> int:
+    """
+    Fingerprint of the tables, columns, indexes and triggers the models
+    declare, plus MIGRATIONS_REVISION. init_db stores it in SQLite's
+    user_version; any change to the models changes it.
+    """
+    parts = [str(MIGRATIONS_REVISION)]
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{c.name}:{c.type!r}:{c.nullable}" for c in table.columns)
+        parts.extend(sorted(f"{i.name}:{i.unique}" for i in table.indexes))
+        # the search index and change log triggers are DDL create listeners
+        parts.extend(sorted(
+            str(getattr(listener, "statement", "")) for listener in table.dispatch.after_create
+        ))
+    return zlib.crc32("\n".join(parts).encode()) & 0x7FFFFFFF
+
+
 def init_db(engine=engine):
+    """
+    Create and migrate the schema. The checks read every table, and the
+    friend and enrollment migrations every row, so they are skipped when
+    the database is already at the current schema version.
+    """
+    version = schema_version()
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA user_version").scalar() == version:
+            return
+
     SQLModel.metadata.create_all(engine)
+    migrate_report_ids(engine)
+    for class_id, code in migrate_class_codes(engine):
+        logger.warning(
+            "class %s: code %r duplicates an older class's, left unjoinable until changed",
+            class_id, code,
+        )
+    migrate_friend_emails(engine)
+    migrate_pending_notifications(engine)
+    _ensure_indexes(engine)
+    ensure_search_index(engine)
+    ensure_change_log(engine)
+    ensure_severity_counts(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+
+
+def _ensure_indexes(engine):
+    # create_all skips tables that already exist, so indexes added to
+    # existing tables later on would never be created without this
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def create_illness_log(
     session: Session,
     log_in: LogCreate,
     user_id: int,
+    commit: bool = True,
 ) -> IllnessLog:
     db_log = IllnessLog(
         user_id=user_id,
@@ -35,6 +130,10 @@ def create_illness_log(
     )
 
     session.add(db_log)
+    if not commit:
+        # caller commits, e.g. together with its idempotency record
+        session.flush()
+        return db_log
     session.commit()
     session.refresh(db_log)
 
@@ -0,0 +1,244 @@
+"""
+Notification digests: one email per recipient per window.
+
+On a bad morning a professor gets a separate email for every sick student,
+and each one costs an SMTP round trip. With NOTIFY_DIGEST=true,
+notifications are written to the pendingnotification table instead of
+being sent. A flusher thread then sends each recipient one combined email
+in either of two cases:
+- their oldest pending message is NOTIFY_DIGEST_WINDOW_SECONDS old
+- they have NOTIFY_DIGEST_MAX_ITEMS messages waiting; adding one wakes
+  the flusher at once
+A recipient with a single pending message gets it unchanged.
+
+The buffer lives in the application database, so a restart loses nothing
+once the rows are committed. Friend notifications commit together with
+the request's idempotency record. Class fan-out (fanout.py) buffers its
+rows in a second transaction after the report's own commit, so a crash
+between the two loses that report's class notifications, as it would
+lose the queued emails without digests. A digest's rows are deleted after
+it is sent, so delivery is at least once: a crash between the two resends
+that digest.
+
+A failed send leaves the rows buffered and backs the recipient off,
+NOTIFY_DIGEST_RETRY_SECONDS doubling with each failure. After
+NOTIFY_DIGEST_MAX_ATTEMPTS failures the rows are dropped and counted as
+abandoned, so an address that always fails is not retried forever.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, or_, update
+from sqlmodel import Session, select
+
+from .models import PendingNotification
+from .notifications import send_email
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DIGEST = os.environ.get("NOTIFY_DIGEST", "false").lower() == "true"
+NOTIFY_DIGEST_WINDOW_SECONDS = float(os.environ.get("NOTIFY_DIGEST_WINDOW_SECONDS", "900"))
+NOTIFY_DIGEST_MAX_ITEMS = int(os.environ.get("NOTIFY_DIGEST_MAX_ITEMS", "20"))
+NOTIFY_DIGEST_RETRY_SECONDS = float(os.environ.get("NOTIFY_DIGEST_RETRY_SECONDS", "60"))
+NOTIFY_DIGEST_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_DIGEST_MAX_ATTEMPTS", "8"))
+
+
+def migrate_pending_notifications(engine) -> None:
+    """
+    Add the retry columns to pendingnotification tables from before them.
+    """
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info('pendingnotification')")}
+        if "attempts" not in columns:
+            conn.exec_driver_sql(
+                "ALTER TABLE pendingnotification ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+            )
+        if "next_attempt_at" not in columns:
+            conn.exec_driver_sql("ALTER TABLE pendingnotification ADD COLUMN next_attempt_at DATETIME")
+
+
+def render_digest(rows: list[PendingNotification]) -> tuple[str, str]:
+    subject = f"{len(rows)} updates from SickNote"
+    lines = [f"Hi, here is what you missed ({len(rows)} notifications):", ""]
+    for row in rows:
+        created_at = row.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        lines.append(f"[{created_at:%H:%M} UTC] {row.subject}")
+        lines.append(f"  {row.body}")
+        lines.append("")
+    return subject, "\n".join(lines).rstrip() + "\n"
+
+
+class DigestBuffer:
+    def __init__(
+        self,
+        enabled: bool = NOTIFY_DIGEST,
+        window_seconds: float = NOTIFY_DIGEST_WINDOW_SECONDS,
+        max_items: int = NOTIFY_DIGEST_MAX_ITEMS,
+        retry_seconds: float = NOTIFY_DIGEST_RETRY_SECONDS,
+        max_attempts: int = NOTIFY_DIGEST_MAX_ATTEMPTS,
+    ):
+        self.enabled = enabled
+        self.window = timedelta(seconds=window_seconds)
+        self.max_items = max_items
+        self.retry = timedelta(seconds=retry_seconds)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.buffered = 0
+        self.digests = 0
+        self.messages = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    def add(self, session: Session, messages, now: datetime | None = None) -> None:
+        """
+        Buffer (to, subject, body, from_address) messages in the caller's
+        transaction; they are visible to the flusher once it commits.
+        """
+        now = now or datetime.now(timezone.utc)
+        session.add_all(
+            PendingNotification(
+                recipient=to.strip().lower(),
+                subject=subject,
+                body=body,
+                from_address=from_address,
+                created_at=now,
+            )
+            for to, subject, body, from_address in messages
+        )
+        self.buffered += len(messages)
+        if messages:
+            # the size check only runs on the flusher, so nudge it
+            self._wake.set()
+
+    def flush(self, session: Session, now: datetime | None = None, force: bool = False) -> int:
+        """
+        Send a digest to every recipient that is due and not backing off
+        after a failure, or to everyone with force. Returns the number of
+        emails sent.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            statement = select(PendingNotification.recipient).group_by(
+                PendingNotification.recipient
+            )
+            if not force:
+                statement = statement.having(
+                    or_(
+                        func.count() >= self.max_items,
+                        func.min(PendingNotification.created_at) <= now - self.window,
+                    ),
+                    or_(
+                        func.max(PendingNotification.next_attempt_at).is_(None),
+                        func.max(PendingNotification.next_attempt_at) <= now,
+                    ),
+                )
+            recipients = session.exec(statement).all()
+
+            sent = 0
+            for recipient in recipients:
+                rows = session.exec(
+                    select(PendingNotification)
+                    .where(PendingNotification.recipient == recipient)
+                    .order_by(PendingNotification.id)
+                ).all()
+                if not rows:
+                    continue
+                if len(rows) == 1:
+                    subject, body, from_address = rows[0].subject, rows[0].body, rows[0].from_address
+                else:
+                    subject, body = render_digest(rows)
+                    from_address = None
+                try:
+                    send_email(to=recipient, subject=subject, body=body, from_address=from_address)
+                except Exception as exc:
+                    self._failed(session, recipient, rows, exc, now)
+                    continue
+                # by id, so messages buffered during the send wait for the next digest
+                session.exec(
+                    delete(PendingNotification).where(
+                        PendingNotification.id.in_([row.id for row in rows])
+                    )
+                )
+                session.commit()
+                sent += 1
+                self.digests += 1
+                self.messages += len(rows)
+            return sent
+
+    def _failed(self, session: Session, recipient: str, rows, exc: Exception, now: datetime) -> None:
+        self.failed += 1
+        ids = [row.id for row in rows]
+        attempts = max(row.attempts for row in rows) + 1
+        if attempts >= self.max_attempts:
+            logger.error(
+                "digest to %s failed %d times, dropping %d messages: %s",
+                recipient, attempts, len(rows), exc,
+            )
+            session.exec(delete(PendingNotification).where(PendingNotification.id.in_(ids)))
+            self.abandoned += len(rows)
+        else:
+            # left buffered; backs off 1x, 2x, 4x... the retry interval
+            logger.warning("digest to %s failed (attempt %d): %s", recipient, attempts, exc)
+            session.exec(
+                update(PendingNotification)
+                .where(PendingNotification.id.in_(ids))
+                .values(
+                    attempts=attempts,
+                    next_attempt_at=now + self.retry * 2 ** (attempts - 1),
+                )
+            )
+        session.commit()
+
+    def pending(self, session: Session) -> int:
+        return session.exec(select(func.count()).select_from(PendingNotification)).one()
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float | None = None) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        # check often enough that a digest is at most a few percent late
+        interval = interval or min(60.0, max(1.0, self.window.total_seconds() / 20))
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.flush(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("digest flush failed")
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=run, name="notification-digest", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buffered": self.buffered,
+            "digests_sent": self.digests,
+            "messages_delivered": self.messages,
+            # emails that would have gone out one by one, minus those sent
+            "emails_saved": self.messages - self.digests,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+        }
+
+
+digest_buffer = DigestBuffer()
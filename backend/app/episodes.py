@@ -0,0 +1,318 @@
+"""
+Illness episodes: a student's reports folded into the runs of sick days
+they describe.
+
+A report makes its student sick from its UTC day for SICK_DAYS days, the
+same rule trends use. An episode is a maximal run of such days without a
+healthy day in between. It keeps its start and end day, first and last
+report time, report count, peak and last severity, and the union of the
+symptom words. A week-long flu with five reports is one row, so analytics
+over sick intervals read one row per illness instead of every report.
+
+illnessepisode is derived from the change log (changes.py) and never
+written by request handlers. `sync` folds in the log entries after the
+cursor kept in episodesync:
+
+  * a report newer than the student's last one (the usual case) extends
+    or follows their last episode in place;
+  * deletes, updates and backdated reports recompute that student's
+    episodes from their reports, hot and archived;
+  * archive moves change nothing.
+
+Only the background job writes: it syncs every EPISODE_SYNC_SECONDS, and
+rebuilds the table from scratch on its first run or when change log
+compaction passes the cursor. Readers never wait on it or take the write
+lock. They check `current` for the students they read and, while the
+index is behind on any of them, read reports instead: the trend switches
+to source="reports", and `episodes` builds the student's episodes in
+memory.
+"""
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from .analytics import SICK_DAYS
+from .archive import user_reports
+from .changes import change_feed, last_seq
+from .models import ChangeLog, EpisodeSync, IllnessEpisode, IllnessLog, IllnessLogArchive
+from .summary import symptom_words
+
+logger = logging.getLogger(__name__)
+
+EPISODE_SYNC_SECONDS = float(os.environ.get("EPISODE_SYNC_SECONDS", "30"))
+EPISODE_SYNC_BATCH = 5000
+
+
+def _day(created_at: datetime) -> date:
+    # naive UTC, as SQLite hands it back
+    return created_at.date()
+
+
+def _start(user_id: int, created_at: datetime, severity: int, symptoms: str) -> IllnessEpisode:
+    return IllnessEpisode(
+        user_id=user_id,
+        start_day=_day(created_at),
+        end_day=_day(created_at) + timedelta(days=SICK_DAYS - 1),
+        first_report_at=created_at,
+        last_report_at=created_at,
+        report_count=1,
+        peak_severity=severity,
+        last_severity=severity,
+        symptoms=sorted(set(symptom_words(symptoms))),
+    )
+
+
+def _extends(episode: IllnessEpisode, created_at: datetime) -> bool:
+    # the report's first sick day is inside the episode or right after it
+    return _day(created_at) <= episode.end_day + timedelta(days=1)
+
+
+def _extend(episode: IllnessEpisode, created_at: datetime, severity: int, symptoms: str) -> None:
+    """
+    Add a report no older than the episode's last one.
+    """
+    episode.end_day = max(episode.end_day, _day(created_at) + timedelta(days=SICK_DAYS - 1))
+    episode.last_report_at = created_at
+    episode.report_count += 1
+    episode.peak_severity = max(episode.peak_severity, severity)
+    episode.last_severity = severity
+    merged = set(episode.symptoms) | set(symptom_words(symptoms))
+    if len(merged) != len(episode.symptoms):
+        episode.symptoms = sorted(merged)
+
+
+def build_episodes(user_id: int, reports: Iterable) -> list[IllnessEpisode]:
+    """
+    Episodes of one student from their reports, ordered by created_at.
+    """
+    episodes: list[IllnessEpisode] = []
+    for report in reports:
+        if episodes and _extends(episodes[-1], report.created_at):
+            _extend(episodes[-1], report.created_at, report.severity, report.symptoms)
+        else:
+            episodes.append(_start(user_id, report.created_at, report.severity, report.symptoms))
+    return episodes
+
+
+def _head(session: Session) -> int:
+    # an emptied log still remembers the last number it handed out
+    return last_seq(session) or change_feed.horizon(session)
+
+
+def _reports(session: Session, user_ids: list[int]) -> dict[int, list]:
+    by_user: dict[int, list] = {user_id: [] for user_id in user_ids}
+    for model in (IllnessLog, IllnessLogArchive):
+        for row in session.exec(
+            select(model.user_id, model.created_at, model.severity, model.symptoms)
+            .where(model.user_id.in_(user_ids))
+        ):
+            by_user.setdefault(row.user_id, []).append(row)
+    for rows in by_user.values():
+        rows.sort(key=lambda row: row.created_at)
+    return by_user
+
+
+class EpisodeIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.applied = 0
+        self.extended = 0
+        self.recomputed = 0
+        self.rebuilds = 0
+        self.stale_reads = 0
+
+    def recompute(self, session: Session, user_ids: Iterable[int]) -> None:
+        """
+        Replace the episodes of these students with ones built from their
+        reports. Does not commit.
+        """
+        user_ids = sorted(set(user_ids))
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            session.exec(delete(IllnessEpisode).where(IllnessEpisode.user_id.in_(chunk)))
+            for user_id, reports in _reports(session, chunk).items():
+                session.add_all(build_episodes(user_id, reports))
+        self.recomputed += len(user_ids)
+
+    def rebuild(self, session: Session) -> None:
+        """
+        Rebuild every episode and move the cursor to the end of the log.
+        Commits.
+        """
+        with self._lock:
+            self._claim(session)
+            seq = _head(session)
+            session.exec(delete(IllnessEpisode))
+            user_ids = set(session.exec(select(IllnessLog.user_id).distinct()).all())
+            user_ids |= set(session.exec(select(IllnessLogArchive.user_id).distinct()).all())
+            self.recompute(session, user_ids)
+            self._cursor(session).seq = seq
+            session.commit()
+            self.rebuilds += 1
+
+    def _claim(self, session: Session) -> None:
+        # take SQLite's write lock before reading the cursor, so workers
+        # syncing at the same time apply each entry once
+        session.exec(
+            EpisodeSync.__table__.insert().prefix_with("OR IGNORE").values(id=1, seq=0)
+        )
+
+    def _cursor(self, session: Session) -> EpisodeSync:
+        return session.get(EpisodeSync, 1, populate_existing=True)
+
+    def _seq(self, session: Session) -> int | None:
+        return session.exec(select(EpisodeSync.seq).where(EpisodeSync.id == 1)).first()
+
+    def current(self, session: Session, user_ids: Iterable[int]) -> bool:
+        """
+        Whether every logged change to these students' reports is folded
+        in. Reads only; the entries after the cursor are few, as the
+        background job keeps up, and reports by other students do not count.
+        """
+        seq = self._seq(session)
+        if seq is None or seq < change_feed.horizon(session):
+            stale = True
+        else:
+            pending = set(session.exec(
+                select(func.json_extract(ChangeLog.data, "$.user_id"))
+                .where(
+                    ChangeLog.id > seq,
+                    ChangeLog.table_name == IllnessLog.__tablename__,
+                    ChangeLog.op != "archive",
+                )
+                .distinct()
+            ).all())
+            stale = not pending.isdisjoint(user_ids)
+        self.stale_reads += stale
+        return not stale
+
+    def sync(self, session: Session) -> int:
+        """
+        Fold in the change log entries after the cursor. Returns how many
+        report changes were applied. Commits; for the background job.
+        """
+        # most calls find nothing to do; check before taking the write lock
+        seq = self._seq(session)
+        if seq is not None and seq >= _head(session):
+            return 0
+        if seq is None or seq < change_feed.horizon(session):
+            self.rebuild(session)
+            return 0
+
+        applied = 0
+        with self._lock:
+            self._claim(session)
+            cursor = self._cursor(session)
+            while True:
+                entries = session.exec(
+                    select(ChangeLog)
+                    .where(ChangeLog.id > cursor.seq)
+                    .order_by(ChangeLog.id)
+                    .limit(EPISODE_SYNC_BATCH)
+                ).all()
+                if not entries:
+                    break
+                applied += self._apply(session, entries)
+                cursor.seq = entries[-1].id
+                session.add(cursor)
+                session.flush()
+            session.commit()
+        self.applied += applied
+        return applied
+
+    def _apply(self, session: Session, entries: list[ChangeLog]) -> int:
+        stale: set[int] = set()
+        applied = 0
+        for entry in entries:
+            if entry.table_name != IllnessLog.__tablename__ or entry.op == "archive":
+                continue
+            applied += 1
+            user_id = entry.data["user_id"]
+            if user_id in stale:
+                continue
+            if entry.op != "insert":
+                stale.add(user_id)
+                continue
+
+            created_at = datetime.fromisoformat(entry.data["created_at"])
+            last = session.exec(
+                select(IllnessEpisode)
+                .where(IllnessEpisode.user_id == user_id)
+                .order_by(IllnessEpisode.end_day.desc())
+                .limit(1)
+            ).first()
+            if last is not None and created_at < last.last_report_at:
+                # backdated: it may land inside or between older episodes
+                stale.add(user_id)
+            elif last is not None and _extends(last, created_at):
+                _extend(last, created_at, entry.data["severity"], entry.data["symptoms"])
+                session.add(last)
+                self.extended += 1
+            else:
+                session.add(
+                    _start(user_id, created_at, entry.data["severity"], entry.data["symptoms"])
+                )
+            session.flush()
+        if stale:
+            self.recompute(session, stale)
+        return applied
+
+    def episodes(self, session: Session, user_id: int) -> list[IllnessEpisode]:
+        """
+        A student's episodes, most recent first. While the index is behind
+        they are built from the student's reports and have no id yet.
+        """
+        if not self.current(session, [user_id]):
+            return list(reversed(build_episodes(user_id, reversed(user_reports(session, user_id)))))
+        return session.exec(
+            select(IllnessEpisode)
+            .where(IllnessEpisode.user_id == user_id)
+            .order_by(IllnessEpisode.start_day.desc())
+        ).all()
+
+    def count(self, session: Session) -> int:
+        return session.exec(select(func.count()).select_from(IllnessEpisode)).one()
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float = EPISODE_SYNC_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.sync(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("episode sync failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="episode-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "applied": self.applied,
+            "extended": self.extended,
+            "recomputed_students": self.recomputed,
+            "rebuilds": self.rebuilds,
+            "stale_reads": self.stale_reads,
+        }
+
+
+episode_index = EpisodeIndex()
@@ -0,0 +1,179 @@
+"""
+Report notifications for a student's classes.
+
+When a student files a report with ?notify=true, the people in their
+classes hear about it, as far as their privacy setting allows:
+
+  everyone     professors and classmates
+  professors   professors only
+  friends      nobody; friends are notified by hand via /notify-friends
+
+The recipients are resolved in one query over ClassEnrollment, Class and
+User and deduplicated across classes. A classmate sharing three classes
+gets one email naming all three.
+
+With NOTIFY_DIGEST=true the emails are buffered for each recipient's next
+digest, see digest.py. Otherwise sending is handed to a worker thread, so
+a class of 300 costs the request one query and a queue put. The queue is bounded at
+FANOUT_QUEUE_SIZE emails. When it is full, new notifications are dropped
+and counted; they are not allowed to stall report creation.
+"""
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from .digest import digest_buffer
+from .models import Class, ClassEnrollment, IllnessLog, User
+from .notifications import send_email
+
+logger = logging.getLogger(__name__)
+
+FANOUT_QUEUE_SIZE = int(os.environ.get("FANOUT_QUEUE_SIZE", "10000"))
+
+_STOP = object()
+
+
+@dataclass
+class Recipient:
+    user_id: int
+    email: str
+    full_name: str | None
+    is_professor: bool = False
+    classes: list[str] = field(default_factory=list)
+
+
+def fanout_recipients(session: Session, student: User) -> list[Recipient]:
+    privacy = student.notification_privacy
+    if privacy not in ("everyone", "professors"):
+        return []
+
+    me = aliased(ClassEnrollment)
+    statement = (
+        select(User.id, User.email, User.full_name, User.id == Class.professor_id, Class.name)
+        .select_from(me)
+        .join(Class, Class.id == me.class_id)
+    )
+    if privacy == "everyone":
+        mate = aliased(ClassEnrollment)
+        statement = statement.outerjoin(mate, mate.class_id == Class.id).join(
+            User, or_(User.id == Class.professor_id, User.id == mate.student_id)
+        )
+    else:
+        statement = statement.join(User, User.id == Class.professor_id)
+    statement = (
+        statement.where(and_(me.student_id == student.id, User.id != student.id))
+        .distinct()
+        .order_by(User.id, Class.name)
+    )
+
+    recipients: dict[int, Recipient] = {}
+    for user_id, email, full_name, is_professor, class_name in session.exec(statement):
+        recipient = recipients.setdefault(user_id, Recipient(user_id, email, full_name))
+        recipient.is_professor = recipient.is_professor or bool(is_professor)
+        if class_name not in recipient.classes:
+            recipient.classes.append(class_name)
+    return list(recipients.values())
+
+
+def _message(student: User, log: IllnessLog, recipient: Recipient) -> tuple[str, str, str, str]:
+    name = student.full_name or student.email
+    classes = ", ".join(recipient.classes)
+    if recipient.is_professor:
+        body = (
+            f"Hi {recipient.full_name or 'Professor'}, {name} reported feeling sick "
+            f"(severity {log.severity}/5, expects to recover in {log.recoveryTime} days) "
+            f"and may miss {classes}."
+        )
+    else:
+        body = (
+            f"Hi {recipient.full_name or 'there'}, your classmate {name} from {classes} "
+            f"is not feeling well and will not be in class today."
+        )
+    return recipient.email, f"{name} is sick", body, student.email
+
+
+class NotificationFanout:
+    def __init__(self, queue_size: int = FANOUT_QUEUE_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="fanout", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Send what is already queued, then stop the worker.
+        """
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def notify(self, session: Session, student: User, log: IllnessLog) -> int:
+        """
+        Queue the emails for a new report; returns how many were queued.
+        Without a running worker (scripts, tests) they are sent inline.
+        """
+        messages = [_message(student, log, r) for r in fanout_recipients(session, student)]
+        if digest_buffer.enabled:
+            digest_buffer.add(session, messages)
+            session.commit()
+            return len(messages)
+        for message in messages:
+            if not self.running:
+                self._send(message)
+                continue
+            try:
+                self._queue.put_nowait(message)
+            except queue.Full:
+                self.dropped += 1
+        return len(messages)
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is _STOP:
+                break
+            self._send(message)
+
+    def _send(self, message) -> None:
+        to, subject, body, from_address = message
+        try:
+            send_email(to=to, subject=subject, body=body, from_address=from_address)
+            self.sent += 1
+        except Exception as exc:
+            # one bad address must not stop the rest of the class
+            logger.warning("fan-out email to %s failed: %s", to, exc)
+            self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+notification_fanout = NotificationFanout()
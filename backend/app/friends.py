@@ -0,0 +1,144 @@
+"""
+Friend lists: email normalization, bulk import and deduplication.
+
+Friend.friend_email is stored trimmed and lowercased, and
+(owner_user_id, friend_email) is unique, so "Sam@X.edu " and "sam@x.edu"
+are one friend and notify-friends emails each person once. The mapper
+hooks below normalize on every flush; bulk imports normalize up front and
+insert with ON CONFLICT DO NOTHING, so re-importing the same contact list
+adds only the new people.
+"""
+import csv
+import io
+import os
+
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from .models import Friend, FriendImportError, FriendImportResult, FriendRead
+
+FRIEND_IMPORT_MAX_ROWS = int(os.environ.get("FRIEND_IMPORT_MAX_ROWS", "1000"))
+# generous for FRIEND_IMPORT_MAX_ROWS contacts; checked before parsing
+FRIEND_IMPORT_MAX_BYTES = int(os.environ.get("FRIEND_IMPORT_MAX_BYTES", str(1024 * 1024)))
+# 3 bound parameters per row, well under SQLite's limit of 32766
+_INSERT_CHUNK = 500
+
+_NAME_COLUMNS = ("friend_name", "name", "full_name")
+_EMAIL_COLUMNS = ("friend_email", "email", "e-mail", "email address")
+
+_email = TypeAdapter(EmailStr)
+
+
+class InvalidImport(Exception):
+    pass
+
+
+def normalize_email(email: str | None) -> str | None:
+    if email is None:
+        return None
+    return email.strip().lower() or None
+
+
+@event.listens_for(Friend, "before_insert")
+@event.listens_for(Friend, "before_update")
+def _normalize_friend_email(mapper, connection, target):
+    target.friend_email = normalize_email(target.friend_email)
+
+
+def parse_csv(text: str) -> list[dict]:
+    """
+    Rows of a CSV contact list with a header row. Accepts the usual header
+    spellings (name/full_name, email/e-mail) as exported by mail clients.
+    """
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    headers = {(h or "").strip().lower(): h for h in reader.fieldnames or ()}
+    email_col = next((headers[c] for c in _EMAIL_COLUMNS if c in headers), None)
+    if email_col is None:
+        raise InvalidImport("CSV needs a header row with an email column")
+    name_col = next((headers[c] for c in _NAME_COLUMNS if c in headers), None)
+    return [
+        {"friend_name": row.get(name_col) if name_col else None, "friend_email": row.get(email_col)}
+        for row in reader
+    ]
+
+
+def import_friends(session: Session, owner_user_id: int, rows: list[dict]) -> FriendImportResult:
+    """
+    Add every new, valid friend in `rows` in one transaction. Commits.
+    """
+    if len(rows) > FRIEND_IMPORT_MAX_ROWS:
+        raise InvalidImport(f"At most {FRIEND_IMPORT_MAX_ROWS} friends per import")
+
+    result = FriendImportResult()
+    pending: dict[str, str] = {}
+    for number, row in enumerate(rows, start=1):
+        raw_email = row.get("friend_email")
+        email = normalize_email(raw_email) if isinstance(raw_email, str) else None
+        try:
+            _email.validate_python(email)
+        except ValidationError:
+            result.invalid.append(
+                FriendImportError(
+                    row=number,
+                    friend_email=raw_email if isinstance(raw_email, str) else None,
+                    reason="invalid email",
+                )
+            )
+            continue
+        if email in pending:
+            result.duplicates += 1
+            continue
+        name = row.get("friend_name")
+        name = name.strip() if isinstance(name, str) else ""
+        # contact exports often lack names; the mailbox name beats a blank
+        pending[email] = name or email.split("@", 1)[0]
+
+    values = [
+        {"owner_user_id": owner_user_id, "friend_name": name, "friend_email": email}
+        for email, name in pending.items()
+    ]
+    created = []
+    for start in range(0, len(values), _INSERT_CHUNK):
+        created.extend(
+            session.exec(
+                sqlite_insert(Friend)
+                .values(values[start:start + _INSERT_CHUNK])
+                .on_conflict_do_nothing(index_elements=["owner_user_id", "friend_email"])
+                .returning(Friend.id, Friend.friend_name, Friend.friend_email)
+            ).all()
+        )
+    session.commit()
+
+    result.duplicates += len(values) - len(created)
+    result.created = [
+        FriendRead(id=id, friend_name=name, friend_email=email)
+        for id, name, email in sorted(created)
+    ]
+    return result
+
+
+def migrate_friend_emails(engine) -> None:
+    """
+    Normalize stored friend emails and drop duplicate friends, keeping the
+    oldest row, so the unique index that init_db creates next can be built.
+    """
+    with engine.begin() as conn:
+        seen: set[tuple[int, str]] = set()
+        duplicates, renamed = [], []
+        for friend_id, owner_id, email in conn.exec_driver_sql(
+            "SELECT id, owner_user_id, friend_email FROM friend ORDER BY id"
+        ):
+            key = normalize_email(email) or ""
+            if (owner_id, key) in seen:
+                duplicates.append((friend_id,))
+                continue
+            seen.add((owner_id, key))
+            if key != email:
+                renamed.append((key, friend_id))
+
+        if duplicates:
+            conn.exec_driver_sql("DELETE FROM friend WHERE id = ?", duplicates)
+        if renamed:
+            conn.exec_driver_sql("UPDATE friend SET friend_email = ? WHERE id = ?", renamed)
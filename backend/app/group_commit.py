@@ -0,0 +1,161 @@
+"""
+Group commit for report inserts.
+
+SQLite has a single writer, so under bursts every request's own commit
+queues on the database lock (and eventually fails with "database is
+locked"). With REPORT_GROUP_COMMIT=true, create_report hands its row to one
+writer thread instead. The writer waits up to GROUP_COMMIT_MAX_DELAY_MS
+after the first pending insert, writes everything that arrived in one
+transaction and resolves each caller's future with its row id.
+
+A batch that fails to commit is retried one row at a time, so a bad row
+only fails its own request.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlmodel import Session
+
+from .models import IllnessLog, LogCreate
+
+REPORT_GROUP_COMMIT = os.environ.get("REPORT_GROUP_COMMIT", "false").lower() == "true"
+GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get("GROUP_COMMIT_MAX_DELAY_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", "256"))
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        max_delay_ms: float = GROUP_COMMIT_MAX_DELAY_MS,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+    ):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.batches = 0
+        self.rows = 0
+        self.fallbacks = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, engine) -> None:
+        if self.running:
+            return
+        self._engine = engine
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Flush what is already queued, then stop the writer.
+        """
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, log_in: LogCreate, user_id: int) -> Future:
+        future: Future = Future()
+        self._queue.put((
+            IllnessLog(
+                user_id=user_id,
+                symptoms=log_in.symptoms,
+                severity=log_in.severity,
+                recoveryTime=log_in.recoveryTime,
+            ),
+            future,
+        ))
+        return future
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+        # requests that raced stop() still get written
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        if leftovers:
+            self._write(leftovers)
+
+    def _write(self, batch) -> None:
+        try:
+            with Session(self._engine) as session:
+                session.add_all(log for log, _ in batch)
+                session.flush()
+                # read ids before commit expires the rows
+                ids = [log.id for log, _ in batch]
+                session.commit()
+        except Exception:
+            self.fallbacks += 1
+            self._write_one_by_one(batch)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), log_id in zip(batch, ids):
+            future.set_result(log_id)
+
+    def _write_one_by_one(self, batch) -> None:
+        for log, future in batch:
+            row = IllnessLog(
+                user_id=log.user_id,
+                symptoms=log.symptoms,
+                severity=log.severity,
+                recoveryTime=log.recoveryTime,
+                created_at=log.created_at,
+            )
+            try:
+                with Session(self._engine) as session:
+                    session.add(row)
+                    session.commit()
+                    future.set_result(row.id)
+                self.rows += 1
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else None,
+            "fallbacks": self.fallbacks,
+        }
+
+
+report_writer = GroupCommitWriter()
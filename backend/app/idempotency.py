@@ -0,0 +1,176 @@
+"""
+Idempotency-Key support for non-idempotent POSTs.
+
+A client that retries a request with the same Idempotency-Key header gets
+the response of the first attempt back instead of running the write again.
+Keys are scoped per user and endpoint and kept for IDEMPOTENCY_TTL_SECONDS.
+
+Flow for an endpoint:
+
+    replay = idempotency_store.replay(session, user_id, scope, key, payload)
+    if replay is not None:
+        return replay
+    record = idempotency_store.claim(session, user_id, scope, key, payload)
+    ... do the work ...
+    idempotency_store.complete(session, record, status_code, body)
+    session.commit()
+
+When the work is purely database writes, claim and complete go into the
+same transaction as the writes: a concurrent retry then fails on the unique
+index at commit and can replay the winner. Work with outside side effects
+(email) commits the claim first, so a concurrent retry sees it in flight.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_SWEEP_SECONDS = float(os.environ.get("IDEMPOTENCY_SWEEP_SECONDS", "300"))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(payload) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive UTC datetimes
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        ttl: float = IDEMPOTENCY_TTL_SECONDS,
+        sweep_interval: float = IDEMPOTENCY_SWEEP_SECONDS,
+    ):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self._last_sweep = float("-inf")
+        self.replays = 0
+        self.swept = 0
+
+    def _find(self, session: Session, user_id: int, scope: str, key: str):
+        # served by ux_idempotencyrecord_user_scope_key
+        return session.exec(
+            select(IdempotencyRecord).where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.scope == scope,
+                IdempotencyRecord.key == key,
+            )
+        ).first()
+
+    def replay(self, session: Session, user_id: int, scope: str, key: str | None, payload):
+        """
+        The stored response for this key, or None if the request should run.
+        """
+        if key is None:
+            return None
+        if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Invalid Idempotency-Key header")
+
+        record = self._find(session, user_id, scope, key)
+        if record is None:
+            return None
+        if _as_utc(record.expires_at) <= datetime.now(timezone.utc):
+            # expired but not swept yet: free the key for this request
+            session.delete(record)
+            session.commit()
+            return None
+        if record.fingerprint != fingerprint(payload):
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        if record.status_code is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+
+        self.replays += 1
+        return JSONResponse(
+            content=record.response_body,
+            status_code=record.status_code,
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    def claim(self, session: Session, user_id: int, scope: str, key: str | None, payload):
+        """
+        Add an in-flight record for the key to the session. Returns None when
+        the request carries no key.
+        """
+        if key is None:
+            return None
+        self.maybe_sweep(session)
+        now = datetime.now(timezone.utc)
+        record = IdempotencyRecord(
+            user_id=user_id,
+            scope=scope,
+            key=key,
+            fingerprint=fingerprint(payload),
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl),
+        )
+        session.add(record)
+        return record
+
+    def complete(self, session: Session, record, status_code: int, body) -> None:
+        if record is None:
+            return
+        record.status_code = status_code
+        record.response_body = body
+        session.add(record)
+
+    def release(self, session: Session, record) -> None:
+        """
+        Forget a claim whose request failed, so a retry can run it again.
+        """
+        if record is None:
+            return
+        session.delete(record)
+        session.commit()
+
+    def sweep(self, session: Session, now: datetime | None = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        # stored naive, as SQLite hands them back
+        cutoff = now.astimezone(timezone.utc).replace(tzinfo=None)
+        result = session.exec(
+            delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= cutoff)
+        )
+        session.commit()
+        self.swept += result.rowcount
+        return result.rowcount
+
+    def maybe_sweep(self, session: Session) -> int:
+        started = time.monotonic()
+        with self._lock:
+            if started - self._last_sweep < self.sweep_interval:
+                return 0
+            self._last_sweep = started
+        return self.sweep(session)
+
+    def stats(self) -> dict:
+        return {"replays": self.replays, "swept": self.swept}
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,141 @@
+"""
+Cross-worker cache invalidation over the application database.
+
+Writers append (namespace, key) rows to the cacheinvalidation table in the
+same transaction as the change that made a cache entry stale. Every worker
+tails the table with an id cursor and hands new rows to the handlers it
+subscribed for that namespace.
+
+Staleness bound: `sync()` polls at most once per `max_delay` seconds, and
+cached reads call it first. A poll sees every invalidation committed before
+it started, so no worker serves an entry invalidated more than `max_delay`
+seconds ago. SQLite runs one writer at a time and the table uses
+AUTOINCREMENT, so id order is commit order and ids are never reused.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable
+
+from sqlalchemy import delete, func, insert, select
+from sqlmodel import Session
+
+from .models import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_MAX_DELAY = float(os.environ.get("INVALIDATION_MAX_DELAY", "1.0"))
+INVALIDATION_RETENTION_SECONDS = float(
+    os.environ.get("INVALIDATION_RETENTION_SECONDS", "3600")
+)
+
+
+class InvalidationBus:
+    def __init__(self, max_delay: float = INVALIDATION_MAX_DELAY):
+        self.max_delay = max_delay
+        self._handlers: dict[str, list[Callable[[str], None]]] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.cursor: int | None = None
+            self._last_sync = float("-inf")
+            self.received = 0
+
+    def subscribe(self, namespace: str, handler: Callable[[str], None]) -> None:
+        self._handlers.setdefault(namespace, []).append(handler)
+
+    def publish(self, session: Session, namespace: str, keys: Iterable) -> None:
+        """
+        Record invalidations inside the caller's transaction; they become
+        visible to other workers when it commits and vanish on rollback.
+        """
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"namespace": namespace, "key": str(key), "created_at": now} for key in keys
+        ]
+        if rows:
+            # Core insert on the session's connection: safe inside flush events
+            session.connection().execute(insert(CacheInvalidation), rows)
+
+    def sync(self, session: Session, force: bool = False) -> int:
+        """
+        Apply invalidations committed by any worker since the last poll.
+        Returns how many were applied.
+        """
+        started = time.monotonic()
+        if not force and started - self._last_sync < self.max_delay:
+            return 0
+
+        with self._lock:
+            conn = session.connection()
+            if self.cursor is None:
+                # nothing is cached before the first sync, so history is irrelevant
+                self.cursor = conn.execute(select(func.max(CacheInvalidation.id))).scalar() or 0
+                self._last_sync = started
+                return 0
+
+            rows = conn.execute(
+                select(
+                    CacheInvalidation.id,
+                    CacheInvalidation.namespace,
+                    CacheInvalidation.key,
+                )
+                .where(CacheInvalidation.id > self.cursor)
+                .order_by(CacheInvalidation.id)
+            ).all()
+            for _, namespace, key in rows:
+                for handler in self._handlers.get(namespace, ()):
+                    handler(key)
+            if rows:
+                self.cursor = rows[-1][0]
+            self._last_sync = started
+            self.received += len(rows)
+            return len(rows)
+
+    def prune(self, session: Session, retention: float = INVALIDATION_RETENTION_SECONDS) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention)
+        result = session.exec(
+            delete(CacheInvalidation).where(CacheInvalidation.created_at < cutoff)
+        )
+        session.commit()
+        return result.rowcount
+
+    def start(self, engine) -> None:
+        """
+        Poll in the background too, so entries are dropped even in workers
+        that are not serving cached reads.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            last_prune = time.monotonic()
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.sync(session, force=True)
+                        if time.monotonic() - last_prune > INVALIDATION_RETENTION_SECONDS / 4:
+                            self.prune(session)
+                            last_prune = time.monotonic()
+                except Exception:  # keep polling across DB hiccups
+                    logger.exception("invalidation bus poll failed")
+                self._stop.wait(self.max_delay)
+
+        self._thread = threading.Thread(target=run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"cursor": self.cursor, "received": self.received}
+
+
+invalidation_bus = InvalidationBus()
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
 from datetime import datetime, timezone
+import csv
+import threading
 from sqlalchemy.exc import IntegrityError
 
-from .db import init_db, get_session, create_illness_log
+from .db import engine, init_db, get_session, create_illness_log, read_transaction
 from .models import (
     LogCreate,
     LogRead,
@@ -13,6 +15,7 @@ from .models import (
     NotifyRequest,
     SummaryResponse,
     IllnessLog,
+    IllnessLogArchive,
     User,
     LoginRequest,
     LoginResponse,
@@ -24,16 +27,51 @@ from .models import (
     ClassCreate,
     JoinClassRequest,
     FriendCreate,
+    FriendImportRequest,
+    FriendImportResult,
     PrivacyUpdate,
     PrivacyRead,
     UserCreate,
+    TrendResponse,
+    AlertsResponse,
+    TopSymptomsResponse,
+    StudentPage,
+    BootstrapResponse,
+    SearchResponse,
+    ChangesResponse,
+    SeverityDistribution,
+    EpisodeRead,
 )
+from . import admission
+from .admission import AdmissionControlMiddleware
+from .alerts import outbreak_detector
+from .analytics import TREND_SOURCE, class_trend
+from .archive import user_reports
 from .notifications import send_email
+from .severity import rebuild as rebuild_severity_counts, severity_counters
+from .sketch import symptom_sketches
+from .tracing import TracingMiddleware, chrome_trace, tracer
+from .token_cache import claims_cache
+from .search import InvalidSearchQuery, search_reports
+from .summary import owns_class, seconds_until_status_change, student_page, summarize_class
+from .backup import BackupError, list_snapshots, take_snapshot
+from .cache import summary_cache
+from .changes import CHANGES_MAX_LIMIT, CursorExpired, change_feed
+from .classes import class_resolver, enroll
+from .friends import FRIEND_IMPORT_MAX_BYTES, InvalidImport, import_friends, parse_csv
+from .digest import digest_buffer
+from .episodes import episode_index
+from .fanout import notification_fanout
+from .group_commit import REPORT_GROUP_COMMIT, report_writer
+from .idempotency import idempotency_store
+from .invalidation import invalidation_bus
 from .security import (
     authenticate_user,
     create_access_token,
     get_password_hash,
     get_current_user,  # <-- must exist in security.py
+    get_current_admin,
+    warm_up,
 )
 
 # FastAPI
@@ -46,6 +84,11 @@ origins = [
     "http://127.0.0.1:5173",
 ]
 
+# inside CORS, so shed responses still carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+# outside admission control, so time spent queued shows up in traces
+app.add_middleware(TracingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -58,6 +101,33 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     init_db()
+    threading.Thread(target=warm_up, name="auth-warm-up", daemon=True).start()
+    outbreak_detector.start(engine)
+    invalidation_bus.start(engine)
+    change_feed.start(engine)
+    severity_counters.start(engine)
+    episode_index.start(engine)
+    symptom_sketches.start(engine)
+    notification_fanout.start()
+    if digest_buffer.enabled:
+        digest_buffer.start(engine)
+    if REPORT_GROUP_COMMIT:
+        report_writer.start(engine)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    report_writer.stop()
+    notification_fanout.stop()
+    digest_buffer.stop()
+    outbreak_detector.stop()
+    invalidation_bus.stop()
+    change_feed.stop()
+    severity_counters.stop()
+    episode_index.stop()
+    symptom_sketches.stop()
+    with Session(engine) as session:
+        symptom_sketches.snapshot(session)
 
 
 # Just a basic check to see if its working not related to project.
@@ -66,6 +136,28 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics")
+def get_metrics(admin: User = Depends(get_current_admin)):
+    """
+    Counters for the in-process caches and background jobs. Admins only.
+    """
+    return {
+        "summary_cache": summary_cache.stats(),
+        "invalidation_bus": invalidation_bus.stats(),
+        "idempotency": idempotency_store.stats(),
+        "group_commit": report_writer.stats(),
+        "fanout": notification_fanout.stats(),
+        "digest": digest_buffer.stats(),
+        "class_codes": class_resolver.stats(),
+        "admission": admission.stats(),
+        "tracing": tracer.stats(),
+        "changes": change_feed.stats(),
+        "auth_claims": claims_cache.stats(),
+        "severity": severity_counters.stats(),
+        "episodes": episode_index.stats(),
+    }
+
+
 # ---------------------- Illness Reports ----------------------
 
 
@@ -76,14 +168,53 @@ def health_check():
 )
 def create_report(
     log_data: LogCreate,
+    notify: bool = False,
+    idempotency_key: str | None = Header(default=None),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
+    """
+    File a report. With ?notify=true the professors and, privacy allowing,
+    classmates of the student's classes are emailed in the background.
+    """
+    scope = "POST /api/reports"
+    payload = log_data.model_dump()
+    replay = idempotency_store.replay(session, current_user.id, scope, idempotency_key, payload)
+    if replay is not None:
+        return replay
+
+    if idempotency_key is None and report_writer.running:
+        # group commit: the writer thread batches concurrent inserts
+        log_id = report_writer.submit(log_data, current_user.id).result()
+        db_log = session.get(IllnessLog, log_id)
+        if notify:
+            notification_fanout.notify(session, current_user, db_log)
+        return db_log
+
+    # the log and its idempotency record commit together
+    record = idempotency_store.claim(session, current_user.id, scope, idempotency_key, payload)
     db_log = create_illness_log(
         session=session,
         log_in=log_data,
         user_id=current_user.id,
+        commit=record is None,
     )
+    if record is not None:
+        # serialize what the database holds, as a non-idempotent request would
+        session.refresh(db_log)
+        body = LogRead.model_validate(db_log).model_dump(mode="json")
+        idempotency_store.complete(session, record, status.HTTP_201_CREATED, body)
+        try:
+            session.commit()
+        except IntegrityError:
+            # a concurrent retry with the same key committed first
+            session.rollback()
+            return idempotency_store.replay(
+                session, current_user.id, scope, idempotency_key, payload
+            )
+
+    if notify:
+        notification_fanout.notify(session, current_user, db_log)
     return db_log
 
 
@@ -94,14 +225,21 @@ def list_reports(
 ):
     """
     Return all illness logs for the current user,
-    most recent first.
+    most recent first, archived ones included.
     """
-    logs = session.exec(
-        select(IllnessLog)
-        .where(IllnessLog.user_id == current_user.id)
-        .order_by(IllnessLog.created_at.desc())
-    ).all()
-    return logs
+    return user_reports(session, current_user.id)
+
+
+@app.get("/api/episodes", response_model=list[EpisodeRead])
+def list_episodes(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The current user's illnesses, most recent first: their reports merged
+    into runs of sick days, with peak severity and all symptoms reported.
+    """
+    return episode_index.episodes(session, current_user.id)
 
 
 @app.delete("/api/reports")
@@ -115,6 +253,10 @@ def delete_all_reports(
     logs = session.exec(
         select(IllnessLog).where(IllnessLog.user_id == current_user.id)
     ).all()
+    archived = session.exec(
+        select(IllnessLogArchive).where(IllnessLogArchive.user_id == current_user.id)
+    ).all()
+    logs = [*logs, *archived]
     count = len(logs)
 
     for log in logs:
@@ -140,6 +282,13 @@ def delete_report(
             IllnessLog.user_id == current_user.id,
         )
     ).first()
+    if not log:
+        log = session.exec(
+            select(IllnessLogArchive).where(
+                IllnessLogArchive.id == log_id,
+                IllnessLogArchive.user_id == current_user.id,
+            )
+        ).first()
 
     if not log:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -150,6 +299,68 @@ def delete_report(
     return {"message": "Report deleted", "log_id": log_id}
 
 
+# ---------------------- Bootstrap ----------------------
+
+BOOTSTRAP_FIELDS = ("reports", "friends", "privacy", "classes")
+
+
+@app.get("/api/me/bootstrap", response_model=BootstrapResponse)
+def get_bootstrap(
+    fields: str | None = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Everything the home page loads after login in one round trip:
+    reports, friends, privacy setting and classes. `fields` is a comma
+    separated subset of those; all of them by default.
+    """
+    wanted = set(BOOTSTRAP_FIELDS)
+    if fields:
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - set(BOOTSTRAP_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. "
+                       f"Must be among: {', '.join(BOOTSTRAP_FIELDS)}",
+            )
+
+    response = BootstrapResponse(
+        id=current_user.id,
+        email=current_user.email,
+        full_name=current_user.full_name,
+        role=current_user.role,
+    )
+    if "privacy" in wanted:
+        response.privacy = PrivacyRead(
+            notification_privacy=current_user.notification_privacy
+        )
+
+    with read_transaction(session):
+        if "reports" in wanted:
+            response.reports = user_reports(session, current_user.id)
+
+        if "friends" in wanted:
+            response.friends = session.exec(
+                select(Friend).where(Friend.owner_user_id == current_user.id)
+            ).all()
+
+        if "classes" in wanted:
+            if current_user.role == "professor":
+                classes_query = select(Class).where(Class.professor_id == current_user.id)
+            else:
+                classes_query = (
+                    select(Class)
+                    .join(ClassEnrollment, ClassEnrollment.class_id == Class.id)
+                    .where(ClassEnrollment.student_id == current_user.id)
+                    .distinct()
+                )
+            response.classes = session.exec(classes_query).all()
+
+    return response
+
+
 # ---------------------- Friends ----------------------
 
 
@@ -176,18 +387,69 @@ def create_friend(
         friend_email=payload.friend_email,
     )
     session.add(friend)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Already in your friends list")
     session.refresh(friend)
     return friend
 
 
+async def friend_import_rows(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> list[dict]:
+    # parsed on the event loop so the import itself can run as a sync
+    # endpoint; only for a logged-in user, and only up to a size cap
+    too_large = HTTPException(
+        status_code=413, detail=f"Friend lists are limited to {FRIEND_IMPORT_MAX_BYTES} bytes"
+    )
+    if int(request.headers.get("content-length") or 0) > FRIEND_IMPORT_MAX_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > FRIEND_IMPORT_MAX_BYTES:
+            raise too_large
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            return parse_csv(body.decode("utf-8"))
+        return FriendImportRequest.model_validate_json(body).friends
+    except (InvalidImport, UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read friend list: {e}")
+
+
+@app.post("/friends/import", response_model=FriendImportResult)
+def import_friend_list(
+    rows: list[dict] = Depends(friend_import_rows),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Add many friends at once from JSON ({"friends": [{friend_name,
+    friend_email}, ...]}) or a CSV contact list (Content-Type: text/csv).
+    Friends already on the list and bad rows are reported, not fatal.
+    """
+    try:
+        return import_friends(session, current_user.id, rows)
+    except InvalidImport as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
 @app.post("/notify-friends")
 def notify_friends(
     payload: NotifyRequest,
+    idempotency_key: str | None = Header(default=None),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
     user = current_user
+    scope = "POST /notify-friends"
+    request_body = payload.model_dump()
+    replay = idempotency_store.replay(session, user.id, scope, idempotency_key, request_body)
+    if replay is not None:
+        return replay
 
     # Block if privacy is professors-only
     if user.notification_privacy == "professors":
@@ -209,16 +471,42 @@ def notify_friends(
     if not friends:
         raise HTTPException(status_code=400, detail="No valid friends found")
 
-    for friend in friends:
-        send_email(
-            to=friend.friend_email,
-            subject="Your friend is sick",
-            body=f"Hi {friend.friend_name}, your friend {user.full_name} is not feeling well, and"
-                 f" will not be in class today.",
-            from_address=user.email,
+    # emails cannot be rolled back, so the claim is committed before sending
+    # and a concurrent retry sees the request in flight
+    record = idempotency_store.claim(session, user.id, scope, idempotency_key, request_body)
+    if record is not None:
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return idempotency_store.replay(session, user.id, scope, idempotency_key, request_body)
+
+    messages = [
+        (
+            friend.friend_email,
+            "Your friend is sick",
+            f"Hi {friend.friend_name}, your friend {user.full_name} is not feeling well, and"
+            f" will not be in class today.",
+            user.email,
         )
-
-    return {"notified_count": len(friends)}
+        for friend in friends
+    ]
+    if digest_buffer.enabled:
+        # buffered rows commit together with the idempotency record below
+        digest_buffer.add(session, messages)
+    else:
+        try:
+            for to, subject, body, from_address in messages:
+                send_email(to=to, subject=subject, body=body, from_address=from_address)
+        except Exception:
+            idempotency_store.release(session, record)
+            raise
+
+    result = {"notified_count": len(friends)}
+    if record is not None:
+        idempotency_store.complete(session, record, status.HTTP_200_OK, result)
+    session.commit()
+    return result
 
 
 @app.delete("/friends/{friend_id}")
@@ -245,12 +533,46 @@ def delete_friend(
 # ---------------------- Class Summary (Professor) ----------------------
 
 
+@app.get("/api/classes/{class_id}/severity", response_model=SeverityDistribution)
+def get_class_severity(
+    class_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Sick students by latest severity, with median and p90, read from
+    counters kept up to date on every write; the cost does not grow with
+    the class or its reports.
+    """
+    if not owns_class(session, class_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Class not found")
+    return severity_counters.distribution(session, class_id)
+
+
 @app.get("/api/classes/{class_id}/summary", response_model=SummaryResponse)
 def get_class_summary(
     class_id: int,
+    include_students: bool = True,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ):
+    """
+    Headline health stats for a class. Large classes should pass
+    include_students=false and page through /api/classes/{class_id}/students.
+    Students who keep their reports from professors only count towards
+    the aggregates.
+    """
+    # before the cache: a cached summary is still only for its professor
+    if not owns_class(session, class_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    variant = "full" if include_students else "headline"
+    invalidation_bus.sync(session)
+    cached = summary_cache.get(class_id, variant)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    generation = summary_cache.generation(class_id)
 
     enrollments = session.exec(
         select(ClassEnrollment).where(ClassEnrollment.class_id == class_id)
@@ -265,90 +587,155 @@ def get_class_summary(
 
     student_ids = [e.student_id for e in enrollments]
 
-    logs = session.exec(
-        select(IllnessLog)
-        .where(IllnessLog.user_id.in_(student_ids))
-        .order_by(IllnessLog.created_at.desc())
+    summary = summarize_class(session, student_ids, include_students=include_students)
+    body = summary.model_dump_json()
+
+    summary_cache.set(
+        class_id,
+        variant,
+        body,
+        generation,
+        ttl=seconds_until_status_change(session, student_ids),
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/classes/{class_id}/students", response_model=StudentPage)
+def get_class_students(
+    class_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    sort: str = Query("name", pattern="^(severity|latest|name)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    sick_only: bool = False,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Paginated, sortable list of a class's students and their latest report.
+    """
+    if not owns_class(session, class_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    return student_page(
+        session,
+        class_id,
+        page=page,
+        page_size=page_size,
+        sort=sort,
+        order=order,
+        sick_only=sick_only,
+    )
+
+
+@app.get("/api/classes/{class_id}/trend", response_model=TrendResponse)
+def get_class_trend(
+    class_id: int,
+    days: int = Query(30, ge=1, le=366),
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    source: str = Query(TREND_SOURCE, pattern="^(episodes|reports)$"),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Sick count, new reports and mean severity per day or week
+    for the students enrolled in a class. Sick counts come from illness
+    episodes or, with source=reports or while the episode index catches
+    up, from the reports themselves; both give the same numbers.
+    """
+    if not owns_class(session, class_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    student_ids = session.exec(
+        select(ClassEnrollment.student_id).where(ClassEnrollment.class_id == class_id)
     ).all()
 
-    latest_by_student: dict[int, IllnessLog] = {}
-    for log in logs:
-        if log.user_id not in latest_by_student:
-            latest_by_student[log.user_id] = log
-
-    users = session.exec(select(User).where(User.id.in_(student_ids))).all()
-    user_by_id = {u.id: u for u in users}
-
-    now = datetime.now(timezone.utc)
-    SICK_DAYS = 7
-
-    students_health: list[StudentHealth] = []
-    severities: list[int] = []
-    symptom_freq: dict[str, int] = {}
-
-    for sid in student_ids:
-        user = user_by_id.get(sid)
-        latest = latest_by_student.get(sid)
-
-        is_sick = False
-        latest_symptoms = None
-        latest_severity = None
-        latest_created_at = None
-
-        if latest:
-            latest_created_at = latest.created_at
-            latest_symptoms = latest.symptoms
-            latest_severity = latest.severity
-
-            created_at = latest.created_at
-            if created_at.tzinfo is None:
-                created_at = created_at.replace(tzinfo=timezone.utc)
-
-            if (now - created_at).days < SICK_DAYS:
-                is_sick = True
-                severities.append(latest.severity)
-                for word in latest.symptoms.replace(",", " ").split():
-                    w = word.strip().lower()
-                    if w:
-                        symptom_freq[w] = symptom_freq.get(w, 0) + 1
-
-        students_health.append(
-            StudentHealth(
-                student_id=sid,
-                full_name=user.full_name if user else None,
-                email=user.email if user else "unknown",
-                is_sick=is_sick,
-                latest_symptoms=latest_symptoms,
-                latest_severity=latest_severity,
-                latest_created_at=latest_created_at,
-            )
-        )
+    # the index is synced in the background; never write on a read
+    if source == "episodes" and not episode_index.current(session, student_ids):
+        source = "reports"
+    buckets = class_trend(session, student_ids, days=days, bucket=bucket, source=source)
+    return TrendResponse(class_id=class_id, bucket=bucket, days=days, buckets=buckets)
 
-    if not students_health:
-        return SummaryResponse(
-            available=False,
-            message="No illness reports yet for this class.",
-            students=[],
-        )
 
-    sick_students = [s for s in students_health if s.is_sick]
-    count = len(sick_students)
-    avg_severity = sum(severities) / len(severities) if severities else None
-
-    common_symptoms_sorted = sorted(
-        symptom_freq.items(), key=lambda x: x[1], reverse=True
-    )[:5]
-    common_symptoms_list = [symptom for symptom, _ in common_symptoms_sorted] or None
-
-    return SummaryResponse(
-        available=True,
-        count=count,
-        avg_severity=round(avg_severity, 2) if avg_severity is not None else None,
-        common_symptoms=common_symptoms_list,
-        message="Class health summary generated successfully",
-        students=students_health,
+@app.get("/api/alerts", response_model=AlertsResponse)
+def get_alerts(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Outbreak alerts for the campus and the current professor's classes.
+    """
+    if current_user.role != "professor":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    # pick up reports filed since the last background poll, cheap by design
+    outbreak_detector.refresh(session)
+
+    classes = session.exec(
+        select(Class).where(Class.professor_id == current_user.id)
+    ).all()
+    class_by_id = {c.id: c for c in classes}
+
+    alerts = []
+    for alert in outbreak_detector.alerts():
+        if alert.class_id is not None:
+            if alert.class_id not in class_by_id:
+                continue
+            alert.class_name = class_by_id[alert.class_id].name
+        alerts.append(alert)
+
+    return AlertsResponse(generated_at=datetime.now(timezone.utc), alerts=alerts)
+
+
+@app.get("/api/symptoms/top", response_model=TopSymptomsResponse)
+def get_top_symptoms(
+    days: int = Query(7, ge=1, le=31),
+    k: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Approximate most reported symptoms across all classes, as of the
+    sketches' last background refresh.
+    """
+    if current_user.role != "professor":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    symptoms, total, error_bound = symptom_sketches.top(days=days, k=k)
+    return TopSymptomsResponse(
+        days=days, total_words=total, error_bound=error_bound, symptoms=symptoms
     )
 
+
+@app.get("/api/search/reports", response_model=SearchResponse)
+def search_class_reports(
+    q: str = Query(..., min_length=1, max_length=200),
+    class_id: int | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Full-text search over the symptoms reported by students in the current
+    professor's classes, or in one of them with `class_id`. `q` uses FTS5
+    syntax, e.g. `fever AND rash` or `cough*`.
+    """
+    if current_user.role != "professor":
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    class_ids = session.exec(
+        select(Class.id).where(Class.professor_id == current_user.id)
+    ).all()
+    if class_id is not None:
+        if class_id not in class_ids:
+            raise HTTPException(status_code=404, detail="Class not found")
+        class_ids = [class_id]
+
+    try:
+        return search_reports(session, q, class_ids, page=page, page_size=page_size)
+    except InvalidSearchQuery as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {exc}")
+
 #privacy
 
 @app.get("/api/settings/privacy", response_model=PrivacyRead)
@@ -488,7 +875,11 @@ def create_professor_class(
         professor_id=professor_id,
     )
     session.add(new_class)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Class code already in use")
     session.refresh(new_class)
     return new_class
 
@@ -558,40 +949,26 @@ def join_class_by_code(
     if current_user.role != "student" or current_user.id != student_id:
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    clazz = session.exec(
-        select(Class).where(Class.code == payload.code)
-    ).first()
-
-    if not clazz:
+    # another worker may have just deleted or recoded a class
+    invalidation_bus.sync(session)
+    found = class_resolver.resolve(session, payload.code)
+    if not found:
         raise HTTPException(status_code=404, detail="Class with this code not found")
+    class_id, class_name = found
 
-    existing = session.exec(
-        select(ClassEnrollment).where(
-            ClassEnrollment.class_id == clazz.id,
-            ClassEnrollment.student_id == student_id,
-        )
-    ).first()
-
-    if existing:
+    enrollment_id = enroll(session, class_id, student_id)
+    if enrollment_id is None:
         return {
             "message": "You are already enrolled in this class",
-            "class_id": clazz.id,
-            "class_name": clazz.name,
+            "class_id": class_id,
+            "class_name": class_name,
         }
 
-    enrollment = ClassEnrollment(
-        class_id=clazz.id,
-        student_id=student_id,
-    )
-    session.add(enrollment)
-    session.commit()
-    session.refresh(enrollment)
-
     return {
         "message": "Successfully joined class",
-        "class_id": clazz.id,
-        "class_name": clazz.name,
-        "enrollment_id": enrollment.id,
+        "class_id": class_id,
+        "class_name": class_name,
+        "enrollment_id": enrollment_id,
     }
 
 
@@ -622,4 +999,122 @@ def leave_class(
         "message": "Student removed from class",
         "class_id": class_id,
         "student_id": student_id,
-    }
\ No newline at end of file
+    }
+
+# ---------------------- Admin ----------------------
+
+
+@app.post("/api/admin/backups", status_code=status.HTTP_201_CREATED)
+def create_backup(
+    compress: bool = False,
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Take an online snapshot of the database; requests keep being served
+    while it runs. Restore with `python backup_db.py restore <file>`.
+    """
+    try:
+        return take_snapshot(compress=compress)
+    except BackupError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+
+
+@app.get("/api/admin/backups")
+def get_backups(admin: User = Depends(get_current_admin)):
+    return list_snapshots()
+
+
+@app.get("/api/admin/severity-counts/verify")
+def verify_severity_counts(
+    session: Session = Depends(get_session),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Recompute every class's severity counts from the reports and list the
+    classes whose counters disagree. Changes nothing; see rebuild.
+    """
+    return {"mismatched": severity_counters.verify(session)}
+
+
+@app.post("/api/admin/severity-counts/rebuild")
+def rebuild_severity_count_tables(
+    session: Session = Depends(get_session),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Rebuild the severity counters from the reports and enrollments, and
+    list the classes that disagreed before.
+    """
+    mismatched = severity_counters.verify(session)
+    rebuild_severity_counts(session)
+    return {"mismatched": mismatched, "rebuilt": True}
+
+
+@app.get("/api/changes", response_model=ChangesResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=CHANGES_MAX_LIMIT),
+    session: Session = Depends(get_session),
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Changes to reports, classes, enrollments and friends after sequence
+    number `since`, oldest first. Start at 0 and pass back next_cursor
+    until has_more is false. 410 means the cursor fell behind retention.
+    """
+    try:
+        return change_feed.read(session, since, limit)
+    except CursorExpired as exc:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(exc))
+
+
+def _traces_response(traces, format: str, spans: bool = True):
+    if format == "chrome":
+        return chrome_trace(traces)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or chrome")
+    return [t.to_dict(spans=spans) for t in traces]
+
+
+@app.get("/api/admin/traces")
+def get_traces(
+    route: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    format: str = "json",
+    admin: User = Depends(get_current_admin),
+):
+    """
+    Most recent sampled requests, newest first. `route` is the route
+    template, e.g. /api/classes/{class_id}/summary.
+    """
+    return _traces_response(tracer.recent(route, limit), format, spans=format == "chrome")
+
+
+@app.get("/api/admin/traces/slowest")
+def get_slowest_traces(
+    route: str | None = None,
+    n: int = Query(10, ge=1, le=100),
+    format: str = "json",
+    admin: User = Depends(get_current_admin),
+):
+    """
+    The slowest sampled requests of each route, slowest first.
+    """
+    slowest = tracer.slowest(route, n)
+    if format == "chrome":
+        return chrome_trace(t for traces in slowest.values() for t in traces)
+    return {r: _traces_response(traces, format, spans=False) for r, traces in slowest.items()}
+
+
+@app.get("/api/admin/traces/{trace_id}")
+def get_trace(
+    trace_id: str,
+    format: str = "json",
+    admin: User = Depends(get_current_admin),
+):
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have been evicted)")
+    if format == "chrome":
+        return chrome_trace([trace])
+    return _traces_response([trace], format)[0]
@@ -1,6 +1,7 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import Index
 from pydantic import validator, EmailStr
 
 class LogCreate(SQLModel):
@@ -28,12 +29,57 @@ class LogCreate(SQLModel):
 
 # For Illness Log
 class IllnessLog(SQLModel, table=True):
+    # (user_id, created_at) backs "latest report per student" and trend range scans;
+    # AUTOINCREMENT so a deleted newest report's id is never handed out again
+    __table_args__ = (
+        Index("ix_illnesslog_user_id_created_at", "user_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     symptoms: str
     severity: int = Field(index=True)  # 1..5
     recoveryTime: int
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
+
+class IllnessLogArchive(SQLModel, table=True):
+    # cold copy of illnesslog rows older than the archive horizon; ids are kept
+    __table_args__ = (
+        Index("ix_illnesslogarchive_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id: int = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    symptoms: str
+    severity: int
+    recoveryTime: int
+    created_at: datetime = Field(index=True)
+    archived_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class IllnessEpisode(SQLModel, table=True):
+    # a student's run of reports with no healthy day in between, see episodes.py
+    __table_args__ = (
+        Index("ix_illnessepisode_user_id_end_day", "user_id", "end_day"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    start_day: date  # UTC day of the first report
+    end_day: date  # last sick day: day of the last report + SICK_DAYS - 1
+    first_report_at: datetime
+    last_report_at: datetime
+    report_count: int
+    peak_severity: int
+    last_severity: int
+    symptoms: list = Field(default_factory=list, sa_column=Column(JSON))  # union of symptom words
+
+class EpisodeSync(SQLModel, table=True):
+    # single row: the last change log entry folded into illnessepisode
+    id: int = Field(default=1, primary_key=True)
+    seq: int = 0
 
 class LogRead(LogCreate):
     id: int
@@ -41,6 +87,11 @@ class LogRead(LogCreate):
 
 # For Friends Lists
 class Friend(SQLModel, table=True):
+    # friend_email is stored trimmed and lowercased, see friends.py
+    __table_args__ = (
+        Index("ux_friend_owner_user_id_friend_email", "owner_user_id", "friend_email", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_user_id: int
     friend_name: str
@@ -55,6 +106,20 @@ class FriendCreate(SQLModel):
     friend_name: str
     friend_email: EmailStr
 
+class FriendImportRequest(SQLModel):
+    # rows are validated one by one so a bad row does not sink the import
+    friends: List[dict]
+
+class FriendImportError(SQLModel):
+    row: int  # 1-based position in the upload
+    friend_email: Optional[str] = None
+    reason: str
+
+class FriendImportResult(SQLModel):
+    created: List[FriendRead] = Field(default_factory=list)
+    duplicates: int = 0  # already a friend, or repeated within the upload
+    invalid: List[FriendImportError] = Field(default_factory=list)
+
 class NotifyRequest(SQLModel):
     friend_ids: List[int]
 
@@ -64,12 +129,19 @@ class Class(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     code: Optional[str] = None  # e.g. "CS101 A1"
+    # code uppercased with whitespace removed ("CS101A1"); set on flush,
+    # see classes.py. Unique so a code names at most one class.
+    code_key: Optional[str] = Field(default=None, unique=True, index=True)
     professor_id: int = Field(foreign_key="user.id")
 
 class ClassEnrollment(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_classenrollment_class_id_student_id", "class_id", "student_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     class_id: int = Field(foreign_key="class.id")
-    student_id: int = Field(foreign_key="user.id")
+    student_id: int = Field(foreign_key="user.id", index=True)
 
 class ClassRead(SQLModel):
     id: int
@@ -94,11 +166,181 @@ class SummaryResponse(SQLModel):
     count: Optional[int] = None  # number of sick students
     avg_severity: Optional[float] = None
     common_symptoms: Optional[List[str]] = None
+    # latest severity of sick students: counts for 1..5 and nearest-rank percentiles
+    severity_histogram: Optional[List[int]] = None
+    severity_p50: Optional[int] = None
+    severity_p90: Optional[int] = None
     message: Optional[str] = None
 
     # per-student health rows
     students: List[StudentHealth] = Field(default_factory=list)
 
+class SeverityDistribution(SQLModel):
+    # from the per-class counters in severity.py, without reading any report
+    class_id: int
+    count: int  # number of sick students
+    avg_severity: Optional[float] = None
+    severity_histogram: List[int]  # sick students by latest severity, 1..5
+    severity_p50: Optional[int] = None
+    severity_p90: Optional[int] = None
+
+class EpisodeRead(SQLModel):
+    id: Optional[int] = None  # None until the episode index has caught up
+    start_day: date
+    end_day: date
+    first_report_at: datetime
+    last_report_at: datetime
+    report_count: int
+    peak_severity: int
+    last_severity: int
+    symptoms: List[str]
+
+class TrendBucket(SQLModel):
+    start: date
+    sick_count: int  # students sick at the end of the bucket
+    new_reports: int
+    avg_severity: Optional[float] = None
+
+class TrendResponse(SQLModel):
+    class_id: int
+    bucket: str  # "day" or "week"
+    days: int
+    buckets: List[TrendBucket] = Field(default_factory=list)
+
+class OutbreakAlert(SQLModel):
+    scope: str  # "class" or "campus"
+    class_id: Optional[int] = None
+    class_name: Optional[str] = None
+    count_24h: int
+    count_7d: int
+    baseline_daily: float  # mean reports per day over the previous 6 days
+    z_score: float
+
+class AlertsResponse(SQLModel):
+    generated_at: datetime
+    alerts: List[OutbreakAlert] = Field(default_factory=list)
+
+class SketchSnapshot(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    cursor: int = 0  # last IllnessLog.id folded into the payload
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CacheInvalidation(SQLModel, table=True):
+    # AUTOINCREMENT: ids only grow, even after old rows are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    namespace: str  # which cache, e.g. "summary"
+    key: str
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
+
+class PendingNotification(SQLModel, table=True):
+    # an email waiting to be folded into its recipient's next digest
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recipient: str = Field(index=True)  # lowercased address
+    subject: str
+    body: str
+    from_address: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    attempts: int = 0  # failed sends of the digest holding it
+    next_attempt_at: Optional[datetime] = None  # backed off until then
+
+class SickStudent(SQLModel, table=True):
+    # kept by triggers, see severity.py: the severity of the student's
+    # latest report inside the sick window, and when that report ages out
+    student_id: int = Field(primary_key=True)
+    severity: int
+    sick_until: datetime = Field(index=True)
+
+class ClassSeverityCount(SQLModel, table=True):
+    # kept by triggers, see severity.py: enrolled students with a
+    # SickStudent row of this severity
+    class_id: int = Field(primary_key=True)
+    severity: int = Field(primary_key=True)
+    students: int = 0
+
+class ChangeLog(SQLModel, table=True):
+    # written by triggers, see changes.py; AUTOINCREMENT so the sequence
+    # number only grows, even after compaction empties the table
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)  # sequence number
+    table_name: str  # illnesslog, classenrollment, class or friend
+    op: str  # insert, update, delete or archive
+    row_id: int
+    data: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), index=True
+    )
+
+class ChangeRead(SQLModel):
+    seq: int
+    table: str
+    op: str
+    row_id: int
+    data: Optional[dict] = None
+    created_at: datetime
+
+class ChangesResponse(SQLModel):
+    changes: List[ChangeRead] = Field(default_factory=list)
+    next_cursor: int  # pass as `since` to continue
+    has_more: bool
+
+class IdempotencyRecord(SQLModel, table=True):
+    # one row per (user, endpoint, Idempotency-Key); the stored response is
+    # replayed to retries until expires_at
+    __table_args__ = (
+        Index("ux_idempotencyrecord_user_scope_key", "user_id", "scope", "key", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    scope: str  # e.g. "POST /api/reports"
+    key: str
+    fingerprint: str  # hash of the request body the key was first used with
+    status_code: Optional[int] = None  # None while the request is in flight
+    response_body: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    expires_at: datetime = Field(index=True)
+
+class SearchHit(SQLModel):
+    log_id: int
+    student_id: int
+    full_name: Optional[str] = None
+    email: str
+    symptoms: str
+    snippet: str  # matched terms wrapped in [brackets]
+    severity: int
+    created_at: datetime
+    score: float  # bm25, lower is a better match
+
+class SearchResponse(SQLModel):
+    query: str
+    total: int
+    page: int
+    page_size: int
+    hits: List[SearchHit] = Field(default_factory=list)
+
+class SymptomCount(SQLModel):
+    symptom: str
+    count: int  # upper bound on the true count
+    error: int  # true count is at least count - error
+
+class TopSymptomsResponse(SQLModel):
+    days: int
+    total_words: int
+    error_bound: int  # no count is off by more than this
+    symptoms: List[SymptomCount] = Field(default_factory=list)
+
+class StudentPage(SQLModel):
+    total: int  # students matching the filter, across all pages
+    page: int
+    page_size: int
+    students: List[StudentHealth] = Field(default_factory=list)
+
 class AddStudentRequest(SQLModel):
     student_email: EmailStr
 
@@ -147,4 +389,13 @@ class JoinClassRequest(SQLModel):
     student_id: int
     code: str
 
-
+class BootstrapResponse(SQLModel):
+    # everything the home page needs after login; fields not requested stay None
+    id: int
+    email: EmailStr
+    full_name: Optional[str] = None
+    role: str
+    reports: Optional[List[LogRead]] = None
+    friends: Optional[List[FriendRead]] = None
+    privacy: Optional[PrivacyRead] = None
+    classes: Optional[List[ClassRead]] = None
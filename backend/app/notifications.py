@@ -2,6 +2,8 @@ import os
 import smtplib
 from email.message import EmailMessage
 
+from .tracing import traced
+
 # environment variables for SMTP account
 SMTP_HOST = os.environ.get("SMTP_HOST")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
@@ -11,6 +13,7 @@ SMTP_FROM = os.environ.get("SMTP_FROM", SMTP_USER)
 USE_SMTP = os.environ.get("USE_SMTP", "false").lower() == "true"
 
 
+@traced("email.send")
 def send_email(
     to: str,
     subject: str,
@@ -0,0 +1,171 @@
+"""
+Full-text search over report symptoms with SQLite FTS5.
+
+illnesslog_fts is an external-content FTS5 table over illnesslog.symptoms:
+it stores only the index, and triggers on illnesslog keep it in sync. The
+porter tokenizer matches word forms ("cough" finds "coughing") and the
+prefix indexes make short prefix queries ("fev*") index lookups.
+
+Queries use FTS5 syntax: `fever AND rash`, `fever OR chills`, `"sore
+throat"`, `cough NOT dry`, `fev*`. Results are ranked by bm25.
+"""
+from datetime import datetime
+
+from sqlalchemy import DDL, bindparam, event, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from .models import IllnessLog, SearchHit, SearchResponse
+from .summary import PROFESSOR_VISIBLE_PRIVACY
+
+FTS_TABLE = "illnesslog_fts"
+
+_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    " symptoms, content='illnesslog', content_rowid='id',"
+    " tokenize='porter unicode61', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS illnesslog_fts_insert AFTER INSERT ON illnesslog BEGIN"
+    f" INSERT INTO {FTS_TABLE}(rowid, symptoms) VALUES (new.id, new.symptoms);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS illnesslog_fts_delete AFTER DELETE ON illnesslog BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, symptoms) VALUES ('delete', old.id, old.symptoms);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS illnesslog_fts_update AFTER UPDATE OF symptoms ON illnesslog BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, symptoms) VALUES ('delete', old.id, old.symptoms);"
+    f" INSERT INTO {FTS_TABLE}(rowid, symptoms) VALUES (new.id, new.symptoms);"
+    " END",
+]
+
+for _statement in _CREATE:
+    event.listen(IllnessLog.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+# the triggers go with the table; the index must go explicitly, or a
+# recreated illnesslog would inherit stale entries
+event.listen(
+    IllnessLog.__table__,
+    "after_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
+
+
+def ensure_search_index(engine) -> None:
+    """
+    Create the index on databases whose illnesslog predates it, and fill it
+    from the existing rows.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        for statement in _CREATE:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+_SEARCH = f"""
+    SELECT l.id, l.user_id, u.full_name, u.email, l.symptoms,
+           snippet({FTS_TABLE}, 0, '[', ']', '...', 12) AS snippet,
+           l.severity, l.created_at, bm25({FTS_TABLE}) AS score
+    FROM {FTS_TABLE}
+    JOIN illnesslog AS l ON l.id = {FTS_TABLE}.rowid
+    JOIN "user" AS u ON u.id = l.user_id
+    WHERE {FTS_TABLE} MATCH :query
+      AND l.user_id IN (
+          SELECT e.student_id FROM classenrollment AS e
+          JOIN "user" AS v ON v.id = e.student_id
+          WHERE e.class_id IN :class_ids
+            AND v.notification_privacy IN :visible
+      )
+    ORDER BY {FTS_TABLE}.rank, l.id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_COUNT = f"""
+    SELECT count(*)
+    FROM {FTS_TABLE}
+    JOIN illnesslog AS l ON l.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH :query
+      AND l.user_id IN (
+          SELECT e.student_id FROM classenrollment AS e
+          JOIN "user" AS v ON v.id = e.student_id
+          WHERE e.class_id IN :class_ids
+            AND v.notification_privacy IN :visible
+      )
+"""
+
+
+class InvalidSearchQuery(ValueError):
+    pass
+
+
+# what FTS5 says about a malformed MATCH query; column filters such as
+# "col:word" or "-word" name a column the index lacks, unqualified
+_QUERY_ERRORS = ("fts5: syntax error", "unterminated string", "unknown special query")
+
+
+def _is_query_error(exc: OperationalError) -> bool:
+    message = str(exc.orig)
+    if message.startswith(_QUERY_ERRORS):
+        return True
+    return message.startswith("no such column: ") and "." not in message
+
+
+def search_reports(
+    session: Session,
+    query: str,
+    class_ids: list[int],
+    page: int = 1,
+    page_size: int = 20,
+) -> SearchResponse:
+    """
+    Reports by students enrolled in `class_ids` whose symptoms match the
+    FTS5 `query`, best match first. Students who keep their reports from
+    professors never match.
+    """
+    response = SearchResponse(query=query, total=0, page=page, page_size=page_size, hits=[])
+    if not class_ids:
+        return response
+
+    params = {
+        "query": query,
+        "class_ids": list(class_ids),
+        "visible": list(PROFESSOR_VISIBLE_PRIVACY),
+    }
+    expanding = (bindparam("class_ids", expanding=True), bindparam("visible", expanding=True))
+    conn = session.connection()
+    try:
+        response.total = conn.execute(text(_COUNT).bindparams(*expanding), params).scalar()
+        rows = conn.execute(
+            text(_SEARCH).bindparams(*expanding),
+            {**params, "limit": page_size, "offset": (page - 1) * page_size},
+        ).all()
+    except OperationalError as exc:
+        # FTS5 reports malformed queries as errors at execution time; the
+        # rest (a locked database, a missing index) are not the query's fault
+        if not _is_query_error(exc):
+            raise
+        raise InvalidSearchQuery(str(exc.orig)) from exc
+
+    response.hits = [
+        SearchHit(
+            log_id=row.id,
+            student_id=row.user_id,
+            full_name=row.full_name,
+            email=row.email,
+            symptoms=row.symptoms,
+            snippet=row.snippet,
+            severity=row.severity,
+            created_at=_as_datetime(row.created_at),
+            score=row.score,
+        )
+        for row in rows
+    ]
+    return response
+
+
+def _as_datetime(value) -> datetime:
+    # text() queries skip the ORM's type processing
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
@@ -1,25 +1,45 @@
+import functools
+import os
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+# jose.jwt loads the crypto backends and passlib its handler registry, a
+# good part of startup; both are imported on first use or by warm_up
+from jose import JWTError
 from sqlmodel import Session, select
 
 from .models import User
 from .db import get_session
+from .token_cache import claims_cache, token_digest
+from .tracing import traced
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 
 # password hashing
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+@functools.cache
+def password_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 
+@traced("auth.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
+
+def warm_up() -> None:
+    """
+    Load what the first login needs. The startup hook runs this on a
+    thread, so a new worker serves requests before it is done.
+    """
+    from jose import jwt  # noqa: F401
+
+    password_context()
 
 
 def authenticate_user(session: Session, email: str, password: str) -> Optional[User]:
@@ -36,11 +56,55 @@ def authenticate_user(session: Session, email: str, password: str) -> Optional[U
 
 
 # JWT
-SECRET_KEY = "change-me-in-production"  # fine for class
+SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "change-me-in-production")  # fine for class
+# comma separated keys that still verify tokens during a rotation
+PREVIOUS_SECRET_KEYS = [
+    key.strip() for key in os.environ.get("JWT_PREVIOUS_SECRET_KEYS", "").split(",") if key.strip()
+]
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 
+def set_secret_keys(current: str, previous: Iterable[str] = ()) -> None:
+    """
+    Sign with `current` from now on and accept tokens signed with it or
+    any of `previous`. Drops every cached claim, so tokens signed with a
+    key no longer listed stop working at once.
+    """
+    global SECRET_KEY, PREVIOUS_SECRET_KEYS
+    SECRET_KEY, PREVIOUS_SECRET_KEYS = current, list(previous)
+    claims_cache.clear()
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Validated claims of a token; raises JWTError. Repeat tokens are
+    answered from claims_cache until they expire.
+    """
+    digest = token_digest(token)
+    claims = claims_cache.get(digest)
+    if claims is not None:
+        return claims
+
+    from jose import jwt
+    from jose.exceptions import ExpiredSignatureError
+
+    generation = claims_cache.generation
+    error: JWTError | None = None
+    for key in [SECRET_KEY, *PREVIOUS_SECRET_KEYS]:
+        try:
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM])
+        except ExpiredSignatureError:
+            # the signature matched; another key will not make it valid
+            raise
+        except JWTError as exc:
+            error = exc
+            continue
+        claims_cache.put(digest, claims, generation)
+        return claims
+    raise error
+
+
 def create_access_token(
     data: Dict[str, Any],
     expires_delta: Optional[timedelta] = None,
@@ -51,12 +115,15 @@ def create_access_token(
     )
     to_encode.update({"exp": expire})
 
+    from jose import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+@traced("auth.get_current_user")
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: Session = Depends(get_session),
@@ -67,7 +134,7 @@ def get_current_user(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str | None = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -82,3 +149,17 @@ def get_current_user(
         raise credentials_exception
 
     return user
+
+
+# comma separated emails of the operators allowed to use /api/admin
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.environ.get("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+
+
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return current_user
@@ -0,0 +1,343 @@
+"""
+Per-class counters of sick students by severity.
+
+A student is sick while their latest report is less than SICK_DAYS old,
+and counts with that report's severity, the same as in class summaries.
+Two tables hold this state:
+
+  sickstudent          one row per sick student: the latest report's
+                       severity and sick_until, when that report ages out
+  classseveritycount   per class and severity, the enrolled students
+                       with a sickstudent row of that severity
+
+SQLite triggers keep both current in the writing transaction. A report
+insert, update or delete recomputes its student's row from their few
+recent reports and moves them between buckets of every class they take.
+Enrollments and class deletes adjust the counts of that one class.
+Triggers also see Core writes, such as group commit and archiving.
+
+Time is the one thing no trigger sees. A sickstudent row past sick_until
+still counts, so a read subtracts this class's rows that are due; the
+sick_until index keeps that to the students who recovered since the last
+sweep. Every SEVERITY_EXPIRE_SECONDS a sweep drops due rows and
+decrements their buckets. A distribution is therefore two small
+indexed reads, whatever the size of the class or its history.
+
+`verify` recomputes every class from illnesslog and reports where the
+counters disagree; `rebuild` resets them from scratch.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DDL, event, text
+from sqlmodel import Session
+
+from .analytics import SICK_DAYS
+from .models import Class, ClassEnrollment, IllnessLog, SeverityDistribution
+from .summary import SEVERITY_LEVELS, severity_percentile
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_EXPIRE_SECONDS = float(os.environ.get("SEVERITY_EXPIRE_SECONDS", "60"))
+
+# the format of trigger timestamps; sorts like SQLAlchemy's stored datetimes
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_CUTOFF = f"strftime('%Y-%m-%d %H:%M:%f', 'now', '-{SICK_DAYS} days')"
+
+
+def _recompute(student: str) -> list[str]:
+    """
+    Trigger body that moves `student` out of their buckets, recomputes
+    their sickstudent row and moves them back in.
+    """
+    return [
+        "UPDATE classseveritycount SET students = students - 1"
+        " WHERE (class_id, severity) IN ("
+        "  SELECT e.class_id, s.severity FROM sickstudent AS s"
+        "  JOIN classenrollment AS e ON e.student_id = s.student_id"
+        f"  WHERE s.student_id = {student});",
+        f"DELETE FROM sickstudent WHERE student_id = {student};",
+        "INSERT INTO sickstudent (student_id, severity, sick_until)"
+        f" SELECT user_id, severity,"
+        f"  strftime('%Y-%m-%d %H:%M:%f', created_at, '+{SICK_DAYS} days')"
+        f" FROM illnesslog WHERE user_id = {student} AND created_at > {_CUTOFF}"
+        " ORDER BY created_at DESC, id DESC LIMIT 1;",
+        "INSERT INTO classseveritycount (class_id, severity, students)"
+        " SELECT e.class_id, s.severity, 1 FROM sickstudent AS s"
+        " JOIN classenrollment AS e ON e.student_id = s.student_id"
+        f" WHERE s.student_id = {student}"
+        " ON CONFLICT (class_id, severity) DO UPDATE SET students = students + 1;",
+    ]
+
+
+def _enroll(row: str) -> list[str]:
+    return [
+        "INSERT INTO classseveritycount (class_id, severity, students)"
+        f" SELECT {row}.class_id, severity, 1 FROM sickstudent WHERE student_id = {row}.student_id"
+        " ON CONFLICT (class_id, severity) DO UPDATE SET students = students + 1;"
+    ]
+
+
+def _unenroll(row: str) -> list[str]:
+    return [
+        "UPDATE classseveritycount SET students = students - 1"
+        f" WHERE class_id = {row}.class_id"
+        f" AND severity = (SELECT severity FROM sickstudent WHERE student_id = {row}.student_id);"
+    ]
+
+
+def _trigger(name: str, event_sql: str, table: str, body: list[str]) -> str:
+    return (
+        f'CREATE TRIGGER IF NOT EXISTS {name} AFTER {event_sql} ON "{table}" BEGIN '
+        + " ".join(body)
+        + " END"
+    )
+
+
+_TRIGGERS = {
+    IllnessLog.__table__: [
+        _trigger("illnesslog_severity_insert", "INSERT", "illnesslog", _recompute("new.user_id")),
+        _trigger("illnesslog_severity_delete", "DELETE", "illnesslog", _recompute("old.user_id")),
+        _trigger(
+            "illnesslog_severity_update", "UPDATE OF user_id, severity, created_at", "illnesslog",
+            _recompute("old.user_id") + _recompute("new.user_id"),
+        ),
+    ],
+    ClassEnrollment.__table__: [
+        _trigger("classenrollment_severity_insert", "INSERT", "classenrollment", _enroll("new")),
+        _trigger("classenrollment_severity_delete", "DELETE", "classenrollment", _unenroll("old")),
+        _trigger(
+            "classenrollment_severity_update", "UPDATE", "classenrollment",
+            _unenroll("old") + _enroll("new"),
+        ),
+    ],
+    Class.__table__: [
+        _trigger(
+            "class_severity_delete", "DELETE", "class",
+            ["DELETE FROM classseveritycount WHERE class_id = old.id;"],
+        ),
+    ],
+}
+
+for _table, _statements in _TRIGGERS.items():
+    for _statement in _statements:
+        # DDL %-formats its text
+        event.listen(
+            _table, "after_create",
+            DDL(_statement.replace("%", "%%")).execute_if(dialect="sqlite"),
+        )
+
+
+def ensure_severity_counts(engine) -> None:
+    """
+    Create the triggers on databases whose tables predate them, and fill
+    the counters from the existing reports.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'illnesslog_severity_insert'"
+        ).first()
+        for statements in _TRIGGERS.values():
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+    if not exists:
+        with Session(engine) as session:
+            rebuild(session)
+
+
+def _sql_time(moment: datetime) -> str:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime("%Y-%m-%d %H:%M:%S.") + f"{moment.microsecond // 1000:03d}"
+
+
+_DUE = """
+    SELECT e.class_id, s.severity, count(*)
+    FROM sickstudent AS s
+    JOIN classenrollment AS e ON e.student_id = s.student_id
+    WHERE s.sick_until <= :now
+    GROUP BY e.class_id, s.severity
+"""
+
+# driven by the sick_until index, so the cost is the students who recovered
+# since the last sweep, not the size of the class
+_CLASS_DUE = """
+    SELECT s.severity, count(*)
+    FROM sickstudent AS s
+    WHERE s.sick_until <= :now
+      AND EXISTS (
+          SELECT 1 FROM classenrollment AS e
+          WHERE e.class_id = :class_id AND e.student_id = s.student_id
+      )
+    GROUP BY s.severity
+"""
+
+_LATEST = """
+    SELECT user_id, severity, created_at FROM (
+        SELECT user_id, severity, created_at,
+               row_number() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) AS n
+        FROM illnesslog
+        WHERE created_at > :cutoff
+    ) WHERE n = 1
+"""
+
+
+def rebuild(session: Session, now: datetime | None = None) -> None:
+    """
+    Recompute both tables from illnesslog and classenrollment. Commits.
+    """
+    now = now or datetime.now(timezone.utc)
+    session.exec(text("DELETE FROM classseveritycount"))
+    session.exec(text("DELETE FROM sickstudent"))
+    session.exec(
+        text(
+            "INSERT INTO sickstudent (student_id, severity, sick_until)"
+            f" SELECT user_id, severity, strftime('%Y-%m-%d %H:%M:%f', created_at, '+{SICK_DAYS} days')"
+            f" FROM ({_LATEST})"
+        ),
+        params={"cutoff": _sql_time(now - timedelta(days=SICK_DAYS))},
+    )
+    session.exec(
+        text(
+            "INSERT INTO classseveritycount (class_id, severity, students)"
+            " SELECT e.class_id, s.severity, count(*) FROM sickstudent AS s"
+            " JOIN classenrollment AS e ON e.student_id = s.student_id"
+            " GROUP BY e.class_id, s.severity"
+        )
+    )
+    session.commit()
+
+
+class SeverityCounters:
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.reads = 0
+        self.expired = 0
+
+    def distribution(
+        self, session: Session, class_id: int, now: datetime | None = None
+    ) -> SeverityDistribution:
+        """
+        The class's sick students by latest severity, from the counters.
+        """
+        now = now or datetime.now(timezone.utc)
+        counts: dict[int, int] = {}
+        for severity, students in session.exec(
+            text("SELECT severity, students FROM classseveritycount WHERE class_id = :class_id"),
+            params={"class_id": class_id},
+        ):
+            counts[severity] = students
+        for severity, due in session.exec(
+            text(_CLASS_DUE), params={"class_id": class_id, "now": _sql_time(now)}
+        ):
+            counts[severity] = counts.get(severity, 0) - due
+        self.reads += 1
+
+        histogram = [max(0, counts.get(level, 0)) for level in range(1, SEVERITY_LEVELS + 1)]
+        count = sum(n for n in counts.values() if n > 0)
+        total = sum(severity * n for severity, n in counts.items() if n > 0)
+        return SeverityDistribution(
+            class_id=class_id,
+            count=count,
+            avg_severity=round(total / count, 2) if count else None,
+            severity_histogram=histogram,
+            severity_p50=severity_percentile(histogram, 0.5),
+            severity_p90=severity_percentile(histogram, 0.9),
+        )
+
+    def expire(self, session: Session, now: datetime | None = None) -> int:
+        """
+        Drop the students whose latest report aged out and take them out of
+        their classes' buckets. Returns how many recovered. Commits.
+        """
+        params = {"now": _sql_time(now or datetime.now(timezone.utc))}
+        session.exec(
+            text(
+                "UPDATE classseveritycount SET students = students - ("
+                "  SELECT count(*) FROM sickstudent AS s"
+                "  JOIN classenrollment AS e ON e.student_id = s.student_id"
+                "  WHERE s.sick_until <= :now"
+                "    AND e.class_id = classseveritycount.class_id"
+                "    AND s.severity = classseveritycount.severity"
+                f") WHERE (class_id, severity) IN (SELECT class_id, severity FROM ({_DUE}))"
+            ),
+            params=params,
+        )
+        recovered = session.exec(
+            text("DELETE FROM sickstudent WHERE sick_until <= :now"), params=params
+        ).rowcount
+        session.exec(text("DELETE FROM classseveritycount WHERE students <= 0"))
+        session.commit()
+        self.expired += recovered
+        return recovered
+
+    def verify(self, session: Session, now: datetime | None = None) -> dict[int, dict]:
+        """
+        Recompute every class from illnesslog and compare with the
+        counters. Returns {class_id: {"expected": ..., "counted": ...}},
+        by severity, for the classes that disagree.
+        """
+        now = now or datetime.now(timezone.utc)
+        expected: dict[tuple[int, int], int] = {}
+        for class_id, severity, students in session.exec(
+            text(
+                "SELECT e.class_id, l.severity, count(*) FROM classenrollment AS e"
+                f" JOIN ({_LATEST}) AS l ON l.user_id = e.student_id"
+                " GROUP BY e.class_id, l.severity"
+            ),
+            params={"cutoff": _sql_time(now - timedelta(days=SICK_DAYS))},
+        ):
+            expected[(class_id, severity)] = students
+
+        counted: dict[tuple[int, int], int] = {}
+        for class_id, severity, students in session.exec(
+            text("SELECT class_id, severity, students FROM classseveritycount")
+        ):
+            counted[(class_id, severity)] = students
+        for class_id, severity, due in session.exec(text(_DUE), params={"now": _sql_time(now)}):
+            counted[(class_id, severity)] = counted.get((class_id, severity), 0) - due
+
+        mismatched: dict[int, dict] = {}
+        for key in expected.keys() | counted.keys():
+            if expected.get(key, 0) != counted.get(key, 0):
+                class_id, severity = key
+                entry = mismatched.setdefault(class_id, {"expected": {}, "counted": {}})
+                entry["expected"][severity] = expected.get(key, 0)
+                entry["counted"][severity] = counted.get(key, 0)
+        return mismatched
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float = SEVERITY_EXPIRE_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.expire(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("severity counter expiry failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="severity-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"reads": self.reads, "expired": self.expired}
+
+
+severity_counters = SeverityCounters()
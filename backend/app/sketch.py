@@ -0,0 +1,263 @@
+"""
+Approximate top-K symptoms across the whole institution.
+
+Each UTC day of reports gets a Space-Saving summary with `capacity`
+counters. For a window holding N symptom words in total:
+
+  * every reported count overestimates the true count by at most its
+    `error`, and error <= N / capacity;
+  * any symptom whose true count exceeds N / capacity is guaranteed to be
+    in the summary.
+
+Windows spanning several days merge the daily summaries (see
+SpaceSaving.merged); the same bounds hold with N taken over the window.
+
+Reports are folded in by id, which illnesslog never reuses. Summaries
+only count up: a deleted report's words stay counted until its day
+leaves the window.
+
+A background job folds in new reports every SKETCH_REFRESH_SECONDS with
+its own session and writes the snapshot when one is due. Requests only
+read the in-memory summaries.
+"""
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .models import IllnessLog, SketchSnapshot, SymptomCount
+from .summary import symptom_words
+
+SKETCH_CAPACITY = int(os.environ.get("SKETCH_CAPACITY", "64"))
+SKETCH_RETENTION_DAYS = int(os.environ.get("SKETCH_RETENTION_DAYS", "35"))
+SKETCH_SNAPSHOT_SECONDS = float(os.environ.get("SKETCH_SNAPSHOT_SECONDS", "300"))
+SKETCH_REFRESH_SECONDS = float(os.environ.get("SKETCH_REFRESH_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.total = 0
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        # replace the smallest counter; the newcomer inherits its count as error
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+
+    def _floor(self) -> int:
+        # upper bound for the count of any item this summary does not track
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    @classmethod
+    def merged(cls, sketches: list["SpaceSaving"], capacity: int) -> "SpaceSaving":
+        """
+        Combine daily summaries in one pass. An item a summary does not track
+        is charged that summary's floor, so errors add up to at most
+        sum(N_day / capacity) = N / capacity, and any item absent from every
+        summary has a true count of at most N / capacity.
+        """
+        result = cls(capacity)
+        floors = [s._floor() for s in sketches]
+        candidates: dict[str, None] = {}  # ordered, so ties rank deterministically
+        for s in sketches:
+            result.total += s.total
+            candidates.update(dict.fromkeys(s.counts))
+        for item in candidates:
+            count = error = 0
+            for s, floor in zip(sketches, floors):
+                count += s.counts.get(item, floor)
+                error += s.errors.get(item, floor)
+            result.counts[item] = count
+            result.errors[item] = error
+        return result
+
+    def top(self, k: int) -> list[tuple[str, int, int]]:
+        ranked = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:k]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "counts": self.counts,
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        sketch = cls(data["capacity"])
+        sketch.total = data["total"]
+        sketch.counts = dict(data["counts"])
+        sketch.errors = dict(data["errors"])
+        return sketch
+
+
+class SymptomSketches:
+    """
+    Daily Space-Saving summaries fed from IllnessLog with an id cursor, so
+    every worker sees every report no matter which one handled the write.
+    """
+
+    SNAPSHOT_NAME = "symptoms"
+
+    def __init__(
+        self,
+        capacity: int = SKETCH_CAPACITY,
+        retention_days: int = SKETCH_RETENTION_DAYS,
+        snapshot_seconds: float = SKETCH_SNAPSHOT_SECONDS,
+    ):
+        self.capacity = capacity
+        self.retention_days = retention_days
+        self.snapshot_seconds = snapshot_seconds
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.cursor: int | None = None
+            self.days: dict[date, SpaceSaving] = {}
+            self._last_snapshot: datetime | None = None
+
+    def _load(self, session: Session, now: datetime) -> None:
+        snapshot = session.get(SketchSnapshot, self.SNAPSHOT_NAME)
+        if snapshot:
+            self.cursor = snapshot.cursor
+            self.days = {
+                date.fromisoformat(day): SpaceSaving.from_dict(data)
+                for day, data in snapshot.payload.items()
+            }
+            return
+
+        # no snapshot yet: build from the retention window only
+        self.cursor = 0
+        oldest = datetime.combine(
+            now.date() - timedelta(days=self.retention_days - 1), datetime.min.time()
+        )
+        first_id = session.exec(
+            select(func.min(IllnessLog.id)).where(IllnessLog.created_at >= oldest)
+        ).one()
+        if first_id is not None:
+            self.cursor = first_id - 1
+
+    def refresh(self, session: Session, now: datetime | None = None) -> int:
+        """
+        Fold reports created since the last refresh into the daily sketches
+        and write a snapshot when one is due (commits). Returns the reports
+        processed; for the background job.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            if self.cursor is None:
+                self._load(session, now)
+
+            rows = session.exec(
+                select(IllnessLog.id, IllnessLog.symptoms, IllnessLog.created_at)
+                .where(IllnessLog.id > self.cursor)
+                .order_by(IllnessLog.id)
+            ).all()
+
+            oldest = now.date() - timedelta(days=self.retention_days - 1)
+            for _, symptoms, created_at in rows:
+                day = created_at.date()
+                if day < oldest:
+                    continue
+                sketch = self.days.get(day)
+                if sketch is None:
+                    sketch = self.days[day] = SpaceSaving(self.capacity)
+                for word in symptom_words(symptoms):
+                    sketch.add(word)
+            if rows:
+                self.cursor = rows[-1][0]
+
+            for day in [d for d in self.days if d < oldest]:
+                del self.days[day]
+
+            if self._last_snapshot is None:
+                self._last_snapshot = now
+            elif (now - self._last_snapshot).total_seconds() >= self.snapshot_seconds:
+                self._snapshot(session, now)
+            return len(rows)
+
+    def _snapshot(self, session: Session, now: datetime) -> None:
+        snapshot = session.get(SketchSnapshot, self.SNAPSHOT_NAME) or SketchSnapshot(
+            name=self.SNAPSHOT_NAME
+        )
+        snapshot.cursor = self.cursor
+        snapshot.payload = {day.isoformat(): s.to_dict() for day, s in self.days.items()}
+        snapshot.updated_at = now
+        session.add(snapshot)
+        session.commit()
+        self._last_snapshot = now
+
+    def snapshot(self, session: Session) -> None:
+        with self._lock:
+            if self.cursor is not None:
+                self._snapshot(session, datetime.now(timezone.utc))
+
+    def top(
+        self, days: int, k: int, now: datetime | None = None
+    ) -> tuple[list[SymptomCount], int, int]:
+        """
+        Top-k symptoms over the last `days` days.
+        Returns (symptoms, total words in the window, worst-case error bound).
+        """
+        now = now or datetime.now(timezone.utc)
+        first = now.date() - timedelta(days=days - 1)
+        with self._lock:
+            merged = SpaceSaving.merged(
+                [s for day, s in self.days.items() if first <= day <= now.date()],
+                self.capacity,
+            )
+
+        symptoms = [
+            SymptomCount(symptom=item, count=count, error=error)
+            for item, count, error in merged.top(k)
+        ]
+        return symptoms, merged.total, merged.total // merged.capacity
+
+    # ---------------------- background job ----------------------
+
+    def start(self, engine, interval: float = SKETCH_REFRESH_SECONDS) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    with Session(engine) as session:
+                        self.refresh(session)
+                except Exception:  # keep the job alive across DB hiccups
+                    logger.exception("symptom sketch refresh failed")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="symptom-sketches", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+symptom_sketches = SymptomSketches()
@@ -0,0 +1,335 @@
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from .analytics import SICK_DAYS
+from .models import (
+    Class,
+    ClassEnrollment,
+    IllnessLog,
+    StudentHealth,
+    StudentPage,
+    SummaryResponse,
+    User,
+)
+from .tracing import traced
+
+# "auto" uses the NumPy engine for classes of at least SUMMARY_VECTOR_MIN_STUDENTS
+SUMMARY_ENGINE = os.environ.get("SUMMARY_ENGINE", "auto")
+SUMMARY_VECTOR_MIN_STUDENTS = int(os.environ.get("SUMMARY_VECTOR_MIN_STUDENTS", "200"))
+
+SEVERITY_LEVELS = 5
+
+# notification_privacy values that let a professor see the student's own
+# row; everyone else only counts towards a class's anonymous aggregates
+PROFESSOR_VISIBLE_PRIVACY = ("everyone", "professors")
+
+
+def visible_to_professors():
+    """
+    SQL predicate on User: the student shares their reports with professors.
+    """
+    return User.notification_privacy.in_(PROFESSOR_VISIBLE_PRIVACY)
+
+
+def owns_class(session: Session, class_id: int, professor_id: int) -> bool:
+    # primary key lookup with the owner as a second predicate
+    return session.exec(
+        select(Class.id).where(Class.id == class_id, Class.professor_id == professor_id)
+    ).first() is not None
+
+
+def symptom_words(symptoms: str) -> list[str]:
+    words = []
+    for word in symptoms.replace(",", " ").split():
+        w = word.strip().lower()
+        if w:
+            words.append(w)
+    return words
+
+
+def top_symptoms(symptom_freq: dict[str, int], n: int = 5) -> Optional[list[str]]:
+    common = sorted(symptom_freq.items(), key=lambda x: x[1], reverse=True)[:n]
+    return [symptom for symptom, _ in common] or None
+
+
+def severity_percentile(histogram: list[int], p: float) -> Optional[int]:
+    """
+    Nearest-rank percentile from counts of severities 1..5.
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+    rank = max(1, math.ceil(p * total))
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return i + 1
+    return len(histogram)
+
+
+def _finish_summary(
+    student_ids: list[int],
+    students_health: list[StudentHealth],
+    count: int,
+    severity_total: int,
+    histogram: list[int],
+    symptom_freq: dict[str, int],
+) -> SummaryResponse:
+    if not student_ids:
+        return SummaryResponse(
+            available=False,
+            message="No illness reports yet for this class.",
+            students=[],
+        )
+
+    avg_severity = severity_total / count if count else None
+
+    return SummaryResponse(
+        available=True,
+        count=count,
+        avg_severity=round(avg_severity, 2) if avg_severity is not None else None,
+        common_symptoms=top_symptoms(symptom_freq),
+        severity_histogram=histogram,
+        severity_p50=severity_percentile(histogram, 0.5),
+        severity_p90=severity_percentile(histogram, 0.9),
+        message="Class health summary generated successfully",
+        students=students_health,
+    )
+
+
+def build_summary(
+    student_ids: list[int],
+    users: Iterable[User],
+    logs: Iterable[IllnessLog],
+    now: datetime,
+    include_students: bool = True,
+) -> SummaryResponse:
+    """
+    Reference implementation: one Python pass per student.
+    `logs` must be ordered by created_at, most recent first. Students
+    missing from `users`, whether hidden from professors or without a
+    User row at all, count in the aggregates but get no row. (The old
+    inline summary gave the latter email="unknown", which StudentHealth
+    rejects, so such classes failed with a 500.)
+    """
+    latest_by_student: dict[int, IllnessLog] = {}
+    for log in logs:
+        if log.user_id not in latest_by_student:
+            latest_by_student[log.user_id] = log
+
+    user_by_id = {u.id: u for u in users}
+
+    students_health: list[StudentHealth] = []
+    severities: list[int] = []
+    histogram = [0] * SEVERITY_LEVELS
+    symptom_freq: dict[str, int] = {}
+
+    for sid in student_ids:
+        user = user_by_id.get(sid)
+        latest = latest_by_student.get(sid)
+
+        is_sick = False
+        latest_symptoms = None
+        latest_severity = None
+        latest_created_at = None
+
+        if latest:
+            latest_created_at = latest.created_at
+            latest_symptoms = latest.symptoms
+            latest_severity = latest.severity
+
+            created_at = latest.created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+
+            if (now - created_at).days < SICK_DAYS:
+                is_sick = True
+                severities.append(latest.severity)
+                if 1 <= latest.severity <= SEVERITY_LEVELS:
+                    histogram[latest.severity - 1] += 1
+                for w in symptom_words(latest.symptoms):
+                    symptom_freq[w] = symptom_freq.get(w, 0) + 1
+
+        if not include_students or user is None:
+            continue
+
+        students_health.append(
+            StudentHealth(
+                student_id=sid,
+                full_name=user.full_name,
+                email=user.email,
+                is_sick=is_sick,
+                latest_symptoms=latest_symptoms,
+                latest_severity=latest_severity,
+                latest_created_at=latest_created_at,
+            )
+        )
+
+    return _finish_summary(
+        student_ids,
+        students_health,
+        len(severities),
+        sum(severities),
+        histogram,
+        symptom_freq,
+    )
+
+
+@traced("summary.summarize_class")
+def summarize_class(
+    session: Session,
+    student_ids: list[int],
+    now: datetime | None = None,
+    engine: str | None = None,
+    include_students: bool = True,
+) -> SummaryResponse:
+    now = now or datetime.now(timezone.utc)
+    engine = engine or SUMMARY_ENGINE
+
+    users = []
+    if include_students:
+        # students who keep their reports from professors are never loaded
+        users = session.exec(
+            select(User).where(User.id.in_(student_ids), visible_to_professors())
+        ).all()
+
+    if engine == "auto":
+        from . import vectorized
+
+        use_vectorized = (
+            vectorized.available() and len(student_ids) >= SUMMARY_VECTOR_MIN_STUDENTS
+        )
+    else:
+        use_vectorized = engine == "numpy"
+
+    if use_vectorized:
+        from .vectorized import summarize_class_vectorized
+
+        return summarize_class_vectorized(
+            session, student_ids, users, now, include_students=include_students
+        )
+
+    logs = session.exec(
+        select(IllnessLog)
+        .where(IllnessLog.user_id.in_(student_ids))
+        .order_by(IllnessLog.created_at.desc())
+    ).all()
+    return build_summary(student_ids, users, logs, now, include_students=include_students)
+
+
+def seconds_until_status_change(
+    session: Session,
+    student_ids: list[int],
+    now: datetime | None = None,
+) -> Optional[float]:
+    """
+    Lower bound on how long the set of sick students stays the same without
+    new writes: the oldest report inside the sick window is the first that
+    can age out. None when nobody can recover by waiting.
+    """
+    now = now or datetime.now(timezone.utc)
+    oldest = session.exec(
+        select(func.min(IllnessLog.created_at)).where(
+            IllnessLog.user_id.in_(student_ids),
+            IllnessLog.created_at > now - timedelta(days=SICK_DAYS),
+        )
+    ).one()
+    if oldest is None:
+        return None
+    if oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    return (oldest + timedelta(days=SICK_DAYS) - now).total_seconds()
+
+
+_SORT_COLUMNS = {
+    "severity": IllnessLog.severity,
+    "latest": IllnessLog.created_at,
+    "name": User.full_name,
+}
+
+
+@traced("summary.student_page")
+def student_page(
+    session: Session,
+    class_id: int,
+    page: int = 1,
+    page_size: int = 50,
+    sort: str = "name",
+    order: str = "asc",
+    sick_only: bool = False,
+    now: datetime | None = None,
+) -> StudentPage:
+    """
+    One page of a class's students with their latest report. Students who
+    keep their reports from professors are left out.
+
+    Latest-report lookup, the sick filter, sorting and paging all run in
+    SQL: each student's latest report is a correlated LIMIT 1 lookup on the
+    (user_id, created_at) index, so only the requested page is materialized.
+    """
+    now = now or datetime.now(timezone.utc)
+    sick_cutoff = now - timedelta(days=SICK_DAYS)
+
+    recent = aliased(IllnessLog)
+    latest_id = (
+        select(recent.id)
+        .where(recent.user_id == ClassEnrollment.student_id)
+        .order_by(recent.created_at.desc())
+        .limit(1)
+        .correlate(ClassEnrollment)
+        .scalar_subquery()
+    )
+    is_sick = func.coalesce(IllnessLog.created_at > sick_cutoff, False)
+
+    filters = [ClassEnrollment.class_id == class_id, visible_to_professors()]
+    if sick_only:
+        filters.append(IllnessLog.created_at > sick_cutoff)
+
+    def base(*columns):
+        return (
+            select(*columns)
+            .select_from(ClassEnrollment)
+            .join(User, User.id == ClassEnrollment.student_id)
+            .join(IllnessLog, IllnessLog.id == latest_id, isouter=True)
+            .where(*filters)
+        )
+
+    total = session.exec(base(func.count())).one()
+
+    sort_col = _SORT_COLUMNS[sort]
+    sort_col = sort_col.desc() if order == "desc" else sort_col.asc()
+    rows = session.exec(
+        base(
+            ClassEnrollment.student_id,
+            User.full_name,
+            User.email,
+            is_sick,
+            IllnessLog.symptoms,
+            IllnessLog.severity,
+            IllnessLog.created_at,
+        )
+        .order_by(sort_col.nulls_last(), ClassEnrollment.student_id)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    ).all()
+
+    students = [
+        StudentHealth(
+            student_id=student_id,
+            full_name=full_name,
+            email=email,
+            is_sick=bool(sick),
+            latest_symptoms=symptoms,
+            latest_severity=severity,
+            latest_created_at=created_at,
+        )
+        for student_id, full_name, email, sick, symptoms, severity, created_at in rows
+    ]
+    return StudentPage(total=total, page=page, page_size=page_size, students=students)
@@ -0,0 +1,86 @@
+"""
+Cache of validated JWT claims.
+
+Every authenticated request runs get_current_user, which used to verify
+the token's HS256 signature and parse its claims each time, although a
+client sends the same token for up to ACCESS_TOKEN_EXPIRE_MINUTES.
+`claims_cache` maps the SHA-256 digest of a token (raw tokens are never
+kept) to the claims it was validated to, until the token's `exp`.
+
+Only tokens that validated are cached. Changing the signing keys (see
+security.set_secret_keys) clears the cache, and a decode that started
+under the old keys cannot store its result afterwards. Bounded at
+JWT_CLAIMS_CACHE_SIZE tokens, least recently used first out; 0 turns the
+cache off.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+JWT_CLAIMS_CACHE_SIZE = int(os.environ.get("JWT_CLAIMS_CACHE_SIZE", "10000"))
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class ClaimsCache:
+    def __init__(self, max_entries: int = JWT_CLAIMS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by clear(), so a decode racing a key change is not stored
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, digest: bytes, now: float | None = None) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, expires_at = entry
+            if (now or time.time()) >= expires_at:
+                del self._entries[digest]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return claims
+
+    def put(self, digest: bytes, claims: dict, generation: int) -> None:
+        expires_at = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(expires_at, (int, float)):
+            # a token without exp never expires; keep verifying it
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[digest] = (claims, float(expires_at))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+        }
+
+
+claims_cache = ClaimsCache()
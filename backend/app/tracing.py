@@ -0,0 +1,310 @@
+"""
+In-process request tracing.
+
+A sampled request gets a Trace, carried in a context variable so it follows
+the request into the threadpool that runs sync endpoints. Code under that
+request records timed spans with `span()` or `@traced`. Spans nest by
+context: each one is parented to the span that was open when it started.
+Password hashing, the current-user lookup, class summaries, email and
+every SQL statement are instrumented. Outside a sampled request these
+helpers cost one context variable lookup.
+
+Finished traces go into a ring buffer of the last TRACE_BUFFER_SIZE
+traces. The TRACE_SLOWEST_PER_ROUTE slowest traces of each route are kept
+apart from it, so a slow outlier survives the buffer wrapping. Traces
+export as JSON or in Chrome trace-event format, which chrome://tracing and
+Perfetto open directly.
+
+A request is traced with probability TRACE_SAMPLE_RATE, or always when it
+sends `X-Trace: 1`. Its trace id comes back in the X-Trace-Id header.
+"""
+import functools
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "500"))
+TRACE_SLOWEST_PER_ROUTE = int(os.environ.get("TRACE_SLOWEST_PER_ROUTE", "10"))
+# a request that runs a query per row must not grow its trace without bound
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "1000"))
+TRACE_SQL_MAX_CHARS = 300
+
+_trace: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_parent: ContextVar[int | None] = ContextVar("trace_parent", default=None)
+
+
+class Trace:
+    def __init__(self, trace_id: str, method: str, path: str):
+        self.id = trace_id
+        self.method = method
+        self.path = path
+        self.route = path
+        self.status: int | None = None
+        self.started_at = datetime.now(timezone.utc)
+        self.start_ns = time.perf_counter_ns()
+        self.duration_ns = 0
+        self.spans: list[dict] = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+    def add_span(self, name: str, start_ns: int, end_ns: int, parent: int | None,
+                 span_id: int, attrs: dict) -> None:
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": (start_ns - self.start_ns) / 1e6,
+            "duration_ms": (end_ns - start_ns) / 1e6,
+            "thread": threading.get_ident(),
+            "attrs": attrs,
+        })
+
+    def to_dict(self, spans: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "span_count": len(self.spans),
+            "dropped_spans": self.dropped,
+        }
+        if spans:
+            data["spans"] = sorted(self.spans, key=lambda s: s["start_ms"])
+        return data
+
+    def to_chrome(self) -> list[dict]:
+        """
+        Complete ("X") events, timestamps in microseconds. Each request
+        thread becomes a track; the request itself is the outermost event.
+        """
+        ts = self.started_at.timestamp() * 1e6
+        events = [{
+            "name": f"{self.method} {self.route}",
+            "cat": "request",
+            "ph": "X",
+            "ts": ts,
+            "dur": self.duration_ns / 1e3,
+            "pid": 1,
+            "tid": "request",
+            "args": {"trace_id": self.id, "path": self.path, "status": self.status},
+        }]
+        for s in self.spans:
+            events.append({
+                "name": s["name"],
+                "cat": s["name"].split(".", 1)[0],
+                "ph": "X",
+                "ts": ts + s["start_ms"] * 1e3,
+                "dur": s["duration_ms"] * 1e3,
+                "pid": 1,
+                "tid": s["thread"],
+                "args": s["attrs"],
+            })
+        return events
+
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = next(trace._ids)
+    parent = _parent.get()
+    token = _parent.set(span_id)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        _parent.reset(token)
+        trace.add_span(name, start, end, parent, span_id, attrs)
+
+
+def traced(name: str):
+    """
+    Decorator form of `span()`. Keeps the signature visible to FastAPI, so
+    dependencies can be traced too.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_trace() -> Trace | None:
+    return _trace.get()
+
+
+class Tracer:
+    def __init__(
+        self,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        buffer_size: int = TRACE_BUFFER_SIZE,
+        slowest_per_route: int = TRACE_SLOWEST_PER_ROUTE,
+    ):
+        self.sample_rate = sample_rate
+        self.slowest_per_route = slowest_per_route
+        self._lock = threading.Lock()
+        self._buffer: deque[Trace] = deque(maxlen=buffer_size)
+        self._slowest: dict[str, list[tuple[int, int, Trace]]] = {}
+        self._seq = itertools.count()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+            self._slowest = {}
+            self.started = 0
+            self.finished = 0
+
+    def should_sample(self, forced: bool = False) -> bool:
+        return forced or random.random() < self.sample_rate
+
+    def start(self, method: str, path: str) -> tuple[Trace, object]:
+        trace = Trace(os.urandom(8).hex(), method, path)
+        with self._lock:
+            self.started += 1
+        return trace, _trace.set(trace)
+
+    def finish(self, trace: Trace, token) -> None:
+        trace.duration_ns = time.perf_counter_ns() - trace.start_ns
+        _trace.reset(token)
+        entry = (trace.duration_ns, next(self._seq), trace)
+        with self._lock:
+            self.finished += 1
+            self._buffer.append(trace)
+            slowest = self._slowest.setdefault(trace.route, [])
+            if len(slowest) < self.slowest_per_route:
+                heapq.heappush(slowest, entry)
+            elif entry > slowest[0]:
+                heapq.heapreplace(slowest, entry)
+
+    def get(self, trace_id: str) -> Trace | None:
+        with self._lock:
+            candidates = list(self._buffer) + [
+                t for heap in self._slowest.values() for _, _, t in heap
+            ]
+        return next((t for t in candidates if t.id == trace_id), None)
+
+    def recent(self, route: str | None = None, limit: int = 50) -> list[Trace]:
+        with self._lock:
+            traces = list(self._buffer)
+        if route is not None:
+            traces = [t for t in traces if t.route == route]
+        return traces[::-1][:limit]
+
+    def slowest(self, route: str | None = None, n: int | None = None) -> dict[str, list[Trace]]:
+        with self._lock:
+            heaps = {r: list(h) for r, h in self._slowest.items() if route in (None, r)}
+        return {
+            r: [t for _, _, t in sorted(h, reverse=True)][:n]
+            for r, h in sorted(heaps.items())
+        }
+
+    def stats(self) -> dict:
+        return {
+            "enabled": TRACING_ENABLED,
+            "sample_rate": self.sample_rate,
+            "started": self.started,
+            "finished": self.finished,
+            "buffered": len(self._buffer),
+            "routes": len(self._slowest),
+        }
+
+
+tracer = Tracer()
+
+
+def chrome_trace(traces) -> dict:
+    return {
+        "traceEvents": [e for t in traces for e in t.to_chrome()],
+        "displayTimeUnit": "ms",
+    }
+
+
+class TracingMiddleware:
+    def __init__(self, app, tracer: Tracer = tracer, enabled: bool = TRACING_ENABLED):
+        self.app = app
+        self.tracer = tracer
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        forced = (b"x-trace", b"1") in scope.get("headers", ())
+        if not self.tracer.should_sample(forced):
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = self.tracer.start(scope["method"], scope["path"])
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-trace-id", trace.id.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            # the router writes the matched route into the shared scope
+            route = scope.get("route")
+            if route is not None:
+                trace.route = route.path
+            else:
+                # 404s and shed requests; raw paths would flood the index
+                trace.route = "<unrouted>"
+            self.tracer.finish(trace, token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _trace.get() is not None:
+        context._trace_start_ns = time.perf_counter_ns()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    start = getattr(context, "_trace_start_ns", None)
+    if trace is None or start is None:
+        return
+    trace.add_span(
+        "sql.execute",
+        start,
+        time.perf_counter_ns(),
+        _parent.get(),
+        next(trace._ids),
+        {"statement": statement[:TRACE_SQL_MAX_CHARS], "rows": cursor.rowcount},
+    )
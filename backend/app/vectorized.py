@@ -0,0 +1,155 @@
+"""
+NumPy-backed class summaries for large classes.
+
+NumPy is optional: when it is not installed `available()` is False and
+summarize_class always falls back to the reference implementation in
+summary.py. Results are identical to build_summary, including ordering.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Sequence
+
+from sqlmodel import Session, select
+
+from .analytics import SICK_DAYS
+from .models import IllnessLog, StudentHealth, SummaryResponse, User
+from .summary import SEVERITY_LEVELS, _finish_summary, symptom_words
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+def available() -> bool:
+    return np is not None
+
+
+def build_summary_vectorized(
+    student_ids: Sequence[int],
+    users: Iterable[User],
+    log_ids: Sequence[int],
+    log_user_ids: Sequence[int],
+    log_created_at: Sequence[datetime],
+    log_severities: Sequence[int],
+    symptoms_for: Callable[[list[int]], dict[int, str]],
+    now: datetime,
+    include_students: bool = True,
+) -> SummaryResponse:
+    """
+    Vectorized equivalent of summary.build_summary.
+
+    The log columns must be ordered by created_at, most recent first, and
+    hold naive UTC datetimes as SQLite returns them. Symptom text is only
+    fetched, through `symptoms_for`, for each student's latest report.
+    """
+    n_logs = len(log_ids)
+    sids = np.asarray(student_ids, dtype=np.int64)
+
+    if n_logs:
+        users_arr = np.asarray(log_user_ids, dtype=np.int64)
+        created = np.asarray(log_created_at, dtype="datetime64[us]")
+        severities = np.asarray(log_severities, dtype=np.int64)
+
+        # np.unique returns the first occurrence, i.e. the most recent report
+        uniq, first = np.unique(users_arr, return_index=True)
+        pos = np.minimum(np.searchsorted(uniq, sids), len(uniq) - 1)
+        has_log = uniq[pos] == sids
+        latest_idx = np.where(has_log, first[pos], 0)
+
+        now64 = np.datetime64(now.replace(tzinfo=None), "us")
+        age = now64 - created[latest_idx]
+        sick = has_log & (age < np.timedelta64(timedelta(days=SICK_DAYS)))
+
+        sick_sev = severities[latest_idx[sick]]
+        in_range = sick_sev[(sick_sev >= 1) & (sick_sev <= SEVERITY_LEVELS)]
+        histogram = np.bincount(in_range - 1, minlength=SEVERITY_LEVELS).tolist()
+        count = int(sick.sum())
+        severity_total = int(sick_sev.sum())
+
+        latest_list = latest_idx.tolist()
+        has_list = has_log.tolist()
+        sick_list = sick.tolist()
+        latest_ids = [log_ids[i] for i, h in zip(latest_list, has_list) if h]
+        symptoms_by_id = symptoms_for(latest_ids) if latest_ids else {}
+    else:
+        histogram = [0] * SEVERITY_LEVELS
+        count = severity_total = 0
+        has_list = sick_list = [False] * len(student_ids)
+        latest_list = [0] * len(student_ids)
+        symptoms_by_id = {}
+
+    user_by_id = {u.id: u for u in users}
+    students_health: list[StudentHealth] = []
+    symptom_freq: dict[str, int] = {}
+
+    for sid, has, is_sick, i in zip(student_ids, has_list, sick_list, latest_list):
+        user = user_by_id.get(sid)
+        latest_symptoms = latest_severity = latest_created_at = None
+        if has:
+            latest_symptoms = symptoms_by_id[log_ids[i]]
+            latest_severity = log_severities[i]
+            latest_created_at = log_created_at[i]
+            if is_sick:
+                for w in symptom_words(latest_symptoms):
+                    symptom_freq[w] = symptom_freq.get(w, 0) + 1
+
+        if not include_students or user is None:
+            continue
+
+        # rows come straight from the DB, where emails were validated on signup
+        students_health.append(
+            StudentHealth.model_construct(
+                student_id=sid,
+                full_name=user.full_name,
+                email=user.email,
+                is_sick=is_sick,
+                latest_symptoms=latest_symptoms,
+                latest_severity=latest_severity,
+                latest_created_at=latest_created_at,
+            )
+        )
+
+    return _finish_summary(
+        student_ids, students_health, count, severity_total, histogram, symptom_freq
+    )
+
+
+def summarize_class_vectorized(
+    session: Session,
+    student_ids: list[int],
+    users: Iterable[User],
+    now: datetime,
+    include_students: bool = True,
+) -> SummaryResponse:
+    rows = session.exec(
+        select(
+            IllnessLog.id,
+            IllnessLog.user_id,
+            IllnessLog.created_at,
+            IllnessLog.severity,
+        )
+        .where(IllnessLog.user_id.in_(student_ids))
+        .order_by(IllnessLog.created_at.desc())
+    ).all()
+    log_ids, log_user_ids, log_created_at, log_severities = (
+        [list(col) for col in zip(*rows)] if rows else ([], [], [], [])
+    )
+
+    def symptoms_for(ids: list[int]) -> dict[int, str]:
+        return dict(
+            session.exec(
+                select(IllnessLog.id, IllnessLog.symptoms).where(IllnessLog.id.in_(ids))
+            ).all()
+        )
+
+    return build_summary_vectorized(
+        student_ids,
+        users,
+        log_ids,
+        log_user_ids,
+        log_created_at,
+        log_severities,
+        symptoms_for,
+        now,
+        include_students=include_students,
+    )
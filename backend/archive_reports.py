@@ -0,0 +1,34 @@
+"""
+Move illness reports older than the archive horizon out of the hot table.
+
+Meant for a nightly cron job:
+
+    python archive_reports.py --horizon-days 400
+"""
+import argparse
+import time
+
+from sqlmodel import Session
+
+from app.archive import ARCHIVE_BATCH_SIZE, ARCHIVE_HORIZON_DAYS, archive_old_reports, archive_stats
+from app.db import engine, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    with Session(engine) as session:
+        start = time.perf_counter()
+        moved = archive_old_reports(
+            session, horizon_days=args.horizon_days, batch_size=args.batch_size
+        )
+        print(f"archived {moved} reports in {time.perf_counter() - start:.2f}s")
+        print(archive_stats(session))
+
+
+if __name__ == "__main__":
+    main()
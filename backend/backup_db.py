@@ -0,0 +1,37 @@
+"""
+Snapshot or restore app.db while the API keeps running.
+
+    python backup_db.py snapshot [--compress]
+    python backup_db.py restore backups/app-20260318T120000000000Z.db.gz
+
+Stop the API before restoring: its in-process caches describe the data
+being replaced.
+"""
+import argparse
+
+from app.backup import restore_snapshot, take_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot")
+    snapshot.add_argument("--compress", action="store_true")
+    restore = commands.add_parser("restore")
+    restore.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        result = take_snapshot(compress=args.compress)
+        print(
+            f"wrote {result['path']} ({result['bytes']} bytes) in {result['seconds']}s, "
+            f"{result['steps']} steps, longest {result['max_step_ms']:.1f}ms, "
+            f"{result['restarts']} restarts"
+        )
+    else:
+        restore_snapshot(args.path)
+        print(f"restored {args.path}")
+
+
+if __name__ == "__main__":
+    main()
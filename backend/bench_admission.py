@@ -0,0 +1,164 @@
+"""
+Load test admission control: read latency during a login storm.
+
+Serves the app with uvicorn in a separate process on a throwaway SQLite
+file (never app.db). `--storm` clients loop on POST /auth/login from a
+second process while one client times GET /api/reports. It runs once with
+admission control off and once with the configured limits (ADMISSION_*
+env vars):
+
+    python bench_admission.py --storm 64 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlmodel import Session, create_engine
+
+from app.db import init_db
+from app.models import IllnessLog, User
+from app.security import get_password_hash
+
+EMAIL = "bench@example.com"
+PASSWORD = "password"
+
+
+def seed(engine):
+    with Session(engine) as session:
+        user = User(email=EMAIL, full_name="Bench", hashed_password=get_password_hash(PASSWORD))
+        session.add(user)
+        session.commit()
+        session.add_all(
+            IllnessLog(user_id=user.id, symptoms="cough", severity=2, recoveryTime=2)
+            for _ in range(20)
+        )
+        session.commit()
+
+
+def serve(db_path: str, admission_enabled: bool) -> tuple[subprocess.Popen, str]:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    env = {
+        **os.environ,
+        "DATABASE_PATH": db_path,
+        "DATABASE_ECHO": "false",
+        "ADMISSION_ENABLED": "true" if admission_enabled else "false",
+        # the bench user reads /api/metrics afterwards
+        "ADMIN_EMAILS": EMAIL,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+        # without admission control the storm drains the connection pool
+        # and the server logs a QueuePool timeout per failed request
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(f"{base_url}/health")
+            return server, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+
+async def storm(base_url: str, clients: int, seconds: float) -> None:
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def login_loop():
+            while time.perf_counter() < deadline:
+                res = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+                if res.status_code == 503:
+                    # back off with jitter, as well-behaved clients do
+                    retry_after = float(res.headers.get("retry-after", 1))
+                    await asyncio.sleep(retry_after * random.uniform(0.5, 1.5))
+
+        await asyncio.gather(*(login_loop() for _ in range(clients)))
+
+
+def login(base_url: str) -> dict:
+    token = httpx.post(
+        f"{base_url}/auth/login", json={"email": EMAIL, "password": PASSWORD}
+    ).json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def run(base_url: str, headers: dict, clients: int, seconds: float) -> dict:
+    # the storm gets its own process so the reader's timings are not
+    # skewed by the load generator's event loop
+    stormer = subprocess.Popen(
+        [sys.executable, __file__, "--storm-only", base_url,
+         "--storm", str(clients), "--seconds", str(seconds)]
+    )
+    latencies = []
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            res = client.get("/api/reports", headers=headers)
+            if res.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+    stormer.wait()
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "reads": n,
+        "read_p50_ms": latencies[n // 2] * 1000 if n else float("nan"),
+        "read_p99_ms": latencies[min(n - 1, int(n * 0.99))] * 1000 if n else float("nan"),
+        "read_max_ms": latencies[-1] * 1000 if n else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--storm", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--storm-only", metavar="BASE_URL", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.storm_only:
+        asyncio.run(storm(args.storm_only, args.storm, args.seconds))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        init_db(engine)
+        seed(engine)
+        engine.dispose()
+
+        for mode in ("off", "on"):
+            server, base_url = serve(db_path, admission_enabled=mode == "on")
+            try:
+                headers = login(base_url)
+                result = run(base_url, headers, args.storm, args.seconds)
+                metrics = httpx.get(f"{base_url}/api/metrics", headers=headers).json()
+                auth = metrics["admission"]["auth"]
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"admission {mode:<4} reads={result['reads']:<6} "
+                f"p50={result['read_p50_ms']:7.1f}ms p99={result['read_p99_ms']:8.1f}ms "
+                f"max={result['read_max_ms']:8.1f}ms  "
+                f"logins admitted={auth['admitted']:<5} shed={auth['shed']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the hot/cold split: table sizes and read latency before and
+after archiving.
+
+Seeds a throwaway SQLite file (never app.db) with several years of reports
+for one large class, times a class summary and a student's full history,
+archives everything past the horizon and times them again:
+
+    python bench_archive.py --students 1000 --years 3 --reports-per-week 2
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlmodel import Session, create_engine
+
+from app.archive import ARCHIVE_HORIZON_DAYS, archive_old_reports, user_reports
+from app.db import init_db
+from app.models import IllnessLog, User
+from app.summary import summarize_class
+
+
+def seed(engine, students: int, years: int, reports_per_week: int):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(3)
+    span = years * 365 * 86400
+    per_student = years * 52 * reports_per_week
+    with Session(engine) as session:
+        session.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "email": f"student{i}@example.com",
+                    "full_name": f"Student {i}",
+                    "role": "student",
+                    "hashed_password": "x",
+                    "created_at": now,
+                    "notification_privacy": "friends",
+                }
+                for i in range(1, students + 1)
+            ],
+        )
+        rows = [
+            {
+                "user_id": user_id,
+                "symptoms": "fever cough",
+                "severity": rng.randint(1, 5),
+                "recoveryTime": rng.randint(1, 7),
+                "created_at": now - timedelta(seconds=rng.randint(0, span)),
+            }
+            for user_id in range(1, students + 1)
+            for _ in range(per_student)
+        ]
+        session.execute(IllnessLog.__table__.insert(), rows)
+        session.commit()
+
+
+def table_sizes(session) -> str:
+    sizes = dict(
+        session.connection().execute(
+            text(
+                "SELECT name, sum(pgsize) FROM dbstat"
+                " WHERE name IN ('illnesslog', 'illnesslogarchive') GROUP BY name"
+            )
+        ).all()
+    )
+    return ", ".join(f"{name} {size / 2**20:.1f} MiB" for name, size in sorted(sizes.items()))
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def measure(session, student_ids, repeat: int) -> str:
+    timings = [
+        f"summary[{engine}]={best_of(lambda: summarize_class(session, student_ids, engine=engine), repeat):.1f}ms"
+        for engine in ("python", "numpy")
+    ]
+    timings.append(f"history={best_of(lambda: user_reports(session, student_ids[0]), repeat):.2f}ms")
+    return "  ".join(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--reports-per-week", type=int, default=2)
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(engine)
+        seed(engine, args.students, args.years, args.reports_per_week)
+        student_ids = list(range(1, args.students + 1))
+
+        with Session(engine) as session:
+            print(f"before: {table_sizes(session)}")
+            print(f"        {measure(session, student_ids, args.repeat)}")
+
+            start = time.perf_counter()
+            moved = archive_old_reports(session, horizon_days=args.horizon_days)
+            print(f"archived {moved} reports in {time.perf_counter() - start:.2f}s")
+            session.connection().exec_driver_sql("VACUUM")
+
+            print(f"after:  {table_sizes(session)}")
+            print(f"        {measure(session, student_ids, args.repeat)}")
+
+
+if __name__ == "__main__":
+    main()
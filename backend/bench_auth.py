@@ -0,0 +1,66 @@
+"""
+Microbenchmark of the auth dependency: the cost of get_current_user per
+request, with and without the validated-claims cache.
+
+Calls the dependency directly against an in-memory SQLite database, so the
+numbers are the per-request overhead of authentication alone. `tokens`
+clients each send their own token, round robin:
+
+    python bench_auth.py --requests 20000 --tokens 100
+"""
+import argparse
+import time
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import User
+from app.security import create_access_token, decode_token, get_current_user
+from app.token_cache import claims_cache
+
+
+def per_call_us(fn, tokens: list[str], requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        fn(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            User(id=i, email=f"user{i}@example.com", hashed_password="x")
+            for i in range(1, args.tokens + 1)
+        )
+        session.commit()
+    tokens = [create_access_token({"sub": str(i)}) for i in range(1, args.tokens + 1)]
+
+    with Session(engine) as session:
+        def dependency(token):
+            return get_current_user(token=token, session=session)
+
+        results = {}
+        for label, size in (("uncached", 0), ("cached", args.tokens)):
+            claims_cache.clear()
+            claims_cache.reset_stats()
+            claims_cache.max_entries = size
+            decode_token(tokens[0])  # import jose outside the timing
+            results[label] = (
+                per_call_us(decode_token, tokens, args.requests),
+                per_call_us(dependency, tokens, args.requests),
+            )
+
+    for label, (decode_us, dependency_us) in results.items():
+        print(f"{label:>8}: decode {decode_us:7.1f}us  get_current_user {dependency_us:7.1f}us")
+    print(f"cache: {claims_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
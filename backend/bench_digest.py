@@ -0,0 +1,108 @@
+"""
+Count SMTP sends for a bad morning, with and without digests.
+
+Seeds a throwaway SQLite file (never app.db) with `--sections` classes of
+`--students` each, all with privacy "everyone". `--sick` of them, spread
+over `--hours`, file reports with ?notify=true. Every recipient counts as
+one SMTP send without digests; with them, the flusher runs once a minute
+on a simulated clock:
+
+    python bench_digest.py --sections 4 --students 40 --sick 25 --window 900
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, create_engine
+
+import app.digest
+from app.db import init_db
+from app.digest import DigestBuffer
+from app.fanout import _message, fanout_recipients
+from app.models import Class, ClassEnrollment, IllnessLog, User
+
+
+def seed(session, sections: int, students: int) -> list[User]:
+    profs = [
+        User(email=f"prof{i}@example.com", full_name=f"Prof {i}", role="professor",
+             hashed_password="x")
+        for i in range(sections)
+    ]
+    people = [
+        User(email=f"s{i}@example.com", full_name=f"Student {i}", hashed_password="x",
+             notification_privacy="everyone")
+        for i in range(sections * students)
+    ]
+    session.add_all(profs + people)
+    session.commit()
+    classes = [Class(name=f"Section {i}", professor_id=p.id) for i, p in enumerate(profs)]
+    session.add_all(classes)
+    session.commit()
+    rng = random.Random(1)
+    for student in people:
+        # most students take two of the sections
+        for clazz in rng.sample(classes, min(2, len(classes))):
+            session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    session.commit()
+    return people
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=4)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--sick", type=int, default=25)
+    parser.add_argument("--hours", type=float, default=2)
+    parser.add_argument("--window", type=float, default=900, help="digest window, seconds")
+    parser.add_argument("--max-items", type=int, default=20)
+    args = parser.parse_args()
+
+    sends = []
+    app.digest.send_email = lambda to, subject, body, from_address=None: sends.append(to)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(engine)
+        with Session(engine) as session:
+            people = seed(session, args.sections, args.students)
+            rng = random.Random(2)
+            start = datetime(2026, 1, 12, 7, 0, tzinfo=timezone.utc)
+            reports = sorted(
+                (start + timedelta(seconds=rng.uniform(0, args.hours * 3600)), student)
+                for student in rng.sample(people, args.sick)
+            )
+
+            digest = DigestBuffer(enabled=True, window_seconds=args.window,
+                                  max_items=args.max_items)
+            direct = 0
+            clock = start
+            end = start + timedelta(hours=args.hours) + timedelta(seconds=args.window)
+            pending = iter(reports)
+            nxt = next(pending, None)
+            while clock <= end:
+                while nxt is not None and nxt[0] <= clock:
+                    at, student = nxt
+                    log = IllnessLog(user_id=student.id, symptoms="flu", severity=3,
+                                     recoveryTime=2)
+                    messages = [_message(student, log, r)
+                                for r in fanout_recipients(session, student)]
+                    direct += len(messages)
+                    digest.add(session, messages, now=at)
+                    session.commit()
+                    nxt = next(pending, None)
+                digest.flush(session, now=clock)
+                clock += timedelta(minutes=1)
+            digest.flush(session, force=True)
+
+    stats = digest.stats()
+    print(f"{args.sick} reports over {args.hours}h, window {args.window:.0f}s")
+    print(f"  one email per notification: {direct} SMTP sends")
+    print(f"  digests:                    {len(sends)} SMTP sends "
+          f"({stats['messages_delivered']} notifications, "
+          f"{100 * (1 - len(sends) / direct):.0f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
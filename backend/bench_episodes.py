@@ -0,0 +1,123 @@
+"""
+Benchmark illness episodes as the trend input: rows read and trend time
+from episodes against raw reports, and what keeping episodes in sync costs.
+
+Seeds a throwaway SQLite file (never app.db) with a few thousand students who
+report in bursts of illness (several reports a few days apart),
+rebuilds the episodes, then times class_trend from each source and
+report inserts with and without an incremental sync after each:
+
+    python bench_episodes.py --students 2000 --days 180 --illnesses 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, create_engine
+
+from app.analytics import class_trend
+from app.db import init_db
+from app.episodes import episode_index
+from app.models import IllnessLog, User
+
+
+def seed(engine, students: int, days: int, illnesses: int) -> int:
+    now = datetime.now(timezone.utc)
+    rng = random.Random(50)
+    reports = []
+    for student in range(1, students + 1):
+        for _ in range(rng.randint(0, illnesses * 2)):
+            onset = now - timedelta(seconds=rng.randint(0, days * 86400))
+            for follow_up in range(rng.randint(1, 5)):
+                reports.append({
+                    "user_id": student,
+                    "symptoms": rng.choice(["fever cough", "headache", "sore throat fever"]),
+                    "severity": rng.randint(1, 5),
+                    "recoveryTime": 2,
+                    "created_at": min(now, onset + timedelta(days=follow_up * rng.uniform(0.5, 2))),
+                })
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "email": f"student{i}@example.com",
+                    "full_name": f"Student {i}",
+                    "role": "student",
+                    "hashed_password": "x",
+                    "notification_privacy": "friends",
+                }
+                for i in range(1, students + 1)
+            ],
+        )
+        conn.execute(IllnessLog.__table__.insert(), reports)
+    return len(reports)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def time_inserts(engine, students: int, n: int, sync: bool) -> float:
+    rng = random.Random(7)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        for _ in range(n):
+            session.add(
+                IllnessLog(user_id=rng.randint(1, students), symptoms="cough", severity=3, recoveryTime=1)
+            )
+            session.commit()
+            if sync:
+                episode_index.sync(session)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--illnesses", type=int, default=4, help="mean illnesses per student")
+    parser.add_argument("--syncs", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(engine)
+        reports = seed(engine, args.students, args.days, args.illnesses)
+        student_ids = list(range(1, args.students + 1))
+
+        with Session(engine) as session:
+            ms = best_of(lambda: episode_index.rebuild(session), 1)
+            episodes = episode_index.count(session)
+            print(f"{reports} reports -> {episodes} episodes ({reports / episodes:.1f}x fewer rows), "
+                  f"rebuild {ms:.0f}ms")
+            for days, bucket in ((7, "day"), (30, "day"), (args.days, "week")):
+                results = {}
+                for source in ("reports", "episodes"):
+                    results[source] = class_trend(session, student_ids, days, bucket, source=source)
+                    ms = best_of(
+                        lambda: class_trend(session, student_ids, days, bucket, source=source),
+                        args.repeat,
+                    )
+                    print(f"trend {days:>4}d/{bucket:<4} from {source:<8}: {ms:8.2f}ms")
+                assert results["reports"] == results["episodes"]
+
+        plain = time_inserts(engine, args.students, args.syncs, sync=False)
+        with Session(engine) as session:
+            episode_index.sync(session)
+        synced = time_inserts(engine, args.students, args.syncs, sync=True)
+        print(f"report insert + commit: {plain:.3f}ms, followed by a sync: {synced:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
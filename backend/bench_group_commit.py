@@ -0,0 +1,112 @@
+"""
+Benchmark report inserts: one commit per request vs the group-commit writer.
+
+Each level runs `--reports` inserts from N concurrent threads against a
+throwaway SQLite file (never app.db) and reports throughput, latency and
+how many inserts failed with "database is locked":
+
+    python bench_group_commit.py --reports 2000 --concurrency 1 4 16 64
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, create_engine
+
+from app.db import create_illness_log, init_db
+from app.group_commit import GroupCommitWriter
+from app.models import LogCreate
+
+LOG = LogCreate(symptoms="fever cough", severity=3, recoveryTime=2)
+
+
+def make_engine(path: str, concurrency: int, busy_timeout: float):
+    return create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": busy_timeout},
+        pool_size=concurrency,
+        max_overflow=0,
+    )
+
+
+def per_request(engine):
+    def insert(user_id: int):
+        with Session(engine) as session:
+            create_illness_log(session=session, log_in=LOG, user_id=user_id)
+    return insert, None
+
+
+def group_commit(engine, max_delay_ms: float):
+    writer = GroupCommitWriter(max_delay_ms=max_delay_ms)
+    writer.start(engine)
+
+    def insert(user_id: int):
+        writer.submit(LOG, user_id).result()
+    return insert, writer
+
+
+def run(insert, reports: int, concurrency: int):
+    latencies = []
+    locked = 0
+
+    def one(i: int):
+        nonlocal locked
+        start = time.perf_counter()
+        try:
+            insert(i % 500 + 1)
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            locked += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(reports)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies, locked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    parser.add_argument("--busy-timeout", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'threads':>8}{'reports/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'locked':>8}")
+    for concurrency in args.concurrency:
+        for mode in ("per-request", "group-commit"):
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = make_engine(
+                    os.path.join(tmp, "bench.db"), concurrency, args.busy_timeout
+                )
+                init_db(engine)
+                if mode == "per-request":
+                    insert, writer = per_request(engine)
+                else:
+                    insert, writer = group_commit(engine, args.max_delay_ms)
+                try:
+                    elapsed, latencies, locked = run(insert, args.reports, concurrency)
+                finally:
+                    if writer is not None:
+                        writer.stop()
+                engine.dispose()
+
+            done = len(latencies)
+            p50 = latencies[done // 2] * 1000 if done else float("nan")
+            p99 = latencies[min(done - 1, int(done * 0.99))] * 1000 if done else float("nan")
+            print(
+                f"{mode:<14}{concurrency:>8}{done / elapsed:>12.0f}"
+                f"{p50:>9.1f}{p99:>9.1f}{locked:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
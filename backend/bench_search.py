@@ -0,0 +1,124 @@
+"""
+Benchmark symptom search: FTS5 MATCH vs LIKE '%...%' over a million reports.
+
+Seeds a throwaway SQLite file (never app.db), then times search_reports
+against the equivalent LIKE scan for a few query shapes:
+
+    python bench_search.py --reports 1000000 --students 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlmodel import Session, create_engine
+
+from app.db import init_db
+from app.models import ClassEnrollment, IllnessLog
+from app.search import search_reports
+
+WORDS = [
+    "fever", "cough", "coughing", "rash", "headache", "sore", "throat", "nausea",
+    "chills", "fatigue", "congestion", "sneezing", "vomiting", "dizzy", "aches",
+]
+
+# (FTS5 query, equivalent LIKE filter)
+QUERIES = [
+    ("measles", "symptoms LIKE '%measles%'"),
+    ("rash", "symptoms LIKE '%rash%'"),
+    ("fever AND rash", "symptoms LIKE '%fever%' AND symptoms LIKE '%rash%'"),
+    ('"sore throat"', "symptoms LIKE '%sore throat%'"),
+    ("dizz*", "symptoms LIKE '%dizz%'"),
+]
+
+
+def seed(engine, reports: int, students: int, classes: int):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(7)
+    with Session(engine) as session:
+        session.execute(
+            ClassEnrollment.__table__.insert(),
+            [{"class_id": sid % classes + 1, "student_id": sid} for sid in range(1, students + 1)],
+        )
+        batch = []
+        for i in range(reports):
+            batch.append({
+                "user_id": rng.randint(1, students),
+                "symptoms": " ".join(rng.sample(WORDS, rng.randint(1, 4)))
+                + (" measles" if rng.random() < 0.001 else ""),
+                "severity": rng.randint(1, 5),
+                "recoveryTime": rng.randint(1, 7),
+                "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+            })
+            if len(batch) == 50_000:
+                session.execute(IllnessLog.__table__.insert(), batch)
+                batch = []
+        if batch:
+            session.execute(IllnessLog.__table__.insert(), batch)
+        session.commit()
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=20_000)
+    parser.add_argument("--classes", type=int, default=200)
+    parser.add_argument("--searched-classes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+
+        start = time.perf_counter()
+        seed(engine, args.reports, args.students, args.classes)
+        print(f"seeded {args.reports} reports in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(path) / 2**20:.0f} MiB with the FTS index)")
+
+        class_ids = list(range(1, args.searched_classes + 1))
+        in_classes = ",".join(str(c) for c in class_ids)
+        with Session(engine) as session:
+            conn = session.connection()
+            for fts_query, like in QUERIES:
+                # same work as a search page: a total plus the first 20 rows
+                where = (
+                    f"WHERE {like} AND user_id IN ("
+                    f"SELECT student_id FROM classenrollment WHERE class_id IN ({in_classes}))"
+                )
+                count_sql = text(f"SELECT count(*) FROM illnesslog {where}")
+                page_sql = text(f"SELECT id FROM illnesslog {where} ORDER BY created_at DESC LIMIT 20")
+
+                def like_scan():
+                    conn.execute(count_sql).scalar()
+                    conn.execute(page_sql).all()
+
+                like_time = best_of(like_scan, args.repeat)
+                result = None
+
+                def fts():
+                    nonlocal result
+                    result = search_reports(session, fts_query, class_ids, page_size=20)
+
+                fts_time = best_of(fts, args.repeat)
+                print(
+                    f"{fts_query:<18} matches={result.total:<7} "
+                    f"like={like_time * 1000:8.1f}ms  fts={fts_time * 1000:8.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
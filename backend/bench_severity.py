@@ -0,0 +1,130 @@
+"""
+Benchmark severity distributions: the counters against a summary scan,
+and what maintaining the counters costs each report insert.
+
+Seeds a throwaway SQLite file (never app.db) with one large class and a
+few weeks of reports, then times the headline summary (which rescans the
+class's reports) against severity_counters.distribution, and report
+inserts with and without the severity triggers:
+
+    python bench_severity.py --students 2000 --days 60 --reports-per-day 0.3
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, create_engine
+
+from app.db import init_db
+from app.models import Class, ClassEnrollment, IllnessLog, User
+from app.severity import _TRIGGERS, rebuild, severity_counters
+from app.summary import summarize_class
+
+
+def seed(engine, students: int, days: int, reports_per_day: float):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(49)
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "email": f"student{i}@example.com",
+                    "full_name": f"Student {i}",
+                    "role": "student",
+                    "hashed_password": "x",
+                    "notification_privacy": "friends",
+                }
+                for i in range(1, students + 1)
+            ],
+        )
+        conn.execute(Class.__table__.insert(), [{"id": 1, "name": "Big", "professor_id": 1}])
+        conn.execute(
+            ClassEnrollment.__table__.insert(),
+            [{"class_id": 1, "student_id": i} for i in range(1, students + 1)],
+        )
+        conn.execute(
+            IllnessLog.__table__.insert(),
+            [
+                {
+                    "user_id": rng.randint(1, students),
+                    "symptoms": "fever cough",
+                    "severity": rng.randint(1, 5),
+                    "recoveryTime": 2,
+                    "created_at": now - timedelta(seconds=rng.randint(0, days * 86400)),
+                }
+                for _ in range(int(students * days * reports_per_day))
+            ],
+        )
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def time_inserts(engine, students: int, n: int) -> float:
+    rng = random.Random(7)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        for _ in range(n):
+            session.add(
+                IllnessLog(user_id=rng.randint(1, students), symptoms="cough", severity=3, recoveryTime=1)
+            )
+            session.commit()
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--reports-per-day", type=float, default=0.3)
+    parser.add_argument("--inserts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        init_db(engine)
+        seed(engine, args.students, args.days, args.reports_per_day)
+        student_ids = list(range(1, args.students + 1))
+
+        with Session(engine) as session:
+            rebuild(session)
+            summary = summarize_class(session, student_ids, engine="python", include_students=False)
+            dist = severity_counters.distribution(session, 1)
+            assert dist.severity_histogram == summary.severity_histogram
+            print(f"sick students: {dist.count}, histogram {dist.severity_histogram}")
+            for engine_name in ("python", "numpy"):
+                ms = best_of(
+                    lambda: summarize_class(
+                        session, student_ids, engine=engine_name, include_students=False
+                    ),
+                    args.repeat,
+                )
+                print(f"summary[{engine_name}] headline: {ms:8.2f}ms")
+            ms = best_of(lambda: severity_counters.distribution(session, 1), args.repeat)
+            print(f"counters distribution:    {ms:8.2f}ms")
+            print(f"verify (full recompute):  {best_of(lambda: severity_counters.verify(session), 1):8.2f}ms")
+
+        with_triggers = time_inserts(engine, args.students, args.inserts)
+        with engine.begin() as conn:
+            for statements in _TRIGGERS.values():
+                for statement in statements:
+                    name = statement.split()[5]
+                    conn.exec_driver_sql(f"DROP TRIGGER {name}")
+        without = time_inserts(engine, args.students, args.inserts)
+        print(f"report insert + commit: {without:.3f}ms without counters, {with_triggers:.3f}ms with")
+
+
+if __name__ == "__main__":
+    main()
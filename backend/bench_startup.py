@@ -0,0 +1,148 @@
+"""
+Benchmark worker cold start: importing app.main and running init_db.
+
+Imports are timed in fresh interpreters, the way an autoscaled worker
+starts. init_db is timed on a throwaway SQLite file (never app.db) seeded
+with friends and enrollments, once with a stale schema version (every
+check and migration runs) and once with a current one:
+
+    python bench_startup.py --runs 5 --rows 50000
+
+Exits non-zero when the median import exceeds STARTUP_BUDGET_SECONDS;
+tests/test_startup.py enforces the same budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", "3.0"))
+
+# imported on first use, see security.py and vectorized.py
+LAZY_MODULES = ("jose.jwt", "passlib.context", "numpy")
+
+_IMPORT = """
+import sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {lazy!r} if m in sys.modules))
+"""
+
+
+def time_import() -> tuple[float, list[str]]:
+    """
+    Seconds to import app.main in a new interpreter, and which of the
+    LAZY_MODULES it loaded anyway.
+    """
+    env = {**os.environ, "DATABASE_ECHO": "false"}
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT.format(lazy=LAZY_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(out[0]), out[1].split(",") if len(out) > 1 else []
+
+
+def seed(engine, rows: int):
+    from app.models import Class, ClassEnrollment, Friend, User
+
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "email": f"user{i}@example.com",
+                    "full_name": f"User {i}",
+                    "role": "student",
+                    "hashed_password": "x",
+                    "notification_privacy": "friends",
+                }
+                for i in range(1, 1001)
+            ],
+        )
+        conn.execute(
+            Class.__table__.insert(),
+            [{"id": i, "name": f"Class {i}", "professor_id": 1} for i in range(1, rows // 1000 + 2)],
+        )
+        conn.execute(
+            ClassEnrollment.__table__.insert(),
+            [{"class_id": i // 1000 + 1, "student_id": i % 1000 + 1} for i in range(rows)],
+        )
+        conn.execute(
+            Friend.__table__.insert(),
+            [
+                {
+                    "owner_user_id": i % 1000 + 1,
+                    "friend_name": f"Friend {i}",
+                    "friend_email": f"friend{i}@example.com",
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+def time_init_db(rows: int) -> tuple[float, float, float]:
+    from sqlmodel import create_engine
+
+    from app.db import init_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        start = time.perf_counter()
+        init_db(engine)
+        fresh = time.perf_counter() - start
+        seed(engine, rows)
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA user_version = 0")
+        start = time.perf_counter()
+        init_db(engine)
+        stale = time.perf_counter() - start
+
+        start = time.perf_counter()
+        init_db(engine)
+        current = time.perf_counter() - start
+        engine.dispose()
+    return fresh, stale, current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=50000, help="friends and enrollments to seed")
+    args = parser.parse_args()
+
+    timings, eager = [], set()
+    for _ in range(args.runs):
+        elapsed, loaded = time_import()
+        timings.append(elapsed)
+        eager.update(loaded)
+    median = statistics.median(timings)
+    print(
+        f"import app.main: median {median * 1000:.0f}ms"
+        f"  min {min(timings) * 1000:.0f}ms  max {max(timings) * 1000:.0f}ms"
+        f"  (budget {STARTUP_BUDGET_SECONDS * 1000:.0f}ms)"
+    )
+    print(f"loaded eagerly: {', '.join(sorted(eager)) or 'none of ' + ', '.join(LAZY_MODULES)}")
+
+    fresh, stale, current = time_init_db(args.rows)
+    print(
+        f"init_db: new database {fresh * 1000:.1f}ms"
+        f"  stale schema ({args.rows} rows) {stale * 1000:.1f}ms"
+        f"  current schema {current * 1000:.2f}ms"
+    )
+
+    if median > STARTUP_BUDGET_SECONDS:
+        sys.exit(f"import of app.main over budget: {median:.2f}s > {STARTUP_BUDGET_SECONDS:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark /api/classes/{id}/trend over 180-day windows on a large class.
+
+Seeds a throwaway SQLite file (never app.db) and times class_trend for
+daily and weekly buckets:
+
+    python bench_trend.py --students 2000 --reports-per-student 40
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, create_engine
+
+from app.analytics import class_trend
+from app.db import init_db
+from app.models import IllnessLog
+
+
+def seed(engine, students: int, reports_per_student: int, days: int):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    rows = []
+    for user_id in range(1, students + 1):
+        for _ in range(reports_per_student):
+            rows.append({
+                "user_id": user_id,
+                "symptoms": "fever cough",
+                "severity": rng.randint(1, 5),
+                "recoveryTime": rng.randint(1, 7),
+                "created_at": now - timedelta(seconds=rng.randint(0, days * 86400)),
+            })
+    with Session(engine) as session:
+        session.execute(IllnessLog.__table__.insert(), rows)
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--reports-per-student", type=int, default=40)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        # trend queries never touch the user table, so no users are seeded
+        init_db(engine)
+
+        start = time.perf_counter()
+        seed(engine, args.students, args.reports_per_student, args.days)
+        print(
+            f"seeded {args.students * args.reports_per_student} reports "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        student_ids = list(range(1, args.students + 1))
+        for bucket in ("day", "week"):
+            timings = []
+            with Session(engine) as session:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    buckets = class_trend(session, student_ids, days=args.days, bucket=bucket)
+                    timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(
+                f"bucket={bucket:<4} buckets={len(buckets):<4} "
+                f"best={timings[0] * 1000:.1f}ms median={timings[len(timings) // 2] * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
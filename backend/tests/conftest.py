@@ -6,6 +6,20 @@ from sqlmodel import SQLModel, create_engine, Session
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
+from app.alerts import outbreak_detector
+from app.sketch import symptom_sketches
+from app.cache import summary_cache
+from app.invalidation import invalidation_bus
+from app.idempotency import idempotency_store
+from app.classes import class_resolver
+from app import admission
+from app.tracing import tracer
+from app.fanout import notification_fanout
+from app.digest import digest_buffer
+from app.changes import change_feed
+from app.token_cache import claims_cache
+from app.severity import severity_counters
+from app.episodes import episode_index
 from app.db import get_session
 from app.models import User
 from app.security import get_password_hash
@@ -32,8 +46,27 @@ def client_fixture() -> TestClient:
     # override DB dependency
     app.dependency_overrides[get_session] = get_test_session
 
-    # skip real startup hooks that might touch the real DB
+    # skip real startup/shutdown hooks that might touch the real DB
     app.router.on_startup.clear()
+    app.router.on_shutdown.clear()
+
+    # in-process analytics state must not leak between tests
+    outbreak_detector.reset()
+    symptom_sketches.reset()
+    summary_cache.clear()
+    summary_cache.reset_stats()
+    invalidation_bus.reset()
+    idempotency_store.reset()
+    class_resolver.invalidate()
+    admission.reset()
+    tracer.reset()
+    notification_fanout.reset_stats()
+    digest_buffer.reset_stats()
+    change_feed.reset_stats()
+    claims_cache.clear()
+    claims_cache.reset_stats()
+    severity_counters.reset_stats()
+    episode_index.reset_stats()
 
     with TestClient(app) as c:
         yield c
@@ -53,7 +86,9 @@ def db_session() -> Session:
 @pytest.fixture
 def create_user() -> Callable[[str, str, str], User]:
 # Helper to create a user directly in the test DB.
-    def _create_user(email: str, password: str, role: str = "student") -> User:
+    def _create_user(
+        email: str, password: str, role: str = "student", privacy: str = "friends"
+    ) -> User:
         hashed_pw = get_password_hash(password)
         with Session(test_engine) as session:
             user = User(
@@ -61,6 +96,7 @@ def create_user() -> Callable[[str, str, str], User]:
                 full_name="Test User",
                 role=role,
                 hashed_password=hashed_pw,
+                notification_privacy=privacy,
             )
             session.add(user)
             session.commit()
@@ -70,6 +106,20 @@ def create_user() -> Callable[[str, str, str], User]:
     return _create_user
 
 
+@pytest.fixture
+def headers_for(client: TestClient) -> Callable[[str], Dict[str, str]]:
+    # Logs an existing user in via /auth/login and returns their Authorization headers.
+    def _headers_for(email: str, password: str = "password") -> Dict[str, str]:
+        res = client.post(
+            "/auth/login",
+            json={"email": email, "password": password},
+        )
+        assert res.status_code == 200, res.text
+        return {"Authorization": f"Bearer {res.json()['token']}"}
+
+    return _headers_for
+
+
 @pytest.fixture
 def student_auth_headers(
     client: TestClient,
@@ -110,4 +160,17 @@ def professor_auth_headers(
     assert res.status_code == 200, res.text
     token = res.json()["token"]
 
-    return {"Authorization": f"Bearer {token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def admin_auth_headers(
+    create_user: Callable[[str, str, str], User],
+    headers_for: Callable[[str], Dict[str, str]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Dict[str, str]:
+    # Creates an admin (listed in ADMIN_EMAILS), logs in, and returns Authorization headers for them.
+    email = "admin@example.com"
+    monkeypatch.setattr("app.security.ADMIN_EMAILS", {email})
+    create_user(email, "password")
+    return headers_for(email)
@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.admission import AdmissionControlMiddleware, Limiter, route_class
+
+
+def test_route_classes():
+    assert route_class("POST", "/auth/login") == "auth"
+    assert route_class("POST", "/api/admin/backups") == "export"
+    # other admin endpoints are not held back by a running snapshot
+    assert route_class("GET", "/api/admin/backups") == "read"
+    assert route_class("GET", "/api/admin/traces") == "read"
+    assert route_class("GET", "/api/admin/severity-counts/verify") == "read"
+    assert route_class("POST", "/api/admin/severity-counts/rebuild") == "write"
+    assert route_class("POST", "/api/reports") == "write"
+    assert route_class("DELETE", "/friends/3") == "write"
+    assert route_class("GET", "/api/reports") == "read"
+
+
+def test_limiter_queues_in_order_then_sheds():
+    async def scenario():
+        limiter = Limiter("read", limit=1, queue=1)
+        assert await limiter.acquire(timeout=1)
+
+        queued = asyncio.create_task(limiter.acquire(timeout=1))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+        # queue full: shed without waiting
+        assert not await limiter.acquire(timeout=1)
+
+        limiter.release()  # hands the slot to the queued request
+        assert await queued
+        assert limiter.in_flight == 1
+
+        # nobody releases: the waiter times out
+        assert not await limiter.acquire(timeout=0.01)
+        limiter.release()
+        assert limiter.in_flight == 0
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 2
+    assert stats["shed"] == 2
+    assert stats["timeouts"] == 1
+
+
+def test_middleware_sheds_with_retry_after():
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    limiters = {name: Limiter(name, limit=1, queue=0) for name in ("auth", "write", "read", "export")}
+    wrapped = AdmissionControlMiddleware(app, limiters=limiters, enabled=True, retry_after=3)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.05)
+            shed = await client.get("/slow")
+            health = await client.get("/health")
+            return await first, shed, health
+
+    first, shed, health = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "3"
+    assert health.status_code == 200  # exempt
+    assert limiters["read"].stats()["shed"] == 1
+    assert limiters["read"].in_flight == 0
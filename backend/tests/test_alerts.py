@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+from app.alerts import CAMPUS, OutbreakDetector
+from app.models import Class, ClassEnrollment, IllnessLog
+
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _log(user_id, hours_ago):
+    return IllnessLog(
+        user_id=user_id,
+        symptoms="fever",
+        severity=3,
+        recoveryTime=2,
+        created_at=NOW - timedelta(hours=hours_ago),
+    )
+
+
+def _setup_class(db_session: Session, create_user, n_students: int):
+    prof = create_user("alertprof@example.com", "password", role="professor")
+    clazz = Class(name="AlertClass", code="ALERT", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.refresh(clazz)
+
+    students = [
+        create_user(f"alert{i}@example.com", "password") for i in range(n_students)
+    ]
+    db_session.add_all(
+        ClassEnrollment(class_id=clazz.id, student_id=s.id) for s in students
+    )
+    db_session.commit()
+    return clazz, students
+
+
+def test_detector_flags_spike_against_quiet_baseline(client, create_user, db_session):
+    clazz, students = _setup_class(db_session, create_user, 6)
+
+    # one report per day over the previous six days, then a spike today
+    db_session.add_all(_log(students[0].id, 24 * day + 30) for day in range(6))
+    db_session.add_all(_log(s.id, 2) for s in students)
+    db_session.commit()
+
+    detector = OutbreakDetector(z_threshold=3.0, min_reports=3)
+    assert detector.refresh(db_session, now=NOW) == 12
+
+    alerts = {a.class_id: a for a in detector.alerts(now=NOW)}
+    assert clazz.id in alerts
+    assert alerts[clazz.id].count_24h == 6
+    assert alerts[clazz.id].count_7d == 12
+    assert alerts[clazz.id].baseline_daily == 1.0
+    # reports from students outside any class still count campus-wide
+    assert None in alerts
+
+
+def test_detector_quiet_class_not_flagged(client, create_user, db_session):
+    clazz, students = _setup_class(db_session, create_user, 2)
+    db_session.add_all(_log(students[0].id, 24 * day + 1) for day in range(7))
+    db_session.commit()
+
+    detector = OutbreakDetector(z_threshold=3.0, min_reports=1)
+    detector.refresh(db_session, now=NOW)
+    assert detector.alerts(now=NOW) == []
+
+    scored = detector.alerts(now=NOW, flagged_only=False)
+    assert {a.scope for a in scored} == {"class", CAMPUS}
+
+
+def test_detector_is_incremental(client, create_user, db_session):
+    clazz, students = _setup_class(db_session, create_user, 3)
+    db_session.add(_log(students[0].id, 30 * 24))  # older than the 7 day window
+    db_session.add(_log(students[0].id, 1))
+    db_session.commit()
+
+    detector = OutbreakDetector(min_reports=1)
+    # the first refresh seeds only from the 7 day window
+    assert detector.refresh(db_session, now=NOW) == 1
+    # nothing new since the cursor
+    assert detector.refresh(db_session, now=NOW) == 0
+
+    db_session.add_all([_log(students[1].id, 0), _log(students[2].id, 0)])
+    db_session.commit()
+    assert detector.refresh(db_session, now=NOW) == 2
+
+    scored = {a.class_id: a for a in detector.alerts(now=NOW, flagged_only=False)}
+    assert scored[clazz.id].count_24h == 3
+
+    # once the window slides past every report, the class drops out
+    later = NOW + timedelta(days=8)
+    detector.refresh(db_session, now=later)
+    assert detector.alerts(now=later, flagged_only=False) == []
+
+
+def test_detector_sees_report_after_newest_was_deleted(client, create_user, db_session):
+    clazz, (student, *_) = _setup_class(db_session, create_user, 1)
+    first = _log(student.id, 1)
+    db_session.add(first)
+    db_session.commit()
+
+    detector = OutbreakDetector(min_reports=1)
+    assert detector.refresh(db_session, now=NOW) == 1
+    deleted_id = first.id
+    db_session.delete(first)
+    db_session.commit()
+
+    # the next report must not get the deleted report's id back
+    second = _log(student.id, 0)
+    db_session.add(second)
+    db_session.commit()
+    assert second.id > deleted_id
+    assert detector.refresh(db_session, now=NOW) == 1
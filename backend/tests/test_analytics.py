@@ -0,0 +1,82 @@
+from datetime import date, datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+from app.analytics import bucket_start, class_trend
+from app.models import IllnessLog
+
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)  # a Wednesday
+
+
+def _log(user_id, days_ago, severity=3, hours=0):
+    return IllnessLog(
+        user_id=user_id,
+        symptoms="fever",
+        severity=severity,
+        recoveryTime=2,
+        created_at=NOW - timedelta(days=days_ago, hours=hours),
+    )
+
+
+def test_bucket_start_week_is_monday():
+    assert bucket_start(date(2026, 3, 18), "week") == date(2026, 3, 16)
+    assert bucket_start(date(2026, 3, 16), "week") == date(2026, 3, 16)
+    assert bucket_start(date(2026, 3, 18), "day") == date(2026, 3, 18)
+
+
+def test_class_trend_daily(client, create_user, db_session: Session):
+    s1 = create_user("t1@example.com", "password")
+    s2 = create_user("t2@example.com", "password")
+
+    db_session.add_all([
+        _log(s1.id, 0, severity=4),
+        _log(s2.id, 0, severity=2),
+        _log(s1.id, 2, severity=5),
+        _log(s2.id, 20, severity=1),  # outside window, not sick any more
+    ])
+    db_session.commit()
+
+    buckets = class_trend(db_session, [s1.id, s2.id], days=3, bucket="day", now=NOW)
+    assert [b.start for b in buckets] == [
+        date(2026, 3, 16),
+        date(2026, 3, 17),
+        date(2026, 3, 18),
+    ]
+    assert [b.new_reports for b in buckets] == [1, 0, 2]
+    assert [b.sick_count for b in buckets] == [1, 1, 2]
+    assert buckets[0].avg_severity == 5.0
+    assert buckets[1].avg_severity is None
+    assert buckets[2].avg_severity == 3.0
+
+
+def test_class_trend_sick_count_expires_after_sick_days(client, create_user, db_session):
+    s1 = create_user("t3@example.com", "password")
+    db_session.add(_log(s1.id, 9))
+    db_session.commit()
+
+    buckets = class_trend(db_session, [s1.id], days=11, bucket="day", now=NOW)
+    # sick on the report day and the 6 days after it, healthy afterwards
+    assert [b.sick_count for b in buckets] == [0, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0]
+    assert sum(b.new_reports for b in buckets) == 1
+
+
+def test_class_trend_weekly(client, create_user, db_session):
+    s1 = create_user("t4@example.com", "password")
+    db_session.add_all([_log(s1.id, 0), _log(s1.id, 1), _log(s1.id, 8)])
+    db_session.commit()
+
+    buckets = class_trend(db_session, [s1.id], days=14, bucket="week", now=NOW)
+    assert [b.start for b in buckets] == [
+        date(2026, 3, 2),
+        date(2026, 3, 9),
+        date(2026, 3, 16),
+    ]
+    assert [b.new_reports for b in buckets] == [0, 1, 2]
+    assert [b.sick_count for b in buckets] == [0, 1, 1]
+
+
+def test_class_trend_no_students(client, db_session):
+    buckets = class_trend(db_session, [], days=2, bucket="day", now=NOW)
+    assert len(buckets) == 2
+    assert all(b.sick_count == 0 and b.new_reports == 0 for b in buckets)
@@ -0,0 +1,136 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlmodel import Session, create_engine, select
+
+from app.archive import archive_old_reports, archive_stats, user_reports
+from app.cache import summary_cache
+from app.changes import last_seq
+from app.db import init_db
+from app.models import Class, ClassEnrollment, IllnessLog, IllnessLogArchive
+from app.search import FTS_TABLE
+from app.summary import summarize_class
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _log(user_id: int, days_ago: float, symptoms: str = "cough") -> IllnessLog:
+    return IllnessLog(
+        user_id=user_id,
+        symptoms=symptoms,
+        severity=2,
+        recoveryTime=2,
+        created_at=NOW - timedelta(days=days_ago),
+    )
+
+
+def test_archive_moves_only_old_reports(client, create_user, db_session: Session):
+    prof = create_user("archprof@example.com", "password", role="professor")
+    student = create_user("arch@example.com", "password")
+    clazz = Class(name="ArchClass", code="ARCH", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    db_session.add_all([
+        _log(student.id, 500, "old flu"),
+        _log(student.id, 450, "old cold"),
+        _log(student.id, 2, "fever"),
+    ])
+    db_session.commit()
+
+    before = summarize_class(db_session, [student.id], now=NOW, engine="python")
+    history_before = [log.symptoms for log in user_reports(db_session, student.id)]
+
+    assert archive_old_reports(db_session, now=NOW, horizon_days=400, batch_size=1) == 2
+
+    stats = archive_stats(db_session)
+    assert stats["hot_reports"] == 1
+    assert stats["archived_reports"] == 2
+    # ids survive the move
+    assert {a.symptoms for a in db_session.exec(select(IllnessLogArchive)).all()} == {
+        "old flu", "old cold"
+    }
+
+    after = summarize_class(db_session, [student.id], now=NOW, engine="python")
+    assert after.model_dump() == before.model_dump()
+    assert [log.symptoms for log in user_reports(db_session, student.id)] == history_before
+    assert history_before == ["fever", "old cold", "old flu"]
+
+    # nothing left to move
+    assert archive_old_reports(db_session, now=NOW, horizon_days=400) == 0
+
+
+def test_archive_keeps_sick_window_and_never_reuses_ids(client, create_user, db_session: Session):
+    student = create_user("arch2@example.com", "password")
+    db_session.add_all([_log(student.id, 3), _log(student.id, 1000)])
+    db_session.commit()
+
+    # a horizon shorter than SICK_DAYS is clamped
+    assert archive_old_reports(db_session, now=NOW, horizon_days=1) == 1
+    assert archive_stats(db_session)["hot_reports"] == 1
+
+    # archiving the newest report does not free its id
+    assert archive_old_reports(db_session, now=NOW + timedelta(days=30), horizon_days=7) == 1
+    archived = db_session.exec(select(func.max(IllnessLogArchive.id))).one()
+    report = _log(student.id, 0)
+    db_session.add(report)
+    db_session.commit()
+    assert report.id > archived
+
+
+def test_archive_drops_cached_summaries(client, create_user, db_session: Session):
+    prof = create_user("archcache@example.com", "password", role="professor")
+    student = create_user("archcached@example.com", "password")
+    clazz = Class(name="ArchCache", code="ARCHC", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    db_session.add(_log(student.id, 500))
+    db_session.commit()
+
+    summary_cache.set(clazz.id, "full", "body", summary_cache.generation(clazz.id))
+    assert archive_old_reports(db_session, now=NOW, horizon_days=400) == 1
+    assert summary_cache.get(clazz.id, "full") is None
+
+
+def _matches(session: Session, query: str) -> list[int]:
+    return session.connection().exec_driver_sql(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", (query,)
+    ).scalars().all()
+
+
+def test_init_db_makes_old_report_ids_autoincrement(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL);
+        CREATE TABLE illnesslog (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL,
+            symptoms VARCHAR NOT NULL, severity INTEGER NOT NULL, "recoveryTime" INTEGER NOT NULL,
+            created_at DATETIME NOT NULL);
+        CREATE TABLE illnesslogarchive (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL,
+            symptoms VARCHAR NOT NULL, severity INTEGER NOT NULL, "recoveryTime" INTEGER NOT NULL,
+            created_at DATETIME NOT NULL, archived_at DATETIME NOT NULL);
+        INSERT INTO user (id, email) VALUES (1, 'old@example.com');
+        INSERT INTO illnesslogarchive VALUES (7, 1, 'flu', 2, 2, '2024-01-01', '2025-03-01');
+        INSERT INTO illnesslog VALUES (3, 1, 'cough', 2, 2, '2026-03-01');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with Session(engine) as session:
+        assert [log.symptoms for log in session.exec(select(IllnessLog)).all()] == ["cough"]
+        assert _matches(session, "cough") == [3]
+        report = IllnessLog(user_id=1, symptoms="fever", severity=3, recoveryTime=2)
+        session.add(report)
+        session.commit()
+        # past the archived id, and the triggers are back
+        assert report.id == 8
+        assert _matches(session, "fever") == [8]
+        assert last_seq(session) > 0
+    # the migration runs once
+    init_db(engine)
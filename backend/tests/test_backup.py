@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.backup import BackupError, list_snapshots, restore_snapshot, take_snapshot
+
+
+def _make_db(path, rows=2000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE report (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.executemany("INSERT INTO report (body) VALUES (?)", [("x" * 200,)] * rows)
+    conn.commit()
+    conn.close()
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM report").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshot_while_writes_are_in_flight(tmp_path):
+    source = str(tmp_path / "live.db")
+    _make_db(source)
+    stop = threading.Event()
+    written = []
+
+    def writer():
+        conn = sqlite3.connect(source, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO report (body) VALUES ('y')")
+            conn.commit()
+            written.append(1)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        result = take_snapshot(source, str(tmp_path / "backups"), pages=4, sleep=0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert written  # the writer made progress during the backup
+    # a consistent point-in-time copy: every row is whole and the count is
+    # somewhere between the start and the end of the backup
+    assert 2000 <= _count(result["path"]) <= 2000 + len(written)
+    conn = sqlite3.connect(result["path"])
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    conn.close()
+
+
+def test_compressed_snapshot_restores(tmp_path):
+    source = str(tmp_path / "live.db")
+    _make_db(source, rows=50)
+    backups = str(tmp_path / "backups")
+
+    result = take_snapshot(source, backups, compress=True)
+    assert result["name"].endswith(".db.gz")
+    assert [s["name"] for s in list_snapshots(backups)] == [result["name"]]
+
+    conn = sqlite3.connect(source)
+    conn.execute("DELETE FROM report")
+    conn.commit()
+    conn.close()
+
+    restore_snapshot(result["path"], source)
+    assert _count(source) == 50
+
+
+def test_restore_rejects_corrupt_snapshot(tmp_path):
+    target = str(tmp_path / "live.db")
+    _make_db(target, rows=5)
+    bogus = tmp_path / "app-bogus.db"
+    bogus.write_bytes(b"SQLite format 3\x00" + b"\x00" * 200)
+
+    with pytest.raises((BackupError, sqlite3.DatabaseError)):
+        restore_snapshot(str(bogus), target)
+    assert _count(target) == 5
+
+
+def _snapshot_under_write_load(tmp_path, monkeypatch, wal: bool):
+    """
+    Snapshot a database that a writer commits to in a loop, with restarts
+    forcing the single-step fallback. The writer does not wait for locks,
+    so any commit the snapshot blocks fails. Returns the snapshot result
+    (or the BackupError), the number of commits and the lock errors.
+    """
+    source = str(tmp_path / "live.db")
+    _make_db(source, rows=150000)
+    if wal:
+        conn = sqlite3.connect(source)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    monkeypatch.setattr("app.backup.BACKUP_MAX_RESTARTS", 0)
+    stop = threading.Event()
+    commits = []
+    errors = []
+
+    def writer():
+        conn = sqlite3.connect(source, timeout=0)
+        while not stop.is_set():
+            try:
+                conn.execute("INSERT INTO report (body) VALUES ('y')")
+                conn.commit()
+                commits.append(1)
+            except sqlite3.OperationalError as exc:
+                conn.rollback()
+                errors.append(str(exc))
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        while not commits:
+            time.sleep(0.001)
+        try:
+            result = take_snapshot(source, str(tmp_path / "backups"), pages=4, sleep=0.001)
+        except BackupError as exc:
+            result = exc
+    finally:
+        stop.set()
+        thread.join()
+    return result, len(commits), errors
+
+
+def test_single_step_fallback_does_not_block_writers_in_wal_mode(tmp_path, monkeypatch):
+    result, commits, errors = _snapshot_under_write_load(tmp_path, monkeypatch, wal=True)
+    assert result["restarts"] >= 1
+    # the fallback copied the whole database in one step...
+    assert result["max_step_ms"] > 20
+    # ...while the writer kept committing without ever hitting a lock
+    assert errors == []
+    assert commits > 1
+    assert _count(result["path"]) >= 150000
+
+
+def test_fallback_refused_when_it_would_block_writers(tmp_path, monkeypatch):
+    result, commits, errors = _snapshot_under_write_load(tmp_path, monkeypatch, wal=False)
+    assert isinstance(result, BackupError)
+    assert list_snapshots(str(tmp_path / "backups")) == []
@@ -0,0 +1,105 @@
+import time
+
+from sqlmodel import Session
+
+from app.cache import LRUBackend, ResultCache, SQLiteBackend, summary_cache
+from app.models import Class, ClassEnrollment, IllnessLog
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = LRUBackend(max_entries=2)
+    backend.set(1, "full", "a", time.time() + 60)
+    backend.set(2, "full", "b", time.time() + 60)
+    backend.get(1, "full")  # 1 is now most recently used
+    backend.set(3, "full", "c", time.time() + 60)
+
+    assert backend.get(1, "full") is not None
+    assert backend.get(2, "full") is None
+    assert backend.get(3, "full") is not None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    worker_a = SQLiteBackend(path)
+    worker_b = SQLiteBackend(path)
+
+    worker_a.set(7, "full", '{"count": 1}', time.time() + 60)
+    worker_a.set(7, "headline", '{"count": 1}', time.time() + 60)
+    assert worker_b.get(7, "full")[0] == '{"count": 1}'
+
+    assert worker_b.delete_class(7) is True
+    assert worker_a.get(7, "full") is None
+    assert worker_a.get(7, "headline") is None
+
+
+def test_result_cache_ttl_and_stats():
+    cache = ResultCache(LRUBackend(), ttl=60)
+    assert cache.get(1, "full") is None
+    assert cache.set(1, "full", "body", cache.generation(1), ttl=0.05)
+    assert cache.get(1, "full") == "body"
+
+    time.sleep(0.06)
+    assert cache.get(1, "full") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["expirations"] == 1
+    assert stats["hit_ratio"] == round(1 / 3, 4)
+
+
+def test_result_cache_drops_results_computed_before_invalidation():
+    cache = ResultCache(LRUBackend(), ttl=60)
+    generation = cache.generation(1)
+    # a write lands while the summary is being computed
+    cache.invalidate_class(1)
+    assert cache.set(1, "full", "stale", generation) is False
+    assert cache.get(1, "full") is None
+
+
+def _cached_class(db_session: Session, create_user):
+    prof = create_user("cacheprof@example.com", "password", role="professor")
+    enrolled = create_user("cached@example.com", "password")
+    outsider = create_user("outsider@example.com", "password")
+    clazz = Class(name="CacheClass", code="CACHE", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.refresh(clazz)
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=enrolled.id))
+    db_session.commit()
+
+    summary_cache.set(clazz.id, "full", "body", summary_cache.generation(clazz.id))
+    return clazz, enrolled, outsider
+
+
+def _log(user_id):
+    return IllnessLog(user_id=user_id, symptoms="fever", severity=2, recoveryTime=1)
+
+
+def test_report_for_enrolled_student_invalidates(client, create_user, db_session):
+    clazz, enrolled, outsider = _cached_class(db_session, create_user)
+
+    db_session.add(_log(outsider.id))
+    db_session.commit()
+    assert summary_cache.get(clazz.id, "full") == "body"
+
+    db_session.add(_log(enrolled.id))
+    db_session.commit()
+    assert summary_cache.get(clazz.id, "full") is None
+
+
+def test_rolled_back_write_does_not_invalidate(client, create_user, db_session):
+    clazz, enrolled, _ = _cached_class(db_session, create_user)
+
+    db_session.add(_log(enrolled.id))
+    db_session.flush()
+    db_session.rollback()
+    assert summary_cache.get(clazz.id, "full") == "body"
+
+
+def test_enrollment_change_invalidates(client, create_user, db_session):
+    clazz, _, outsider = _cached_class(db_session, create_user)
+
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=outsider.id))
+    db_session.commit()
+    assert summary_cache.get(clazz.id, "full") is None
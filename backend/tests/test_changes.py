@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from app.archive import archive_old_reports
+from app.changes import ChangeFeed, CursorExpired, change_feed, ensure_change_log
+from app.classes import enroll
+from app.friends import import_friends
+from app.models import ChangeLog, Class, IllnessLog, IllnessLogArchive
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _changes(session: Session) -> list[tuple[str, str]]:
+    return [(c.table, c.op) for c in change_feed.read(session, 0, 1000).changes]
+
+
+def test_triggers_log_orm_and_core_writes(client, create_user, db_session: Session):
+    prof = create_user("cdcprof@example.com", "password", role="professor")
+    student = create_user("cdc@example.com", "password")
+    clazz = Class(name="CDC", code="CDC1", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+
+    # Core inserts that bypass the ORM
+    enroll(db_session, clazz.id, student.id)
+    import_friends(db_session, student.id, [{"friend_name": "Ana", "friend_email": "ana@example.com"}])
+
+    log = IllnessLog(user_id=student.id, symptoms="fever", severity=3, recoveryTime=2)
+    db_session.add(log)
+    db_session.commit()
+    log.severity = 4
+    db_session.add(log)
+    db_session.commit()
+    db_session.delete(log)
+    db_session.commit()
+
+    assert _changes(db_session) == [
+        ("class", "insert"),
+        ("classenrollment", "insert"),
+        ("friend", "insert"),
+        ("illnesslog", "insert"),
+        ("illnesslog", "update"),
+        ("illnesslog", "delete"),
+    ]
+    page = change_feed.read(db_session, 0, 1000)
+    assert [c.seq for c in page.changes] == list(range(1, 7))
+    insert = page.changes[3]
+    assert insert.row_id == log.id
+    assert insert.data["symptoms"] == "fever"
+    assert page.changes[4].data["severity"] == 4
+    assert page.changes[2].data == {
+        "owner_user_id": student.id,
+        "friend_name": "Ana",
+        "friend_email": "ana@example.com",
+    }
+    # trigger timestamps read back as datetimes with their milliseconds
+    assert isinstance(insert.created_at, datetime)
+    assert abs(insert.created_at - datetime.utcnow()) < timedelta(minutes=1)
+
+
+def test_archive_is_not_a_delete(client, create_user, db_session: Session):
+    student = create_user("cdcarch@example.com", "password")
+    db_session.add_all([
+        IllnessLog(user_id=student.id, symptoms="old", severity=2, recoveryTime=1,
+                   created_at=NOW - timedelta(days=500)),
+        IllnessLog(user_id=student.id, symptoms="new", severity=2, recoveryTime=1,
+                   created_at=NOW - timedelta(days=1)),
+    ])
+    db_session.commit()
+
+    assert archive_old_reports(db_session, now=NOW, horizon_days=400) == 1
+    assert _changes(db_session)[-1] == ("illnesslog", "archive")
+
+    archived = db_session.exec(select(IllnessLogArchive)).one()
+    db_session.delete(archived)
+    db_session.commit()
+    last = change_feed.read(db_session, 0, 1000).changes[-1]
+    assert (last.table, last.op, last.row_id) == ("illnesslog", "delete", archived.id)
+    assert _changes(db_session).count(("illnesslog", "archive")) == 1
+
+
+def test_cursor_paging(client, create_user, db_session: Session):
+    student = create_user("cdcpage@example.com", "password")
+    db_session.add_all(
+        IllnessLog(user_id=student.id, symptoms=f"s{i}", severity=1, recoveryTime=1)
+        for i in range(7)
+    )
+    db_session.commit()
+
+    seen, cursor, pages = [], 0, 0
+    while True:
+        page = change_feed.read(db_session, cursor, 3)
+        seen += [c.seq for c in page.changes]
+        cursor = page.next_cursor
+        pages += 1
+        if not page.has_more:
+            break
+    assert seen == list(range(1, 8))
+    assert pages == 3
+
+    # caught up: an empty page keeps the cursor
+    empty = change_feed.read(db_session, cursor, 3)
+    assert empty.changes == [] and empty.next_cursor == cursor and not empty.has_more
+
+
+def test_compaction_expires_stale_cursors(client, create_user, db_session: Session):
+    student = create_user("cdccompact@example.com", "password")
+    db_session.add_all(
+        IllnessLog(user_id=student.id, symptoms=f"s{i}", severity=1, recoveryTime=1)
+        for i in range(4)
+    )
+    db_session.commit()
+    for entry in db_session.exec(select(ChangeLog).where(ChangeLog.id <= 2)).all():
+        entry.created_at = datetime.utcnow() - timedelta(days=40)
+        db_session.add(entry)
+    db_session.commit()
+
+    feed = ChangeFeed(retention_days=30)
+    assert feed.compact(db_session) == 2
+    assert feed.compact(db_session) == 0
+
+    assert [c.seq for c in feed.read(db_session, 2, 10).changes] == [3, 4]
+    with pytest.raises(CursorExpired):
+        feed.read(db_session, 1, 10)
+    with pytest.raises(CursorExpired):
+        feed.read(db_session, 0, 10)
+
+    # once everything is compacted, only a caught-up cursor is valid
+    feed.compact(db_session, now=datetime.now(timezone.utc) + timedelta(days=31))
+    assert db_session.exec(select(ChangeLog)).all() == []
+    assert feed.read(db_session, 4, 10).changes == []
+    with pytest.raises(CursorExpired):
+        feed.read(db_session, 3, 10)
+
+    # sequence numbers are not reused after compaction
+    db_session.add(IllnessLog(user_id=student.id, symptoms="later", severity=1, recoveryTime=1))
+    db_session.commit()
+    assert [c.seq for c in feed.read(db_session, 4, 10).changes] == [5]
+
+
+def test_ensure_change_log_is_idempotent(client, db_session: Session):
+    from .conftest import test_engine
+
+    ensure_change_log(test_engine)
+    ensure_change_log(test_engine)
+    db_session.add(Class(name="Twice", code="TWICE", professor_id=1))
+    db_session.commit()
+    assert _changes(db_session) == [("class", "insert")]
@@ -0,0 +1,87 @@
+import sqlite3
+
+from sqlmodel import Session, create_engine, select
+
+from app.classes import class_resolver, enroll, normalize_code
+from app.db import init_db
+from app.models import Class, ClassEnrollment
+
+
+def test_normalize_code():
+    assert normalize_code(" cs101 a1 ") == "CS101A1"
+    assert normalize_code("CS101\tA1") == "CS101A1"
+    assert normalize_code("   ") is None
+    assert normalize_code(None) is None
+
+
+def test_resolver_follows_class_changes(client, create_user, db_session: Session):
+    prof = create_user("codeprof@example.com", "password", role="professor")
+    clazz = Class(name="Codes", code="CS101 A1", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    assert clazz.code_key == "CS101A1"
+
+    assert class_resolver.resolve(db_session, "cs101a1") == (clazz.id, "Codes")
+    assert class_resolver.stats()["warm"]
+    hits = class_resolver.hits
+    assert class_resolver.resolve(db_session, "CS101 A1") == (clazz.id, "Codes")
+    assert class_resolver.hits == hits + 1
+
+    # a class created after warm-up resolves through the index
+    later = Class(name="Later", code="bio 2", professor_id=prof.id)
+    db_session.add(later)
+    db_session.commit()
+    assert class_resolver.resolve(db_session, "BIO2") == (later.id, "Later")
+
+    later.code = "BIO 3"
+    db_session.add(later)
+    db_session.commit()
+    assert class_resolver.resolve(db_session, "bio2") is None
+    assert class_resolver.resolve(db_session, "bio3") == (later.id, "Later")
+
+    db_session.delete(clazz)
+    db_session.commit()
+    assert class_resolver.resolve(db_session, "cs101a1") is None
+
+
+def test_enroll_is_idempotent(client, create_user, db_session: Session):
+    prof = create_user("enrollprof@example.com", "password", role="professor")
+    student = create_user("enrollee@example.com", "password")
+    clazz = Class(name="Enroll", code="ENR", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+
+    first = enroll(db_session, clazz.id, student.id)
+    assert first is not None
+    assert enroll(db_session, clazz.id, student.id) is None
+    assert len(db_session.exec(select(ClassEnrollment)).all()) == 1
+
+
+def test_init_db_migrates_old_class_tables(tmp_path, caplog):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE user (id INTEGER PRIMARY KEY, email VARCHAR NOT NULL,
+            full_name VARCHAR, role VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL, notification_privacy VARCHAR NOT NULL);
+        CREATE TABLE class (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL,
+            code VARCHAR, professor_id INTEGER NOT NULL);
+        CREATE TABLE classenrollment (id INTEGER PRIMARY KEY,
+            class_id INTEGER NOT NULL, student_id INTEGER NOT NULL);
+        INSERT INTO class (id, name, code, professor_id) VALUES
+            (1, 'First', 'cs 101', 1), (2, 'Clash', 'CS101', 1), (3, 'NoCode', NULL, 1);
+        INSERT INTO classenrollment (class_id, student_id) VALUES (1, 5), (1, 5), (1, 6);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    assert [r.args[:2] for r in caplog.records if r.name == "app.db"] == [(2, "CS101")]
+    with Session(engine) as session:
+        keys = dict(session.exec(select(Class.id, Class.code_key)).all())
+        assert keys == {1: "CS101", 2: None, 3: None}
+        pairs = session.exec(select(ClassEnrollment.class_id, ClassEnrollment.student_id)).all()
+        assert sorted(pairs) == [(1, 5), (1, 6)]
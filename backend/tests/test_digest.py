@@ -0,0 +1,138 @@
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, create_engine, select
+
+from app.db import init_db
+from app.digest import DigestBuffer
+from app.models import PendingNotification
+
+
+def capture(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        "app.digest.send_email",
+        lambda to, subject, body, from_address=None: sent.append((to, subject, body, from_address)),
+    )
+    return sent
+
+
+def test_digest_flushes_on_window_and_coalesces(client, db_session: Session, monkeypatch):
+    sent = capture(monkeypatch)
+    digest = DigestBuffer(enabled=True, window_seconds=600, max_items=10)
+    digest.add(db_session, [
+        ("Prof@example.com", "Sam is sick", "Sam may miss Algebra.", "sam@example.com"),
+        ("prof@example.com", "Lee is sick", "Lee may miss Algebra.", "lee@example.com"),
+        ("prof@example.com", "Kim is sick", "Kim may miss Biology.", "kim@example.com"),
+        ("friend@example.com", "Your friend is sick", "Sam is sick.", "sam@example.com"),
+    ])
+    db_session.commit()
+
+    now = datetime.now(timezone.utc)
+    assert digest.flush(db_session, now) == 0
+    assert digest.flush(db_session, now + timedelta(seconds=601)) == 2
+
+    by_recipient = {to: (subject, body, sender) for to, subject, body, sender in sent}
+    subject, body, sender = by_recipient["prof@example.com"]
+    assert subject == "3 updates from SickNote"
+    assert "Sam may miss Algebra." in body and "Kim may miss Biology." in body
+    assert sender is None
+    # a lone message goes out as it was written
+    assert by_recipient["friend@example.com"] == ("Your friend is sick", "Sam is sick.", "sam@example.com")
+
+    assert digest.pending(db_session) == 0
+    assert digest.stats()["emails_saved"] == 2
+
+
+def test_digest_flushes_early_at_max_items(client, db_session: Session, monkeypatch):
+    sent = capture(monkeypatch)
+    digest = DigestBuffer(enabled=True, window_seconds=600, max_items=2)
+    digest.add(db_session, [("a@example.com", "one", "1", None)])
+    digest.add(db_session, [("b@example.com", "one", "1", None)] * 2)
+    db_session.commit()
+
+    assert digest.flush(db_session) == 1
+    assert [to for to, *_ in sent] == ["b@example.com"]
+    assert digest.pending(db_session) == 1
+
+
+def test_buffer_survives_restart_and_failed_sends(client, db_session: Session, monkeypatch):
+    before = DigestBuffer(enabled=True)
+    before.add(db_session, [("a@example.com", "s", "b", None)] * 2)
+    db_session.commit()
+
+    def down(**kwargs):
+        raise OSError("smtp down")
+
+    monkeypatch.setattr("app.digest.send_email", down)
+    after = DigestBuffer(enabled=True)
+    assert after.flush(db_session, force=True) == 0
+    assert after.stats()["failed"] == 1
+    assert len(db_session.exec(select(PendingNotification)).all()) == 2
+
+    sent = capture(monkeypatch)
+    assert after.flush(db_session, force=True) == 1
+    assert len(sent) == 1
+
+
+def test_failing_recipient_backs_off_and_is_eventually_dropped(
+    client, db_session: Session, monkeypatch, caplog
+):
+    digest = DigestBuffer(
+        enabled=True, window_seconds=60, max_items=10, retry_seconds=100, max_attempts=3
+    )
+    now = datetime.now(timezone.utc)
+    digest.add(db_session, [("bad@example.com", "s", "b", None)] * 2, now=now)
+    digest.add(db_session, [("good@example.com", "s", "b", None)], now=now)
+    db_session.commit()
+
+    attempts = []
+
+    def bounce(to, subject, body, from_address=None):
+        attempts.append(to)
+        if to == "bad@example.com":
+            raise OSError("mailbox unavailable")
+
+    monkeypatch.setattr("app.digest.send_email", bounce)
+    due = now + timedelta(seconds=61)
+    assert digest.flush(db_session, due) == 1
+    assert attempts == ["bad@example.com", "good@example.com"]
+
+    # backing off 100s, then 200s: not retried on every flush
+    assert digest.flush(db_session, due + timedelta(seconds=99)) == 0
+    assert digest.flush(db_session, due + timedelta(seconds=100)) == 0
+    assert digest.flush(db_session, due + timedelta(seconds=299)) == 0
+    assert attempts.count("bad@example.com") == 2
+    assert digest.pending(db_session) == 2
+
+    # the third failure drops the messages, and says so in the log
+    with caplog.at_level(logging.ERROR, logger="app.digest"):
+        assert digest.flush(db_session, due + timedelta(seconds=300)) == 0
+    assert "digest to bad@example.com failed 3 times, dropping 2 messages" in caplog.text
+    assert attempts.count("bad@example.com") == 3
+    assert digest.pending(db_session) == 0
+    assert digest.stats()["failed"] == 3
+    assert digest.stats()["abandoned"] == 2
+
+
+def test_init_db_adds_retry_columns(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE pendingnotification (id INTEGER PRIMARY KEY, recipient VARCHAR NOT NULL,
+            subject VARCHAR NOT NULL, body VARCHAR NOT NULL, from_address VARCHAR,
+            created_at DATETIME NOT NULL);
+        INSERT INTO pendingnotification (recipient, subject, body, created_at)
+            VALUES ('a@example.com', 's', 'b', '2026-03-18 12:00:00');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with Session(engine) as session:
+        row = session.exec(select(PendingNotification)).one()
+        assert (row.attempts, row.next_attempt_at) == (0, None)
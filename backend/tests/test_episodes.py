@@ -0,0 +1,159 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.analytics import class_trend
+from app.archive import archive_old_reports
+from app.changes import ChangeFeed
+from app.episodes import build_episodes, episode_index
+from app.models import ChangeLog, IllnessEpisode, IllnessLog
+
+NOW = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+def _report(user_id: int, days_ago: float, severity: int = 2, symptoms: str = "cough") -> IllnessLog:
+    return IllnessLog(
+        user_id=user_id, symptoms=symptoms, severity=severity, recoveryTime=2,
+        # SQLite hands back naive UTC datetimes
+        created_at=(NOW - timedelta(days=days_ago)).replace(tzinfo=None),
+    )
+
+
+def _spans(session: Session, user_id: int) -> list[tuple[int, int, int]]:
+    """
+    (start, end) as days before NOW, and report count, oldest first.
+    """
+    today = NOW.date()
+    return [
+        ((today - e.start_day).days, (today - e.end_day).days, e.report_count)
+        for e in reversed(episode_index.episodes(session, user_id))
+    ]
+
+
+def test_build_episodes_merges_touching_sick_days():
+    reports = [_report(1, d) for d in (30, 27, 23, 15, 8, 7)]
+    episodes = build_episodes(1, reports)
+    today = NOW.date()
+    # 30..24 and 27..21 overlap; 23 starts the day after 24 ends; 15 does not
+    assert [((today - e.start_day).days, (today - e.end_day).days) for e in episodes] == [
+        (30, 17), (15, 1),
+    ]
+    assert [e.report_count for e in episodes] == [3, 3]
+
+
+def test_episode_keeps_peak_last_and_symptom_union():
+    episode, = build_episodes(1, [
+        _report(1, 3, 2, "Fever, cough"),
+        _report(1, 2, 5, "fever headache"),
+        _report(1, 1, 3, "sore throat"),
+    ])
+    assert (episode.peak_severity, episode.last_severity) == (5, 3)
+    assert episode.symptoms == ["cough", "fever", "headache", "sore", "throat"]
+    assert episode.first_report_at < episode.last_report_at
+
+
+def test_sync_follows_inserts_and_deletes(client, create_user, db_session: Session):
+    student = create_user("episodes@example.com", "password")
+    db_session.add_all([_report(student.id, 20), _report(student.id, 18)])
+    db_session.commit()
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(20, 12, 2)]
+    assert episode_index.stats()["rebuilds"] == 1
+    recomputed = episode_index.stats()["recomputed_students"]
+
+    # newer reports extend the last episode or start the next one in place
+    db_session.add(_report(student.id, 13))
+    db_session.commit()
+    db_session.add(_report(student.id, 2, severity=4))
+    db_session.commit()
+    assert episode_index.sync(db_session) == 2
+    assert _spans(db_session, student.id) == [(20, 7, 3), (2, -4, 1)]
+    assert episode_index.stats()["extended"] == 1
+    assert episode_index.stats()["recomputed_students"] == recomputed
+
+    # deleting the bridging report splits the episode
+    bridge = db_session.exec(
+        select(IllnessLog).where(IllnessLog.created_at == _report(0, 13).created_at)
+    ).one()
+    db_session.delete(bridge)
+    db_session.commit()
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(20, 12, 2), (2, -4, 1)]
+
+    # a backdated report can merge two episodes
+    db_session.add_all([_report(student.id, 11), _report(student.id, 6)])
+    db_session.commit()
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(20, -4, 5)]
+    assert episode_index.sync(db_session) == 0
+
+
+def test_core_writes_and_archiving(client, create_user, db_session: Session):
+    student = create_user("episodescore@example.com", "password")
+    episode_index.sync(db_session)
+    db_session.exec(
+        IllnessLog.__table__.insert(),
+        params=[
+            {"user_id": student.id, "symptoms": "flu", "severity": 3, "recoveryTime": 2,
+             "created_at": (NOW - timedelta(days=d)).replace(tzinfo=None)}
+            for d in (500, 498, 3)
+        ],
+    )
+    db_session.commit()
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(500, 492, 2), (3, -3, 1)]
+
+    # archived reports are still part of their episode
+    assert archive_old_reports(db_session, horizon_days=400) == 2
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(500, 492, 2), (3, -3, 1)]
+    assert episode_index.stats()["recomputed_students"] == 0
+
+    db_session.exec(text("DELETE FROM illnesslogarchive WHERE user_id = :u"), params={"u": student.id})
+    db_session.commit()
+    episode_index.sync(db_session)
+    assert _spans(db_session, student.id) == [(3, -3, 1)]
+
+
+def test_rebuild_when_change_log_was_compacted(client, create_user, db_session: Session):
+    student = create_user("episodesgap@example.com", "password")
+    db_session.add(_report(student.id, 5))
+    db_session.commit()
+    episode_index.sync(db_session)
+
+    db_session.add(_report(student.id, 1))
+    db_session.commit()
+    ChangeFeed(retention_days=0).compact(db_session, now=datetime.now(timezone.utc) + timedelta(seconds=1))
+    assert db_session.exec(select(ChangeLog)).all() == []
+
+    episode_index.sync(db_session)
+    assert episode_index.stats()["rebuilds"] == 2
+    assert _spans(db_session, student.id) == [(5, -5, 2)]
+    # caught up with the emptied log, not rebuilding on every call
+    assert episode_index.sync(db_session) == 0
+    assert episode_index.stats()["rebuilds"] == 2
+
+
+@pytest.mark.parametrize("bucket", ["day", "week"])
+def test_trend_from_episodes_matches_reports(client, create_user, db_session: Session, bucket):
+    rng = random.Random(50)
+    students = [create_user(f"ep{i}@example.com", "password") for i in range(12)]
+    for student in students:
+        for _ in range(rng.randint(0, 12)):
+            db_session.add(_report(student.id, rng.uniform(0, 80), rng.randint(1, 5)))
+    db_session.commit()
+    episode_index.sync(db_session)
+
+    ids = [s.id for s in students]
+    for days in (1, 7, 30, 60):
+        by_reports = class_trend(db_session, ids, days, bucket, now=NOW, source="reports")
+        by_episodes = class_trend(db_session, ids, days, bucket, now=NOW, source="episodes")
+        assert [b.model_dump() for b in by_episodes] == [b.model_dump() for b in by_reports]
+
+    reports = db_session.exec(select(IllnessLog)).all()
+    episodes = db_session.exec(select(IllnessEpisode)).all()
+    assert sum(e.report_count for e in episodes) == len(reports)
+    assert len(episodes) < len(reports)
@@ -0,0 +1,86 @@
+import threading
+
+from sqlmodel import Session
+
+from app.fanout import NotificationFanout, fanout_recipients
+from app.models import Class, ClassEnrollment, IllnessLog
+
+
+def make_classes(create_user, db_session: Session):
+    prof_a = create_user("prof_a@example.com", "password", role="professor")
+    prof_b = create_user("prof_b@example.com", "password", role="professor")
+    student = create_user("sick@example.com", "password")
+    mate = create_user("mate@example.com", "password")
+    loner = create_user("loner@example.com", "password")
+
+    a = Class(name="Algebra", professor_id=prof_a.id)
+    b = Class(name="Biology", professor_id=prof_b.id)
+    c = Class(name="Chemistry", professor_id=prof_a.id)
+    db_session.add_all([a, b, c])
+    db_session.commit()
+    db_session.add_all([
+        ClassEnrollment(class_id=a.id, student_id=student.id),
+        ClassEnrollment(class_id=b.id, student_id=student.id),
+        ClassEnrollment(class_id=c.id, student_id=student.id),
+        ClassEnrollment(class_id=a.id, student_id=mate.id),
+        ClassEnrollment(class_id=b.id, student_id=mate.id),
+        ClassEnrollment(class_id=c.id, student_id=loner.id),
+    ])
+    db_session.commit()
+    return db_session.get(type(student), student.id)
+
+
+def test_recipients_follow_privacy_and_are_deduped(client, create_user, db_session: Session):
+    student = make_classes(create_user, db_session)
+
+    student.notification_privacy = "friends"
+    assert fanout_recipients(db_session, student) == []
+
+    student.notification_privacy = "professors"
+    found = {r.email: (r.is_professor, r.classes) for r in fanout_recipients(db_session, student)}
+    assert found == {
+        "prof_a@example.com": (True, ["Algebra", "Chemistry"]),
+        "prof_b@example.com": (True, ["Biology"]),
+    }
+
+    student.notification_privacy = "everyone"
+    found = {r.email: (r.is_professor, r.classes) for r in fanout_recipients(db_session, student)}
+    assert found == {
+        "prof_a@example.com": (True, ["Algebra", "Chemistry"]),
+        "prof_b@example.com": (True, ["Biology"]),
+        "mate@example.com": (False, ["Algebra", "Biology"]),
+        "loner@example.com": (False, ["Chemistry"]),
+    }
+
+
+def test_worker_sends_in_background_and_drains_on_stop(
+    client, create_user, db_session: Session, monkeypatch
+):
+    student = make_classes(create_user, db_session)
+    student.notification_privacy = "everyone"
+    log = IllnessLog(user_id=student.id, symptoms="flu", severity=3, recoveryTime=2)
+
+    busy, gate = threading.Event(), threading.Event()
+    sent = []
+
+    def slow_send(to, subject, body, from_address=None):
+        busy.set()
+        gate.wait()
+        sent.append(to)
+
+    monkeypatch.setattr("app.fanout.send_email", slow_send)
+    fanout = NotificationFanout(queue_size=3)
+    fanout.start()
+    try:
+        # park the worker on an earlier email, then fill the queue past its bound
+        fanout._queue.put(("earlier@example.com", "s", "b", None))
+        assert busy.wait(5)
+        assert fanout.notify(db_session, student, log) == 4
+        assert sent == []
+        assert fanout.stats()["queued"] == 3
+        assert fanout.dropped == 1
+    finally:
+        gate.set()
+        fanout.stop()
+    assert len(sent) == 4
+    assert fanout.stats()["sent"] == 4
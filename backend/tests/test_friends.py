@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+from sqlmodel import Session, create_engine, select
+
+from app.db import init_db
+from app.friends import InvalidImport, import_friends, normalize_email, parse_csv
+from app.models import Friend
+
+
+def test_normalize_email():
+    assert normalize_email(" Sam@Example.EDU ") == "sam@example.edu"
+    assert normalize_email("  ") is None
+    assert normalize_email(None) is None
+
+
+def test_parse_csv_accepts_common_headers():
+    text = "\ufeffName,E-mail,Phone\nSam,sam@example.com,555\nLee,lee@example.com,\n"
+    assert parse_csv(text) == [
+        {"friend_name": "Sam", "friend_email": "sam@example.com"},
+        {"friend_name": "Lee", "friend_email": "lee@example.com"},
+    ]
+    assert parse_csv("email\nx@example.com\n") == [
+        {"friend_name": None, "friend_email": "x@example.com"}
+    ]
+    with pytest.raises(InvalidImport):
+        parse_csv("name,phone\nSam,555\n")
+
+
+def test_import_dedupes_within_upload_and_against_existing(
+    client, create_user, db_session: Session
+):
+    owner = create_user("owner@example.com", "password")
+    db_session.add(Friend(owner_user_id=owner.id, friend_name="Sam", friend_email="SAM@example.com"))
+    db_session.commit()
+
+    result = import_friends(db_session, owner.id, [
+        {"friend_name": "Sam again", "friend_email": "sam@example.com "},
+        {"friend_name": "", "friend_email": "lee@example.com"},
+        {"friend_name": "Lee", "friend_email": "LEE@example.com"},
+        {"friend_name": "Bad", "friend_email": "not-an-email"},
+    ])
+
+    assert [(f.friend_name, f.friend_email) for f in result.created] == [("lee", "lee@example.com")]
+    assert result.duplicates == 2
+    assert [(e.row, e.reason) for e in result.invalid] == [(4, "invalid email")]
+    emails = db_session.exec(select(Friend.friend_email).order_by(Friend.id)).all()
+    assert emails == ["sam@example.com", "lee@example.com"]
+
+
+def test_init_db_dedupes_old_friend_rows(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE friend (id INTEGER PRIMARY KEY, owner_user_id INTEGER NOT NULL,
+            friend_name VARCHAR NOT NULL, friend_email VARCHAR NOT NULL);
+        INSERT INTO friend (owner_user_id, friend_name, friend_email) VALUES
+            (1, 'Sam', 'Sam@Example.com'), (1, 'Sam 2', 'sam@example.com '),
+            (2, 'Sam', 'sam@example.com'), (1, 'Lee', 'lee@example.com');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Friend.owner_user_id, Friend.friend_name, Friend.friend_email).order_by(Friend.id)
+        ).all()
+    assert rows == [
+        (1, "Sam", "sam@example.com"),
+        (2, "Sam", "sam@example.com"),
+        (1, "Lee", "lee@example.com"),
+    ]
+    with sqlite3.connect(path) as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list('friend')")}
+    assert "ux_friend_owner_user_id_friend_email" in indexes
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.group_commit import GroupCommitWriter, report_writer
+from app.models import IllnessLog, LogCreate
+
+from .conftest import test_engine
+
+
+def _log(severity: int = 2) -> LogCreate:
+    return LogCreate(symptoms="cough", severity=severity, recoveryTime=3)
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'group.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_concurrent_inserts_share_commits(file_engine):
+    writer = GroupCommitWriter(max_delay_ms=50)
+    writer.start(file_engine)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            futures = list(pool.map(lambda i: writer.submit(_log(), user_id=i + 1), range(64)))
+        ids = [f.result(timeout=10) for f in futures]
+    finally:
+        writer.stop()
+
+    assert len(set(ids)) == 64
+    assert writer.rows == 64
+    assert writer.batches < 64
+
+    with Session(file_engine) as session:
+        rows = session.exec(select(IllnessLog)).all()
+    assert {row.id for row in rows} == set(ids)
+    assert {row.user_id for row in rows} == set(range(1, 65))
+
+
+def test_bad_row_only_fails_its_own_request(file_engine):
+    writer = GroupCommitWriter(max_delay_ms=200)
+    writer.start(file_engine)
+    try:
+        good = writer.submit(_log(), user_id=1)
+        bad = writer.submit(
+            LogCreate.model_construct(symptoms=None, severity=2, recoveryTime=3), user_id=1
+        )
+        also_good = writer.submit(_log(), user_id=2)
+        assert good.result(timeout=10) != also_good.result(timeout=10)
+        with pytest.raises(Exception):
+            bad.result(timeout=10)
+    finally:
+        writer.stop()
+
+    assert writer.fallbacks == 1
+
+
+def test_stop_flushes_queued_inserts(file_engine):
+    writer = GroupCommitWriter(max_delay_ms=1000)
+    writer.start(file_engine)
+    future = writer.submit(_log(), user_id=1)
+    writer.stop()
+    assert future.result(timeout=0) is not None
+    assert not writer.running
+
+
+def test_create_report_through_group_commit(client, student_auth_headers):
+    report_writer.reset_stats()
+    report_writer.start(test_engine)
+    try:
+        res = client.post(
+            "/api/reports",
+            headers=student_auth_headers,
+            json={"symptoms": "fever", "severity": 3, "recoveryTime": 2},
+        )
+    finally:
+        report_writer.stop()
+
+    assert res.status_code == 201
+    assert res.json()["symptoms"] == "fever"
+    assert report_writer.rows == 1
+
+    listed = client.get("/api/reports", headers=student_auth_headers).json()
+    assert [r["id"] for r in listed] == [res.json()["id"]]
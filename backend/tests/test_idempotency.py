@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.idempotency import IdempotencyStore
+from app.models import IdempotencyRecord
+
+SCOPE = "POST /api/reports"
+
+
+def test_in_flight_claim_conflicts(client, create_user, db_session: Session):
+    user = create_user("idem1@example.com", "password")
+    store = IdempotencyStore()
+
+    assert store.replay(db_session, user.id, SCOPE, "k", {"a": 1}) is None
+    store.claim(db_session, user.id, SCOPE, "k", {"a": 1})
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        store.replay(db_session, user.id, SCOPE, "k", {"a": 1})
+    assert exc.value.status_code == 409
+
+    # keys are scoped per user and endpoint
+    assert store.replay(db_session, user.id, "POST /notify-friends", "k", {"a": 1}) is None
+
+
+def test_failed_request_releases_key(client, create_user, db_session: Session):
+    user = create_user("idem2@example.com", "password")
+    store = IdempotencyStore()
+
+    record = store.claim(db_session, user.id, SCOPE, "k", {"a": 1})
+    db_session.commit()
+    store.release(db_session, record)
+    assert store.replay(db_session, user.id, SCOPE, "k", {"a": 1}) is None
+
+
+def test_expired_keys_are_swept(client, create_user, db_session: Session):
+    user = create_user("idem3@example.com", "password")
+    store = IdempotencyStore(ttl=60, sweep_interval=3600)
+
+    for key in ("old", "new"):
+        record = store.claim(db_session, user.id, SCOPE, key, {})
+        store.complete(db_session, record, 201, {"id": 1})
+        db_session.commit()
+
+    old = db_session.exec(
+        select(IdempotencyRecord).where(IdempotencyRecord.key == "old")
+    ).one()
+    old.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db_session.add(old)
+    db_session.commit()
+
+    # an expired key is not replayed, even before the sweep removes it
+    assert store.replay(db_session, user.id, SCOPE, "old", {}) is None
+    assert store.replay(db_session, user.id, SCOPE, "new", {}).status_code == 201
+
+    assert store.sweep(db_session, now=datetime.now(timezone.utc) + timedelta(seconds=120)) == 1
+    assert db_session.exec(select(IdempotencyRecord)).all() == []
+
+
+def test_invalid_key_rejected(client, create_user, db_session: Session):
+    user = create_user("idem4@example.com", "password")
+    with pytest.raises(HTTPException) as exc:
+        IdempotencyStore().replay(db_session, user.id, SCOPE, "x" * 300, {})
+    assert exc.value.status_code == 400
@@ -0,0 +1,115 @@
+import multiprocessing
+import time
+
+from sqlmodel import SQLModel, Session, create_engine
+
+from app.cache import LRUBackend, ResultCache
+from app.invalidation import InvalidationBus
+from app.models import CacheInvalidation
+
+MAX_DELAY = 0.2
+
+
+def _make_worker_cache(bus: InvalidationBus) -> ResultCache:
+    cache = ResultCache(LRUBackend(), ttl=600)
+    bus.subscribe("summary", lambda key: cache.invalidate_class(int(key)))
+    return cache
+
+
+def _worker(db_url, ready, committed, results):
+    """
+    A stand-in uvicorn worker: caches a summary, then keeps serving it
+    until the bus tells it the entry is stale. Reports whether the entry
+    was dropped and how many hits it served after a poll that started
+    once the invalidation had committed; the bound says there are none.
+    """
+    engine = create_engine(db_url)
+    bus = InvalidationBus(max_delay=MAX_DELAY)
+    cache = _make_worker_cache(bus)
+
+    with Session(engine) as session:
+        bus.sync(session, force=True)
+    cache.set(1, "full", "v1", cache.generation(1))
+    ready.set()
+
+    deadline = time.monotonic() + 30
+    polled_since_commit = False
+    stale_hits = 0
+    while time.monotonic() < deadline:
+        after_commit = committed.is_set()
+        last_poll = bus._last_sync
+        with Session(engine) as session:
+            bus.sync(session)
+        polled_since_commit |= after_commit and bus._last_sync != last_poll
+        if cache.get(1, "full") is None:
+            results.put((True, stale_hits))
+            return
+        stale_hits += polled_since_commit
+        time.sleep(0.002)
+    results.put((False, stale_hits))
+
+
+def test_workers_drop_entries_within_bound(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'bus.db'}"
+    engine = create_engine(db_url)
+    SQLModel.metadata.create_all(engine)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    committed = ctx.Event()
+    workers = []
+    for _ in range(2):
+        ready = ctx.Event()
+        proc = ctx.Process(target=_worker, args=(db_url, ready, committed, results))
+        proc.start()
+        workers.append((proc, ready))
+    for _, ready in workers:
+        assert ready.wait(30)
+
+    writer_bus = InvalidationBus()
+    with Session(engine) as session:
+        writer_bus.publish(session, "summary", [1])
+        session.commit()
+    committed.set()
+
+    # each worker polls until it sees the invalidation or its deadline passes
+    outcomes = [results.get(timeout=60) for _ in workers]
+    for proc, _ in workers:
+        proc.join(timeout=10)
+
+    for dropped, stale_hits in outcomes:
+        assert dropped
+        # the first poll after the commit drops the entry
+        assert stale_hits == 0
+
+
+def test_publish_is_part_of_the_transaction(client, db_session: Session):
+    bus = InvalidationBus(max_delay=0)
+    cache = _make_worker_cache(bus)
+    bus.sync(db_session)
+    cache.set(5, "full", "v1", cache.generation(5))
+
+    bus.publish(db_session, "summary", [5])
+    db_session.rollback()
+    assert bus.sync(db_session) == 0
+    assert cache.get(5, "full") == "v1"
+
+    bus.publish(db_session, "summary", [5])
+    db_session.commit()
+    assert bus.sync(db_session) == 1
+    assert cache.get(5, "full") is None
+
+
+def test_sync_is_rate_limited_and_prune_drops_old_rows(client, db_session: Session):
+    bus = InvalidationBus(max_delay=60)
+    bus.sync(db_session)  # sets the cursor
+    bus.publish(db_session, "summary", [1, 2])
+    db_session.commit()
+
+    assert bus.sync(db_session) == 0  # polled less than max_delay ago
+    assert bus.sync(db_session, force=True) == 2
+
+    assert bus.prune(db_session, retention=0) == 2
+    assert db_session.exec(
+        CacheInvalidation.__table__.select()
+    ).all() == []
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlalchemy import text
+from sqlmodel import Session, select
 from datetime import datetime, timedelta, timezone
 
 from app.models import IllnessLog, Friend, Class, ClassEnrollment, User
@@ -784,4 +785,826 @@ def test_class_summary_with_data(
     assert data["count"] == 2
     # average of 3 and 5 is 4.0
     assert data["avg_severity"] == 4.0
-    assert "fever" in data["common_symptoms"]
\ No newline at end of file
+    assert "fever" in data["common_symptoms"]
+
+def test_class_trend_endpoint(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    headers_for,
+):
+    prof = create_user("prof8@example.com", "password", role="professor")
+    s1 = create_user("s3@example.com", "password", role="student")
+
+    session = db_session
+    clazz = Class(name="TrendClass", code="TREND", professor_id=prof.id)
+    session.add(clazz)
+    session.commit()
+    session.refresh(clazz)
+
+    session.add(ClassEnrollment(class_id=clazz.id, student_id=s1.id))
+    session.add(
+        IllnessLog(
+            user_id=s1.id,
+            symptoms="cough",
+            severity=2,
+            recoveryTime=3,
+            created_at=datetime.now(timezone.utc),
+        )
+    )
+    session.commit()
+
+    headers = headers_for(prof.email)
+
+    res = client.get(f"/api/classes/{clazz.id}/trend?days=7", headers=headers)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["bucket"] == "day"
+    assert len(data["buckets"]) == 7
+    assert data["buckets"][-1]["new_reports"] == 1
+    assert data["buckets"][-1]["sick_count"] == 1
+
+    res_bad = client.get(
+        f"/api/classes/{clazz.id}/trend?bucket=month", headers=headers
+    )
+    assert res_bad.status_code == 422
+
+    res_missing = client.get("/api/classes/9999/trend", headers=headers)
+    assert res_missing.status_code == 404
+
+    # only the class's professor sees its trend
+    create_user("prof8b@example.com", "password", role="professor")
+    for email in (s1.email, "prof8b@example.com"):
+        res = client.get(f"/api/classes/{clazz.id}/trend", headers=headers_for(email))
+        assert res.status_code == 404
+
+
+def test_alerts_endpoint_professor_only(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    headers_for,
+):
+    prof = create_user("prof9@example.com", "password", role="professor")
+    other_prof = create_user("prof10@example.com", "password", role="professor")
+    students = [
+        create_user(f"spike{i}@example.com", "password", role="student")
+        for i in range(4)
+    ]
+
+    session = db_session
+    mine = Class(name="MyClass", code="MINE", professor_id=prof.id)
+    theirs = Class(name="TheirClass", code="THEIRS", professor_id=other_prof.id)
+    session.add_all([mine, theirs])
+    session.commit()
+    session.refresh(mine)
+    session.refresh(theirs)
+
+    for s in students:
+        session.add(ClassEnrollment(class_id=mine.id, student_id=s.id))
+        session.add(ClassEnrollment(class_id=theirs.id, student_id=s.id))
+        session.add(
+            IllnessLog(
+                user_id=s.id,
+                symptoms="fever",
+                severity=4,
+                recoveryTime=3,
+                created_at=datetime.now(timezone.utc),
+            )
+        )
+    session.commit()
+
+    res = client.get("/api/alerts", headers=headers_for(prof.email))
+    assert res.status_code == 200
+    alerts = res.json()["alerts"]
+    class_alerts = [a for a in alerts if a["scope"] == "class"]
+    assert [a["class_name"] for a in class_alerts] == ["MyClass"]
+    assert any(a["scope"] == "campus" for a in alerts)
+
+    assert client.get("/api/alerts", headers=headers_for(students[0].email)).status_code == 403
+
+
+def test_top_symptoms_endpoint(client: TestClient, create_user, db_session: Session, headers_for):
+    from app.sketch import symptom_sketches
+
+    student = create_user("symstudent@example.com", "password", role="student")
+    prof = create_user("symprof@example.com", "password", role="professor")
+
+    student_headers = headers_for(student.email)
+    for symptoms in ["fever cough", "fever", "headache"]:
+        res = client.post(
+            "/api/reports",
+            headers=student_headers,
+            json={"symptoms": symptoms, "severity": 2, "recoveryTime": 2},
+        )
+        assert res.status_code == 201
+
+    headers = headers_for(prof.email)
+    # requests only read the sketches; the background job folds reports in
+    assert client.get("/api/symptoms/top", headers=headers).json()["total_words"] == 0
+    assert symptom_sketches.refresh(db_session) == 3
+
+    res = client.get("/api/symptoms/top?days=7&k=2", headers=headers)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["total_words"] == 4
+    assert [s["symptom"] for s in data["symptoms"]] == ["fever", "cough"]
+    assert data["symptoms"][0]["count"] == 2
+
+    assert client.get("/api/symptoms/top", headers=student_headers).status_code == 403
+
+
+def test_class_summary_is_cached_until_a_report_changes(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    admin_auth_headers,
+    headers_for,
+):
+    prof = create_user("prof11@example.com", "password", role="professor")
+    s1 = create_user("s4@example.com", "password", role="student")
+
+    session = db_session
+    clazz = Class(name="CachedClass", code="CACHED", professor_id=prof.id)
+    session.add(clazz)
+    session.commit()
+    session.refresh(clazz)
+    session.add(ClassEnrollment(class_id=clazz.id, student_id=s1.id))
+    session.commit()
+
+    headers = headers_for(prof.email)
+
+    first = client.get(f"/api/classes/{clazz.id}/summary", headers=headers)
+    second = client.get(f"/api/classes/{clazz.id}/summary", headers=headers)
+    assert first.json() == second.json()
+    assert first.json()["count"] == 0
+
+    stats = client.get("/api/metrics", headers=admin_auth_headers).json()["summary_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    client.post(
+        "/api/reports",
+        headers=headers_for(s1.email),
+        json={"symptoms": "fever", "severity": 4, "recoveryTime": 2},
+    )
+
+    third = client.get(f"/api/classes/{clazz.id}/summary", headers=headers)
+    assert third.json()["count"] == 1
+    stats = client.get("/api/metrics", headers=admin_auth_headers).json()["summary_cache"]
+    assert stats["invalidations"] == 1
+
+
+def test_bootstrap_returns_home_page_data(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    headers_for,
+):
+    prof = create_user("prof12@example.com", "password", role="professor")
+    student = create_user("boot@example.com", "password", role="student")
+
+    session = db_session
+    clazz = Class(name="BootClass", code="BOOT", professor_id=prof.id)
+    other = Class(name="OtherClass", code="OTHER", professor_id=prof.id)
+    session.add_all([clazz, other])
+    session.commit()
+    session.refresh(clazz)
+    session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    session.add(
+        Friend(
+            owner_user_id=student.id,
+            friend_name="Pal",
+            friend_email="pal@example.com",
+        )
+    )
+    session.add(
+        IllnessLog(user_id=student.id, symptoms="cold", severity=1, recoveryTime=1)
+    )
+    session.commit()
+
+    headers = headers_for(student.email)
+
+    res = client.get("/api/me/bootstrap", headers=headers)
+    assert res.status_code == 200
+    data = res.json()
+    assert data["id"] == student.id
+    assert [r["symptoms"] for r in data["reports"]] == ["cold"]
+    assert [f["friend_name"] for f in data["friends"]] == ["Pal"]
+    assert data["privacy"] == {"notification_privacy": "friends"}
+    assert [c["name"] for c in data["classes"]] == ["BootClass"]
+
+    res = client.get("/api/me/bootstrap?fields=friends,privacy", headers=headers)
+    data = res.json()
+    assert data["friends"] is not None
+    assert data["privacy"] is not None
+    assert data["reports"] is None
+    assert data["classes"] is None
+
+    res = client.get("/api/me/bootstrap?fields=friends,grades", headers=headers)
+    assert res.status_code == 400
+    assert "grades" in res.json()["detail"]
+
+
+def test_bootstrap_professor_gets_own_classes(
+    client: TestClient, create_user, db_session: Session, headers_for
+):
+    prof = create_user("prof13@example.com", "password", role="professor")
+    db_session.add(Class(name="Taught", code="TAUGHT", professor_id=prof.id))
+    db_session.commit()
+
+    res = client.get("/api/me/bootstrap?fields=classes", headers=headers_for(prof.email))
+    assert [c["name"] for c in res.json()["classes"]] == ["Taught"]
+
+
+def test_create_report_idempotency_key_replays(
+    client: TestClient,
+    student_auth_headers,
+    db_session: Session,
+):
+    headers = {**student_auth_headers, "Idempotency-Key": "report-1"}
+    payload = {"symptoms": "cough", "severity": 2, "recoveryTime": 3}
+
+    first = client.post("/api/reports", headers=headers, json=payload)
+    assert first.status_code == 201
+    retry = client.post("/api/reports", headers=headers, json=payload)
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(db_session.exec(select(IllnessLog)).all()) == 1
+
+    # same key, different body
+    res = client.post(
+        "/api/reports", headers=headers, json={**payload, "severity": 4}
+    )
+    assert res.status_code == 422
+
+    # a new key is a new report
+    res = client.post(
+        "/api/reports",
+        headers={**student_auth_headers, "Idempotency-Key": "report-2"},
+        json=payload,
+    )
+    assert res.status_code == 201
+    assert len(db_session.exec(select(IllnessLog)).all()) == 2
+
+
+def test_notify_friends_idempotency_key_sends_once(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    monkeypatch,
+    headers_for,
+):
+    user = create_user("idemnotify@example.com", "password", role="student")
+    friend = Friend(
+        owner_user_id=user.id,
+        friend_name="Friend One",
+        friend_email="friend1@example.com",
+    )
+    db_session.add(friend)
+    db_session.commit()
+    db_session.refresh(friend)
+
+    sent = []
+    monkeypatch.setattr(
+        "app.main.send_email",
+        lambda to, subject, body, from_address=None: sent.append(to),
+    )
+
+    headers = {**headers_for(user.email), "Idempotency-Key": "notify-1"}
+
+    for _ in range(3):
+        res = client.post("/notify-friends", headers=headers, json={"friend_ids": [friend.id]})
+        assert res.status_code == 200
+        assert res.json() == {"notified_count": 1}
+    assert sent == ["friend1@example.com"]
+
+
+def test_search_reports_endpoint_scoped_to_professor(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    headers_for,
+):
+    prof = create_user("searcher@example.com", "password", role="professor")
+    stranger = create_user("stranger@example.com", "password", role="professor")
+    student = create_user("searched@example.com", "password", privacy="professors")
+    mine = Class(name="Mine", code="MINE", professor_id=prof.id)
+    theirs = Class(name="Theirs", code="THEIRS", professor_id=stranger.id)
+    db_session.add_all([mine, theirs])
+    db_session.commit()
+    db_session.add(ClassEnrollment(class_id=theirs.id, student_id=student.id))
+    db_session.add(
+        IllnessLog(user_id=student.id, symptoms="fever, rash", severity=2, recoveryTime=2)
+    )
+    db_session.commit()
+
+    res = client.get("/api/search/reports?q=fever", headers=headers_for(prof.email))
+    assert res.status_code == 200
+    assert res.json()["total"] == 0
+
+    res = client.get(f"/api/search/reports?q=fever&class_id={theirs.id}", headers=headers_for(prof.email))
+    assert res.status_code == 404
+
+    res = client.get("/api/search/reports?q=fever AND rash", headers=headers_for(stranger.email))
+    assert res.json()["total"] == 1
+    assert res.json()["hits"][0]["student_id"] == student.id
+
+    res = client.get("/api/search/reports?q=fever AND", headers=headers_for(stranger.email))
+    assert res.status_code == 400
+
+    res = client.get("/api/search/reports?q=fever", headers=headers_for(student.email))
+    assert res.status_code == 403
+
+
+def test_list_and_delete_reports_read_through_archive(
+    client: TestClient,
+    create_user,
+    db_session: Session,
+    headers_for,
+):
+    from app.archive import archive_old_reports
+
+    user = create_user("archived@example.com", "password")
+    now = datetime.now(timezone.utc)
+    old = IllnessLog(
+        user_id=user.id, symptoms="last year", severity=2, recoveryTime=2,
+        created_at=now - timedelta(days=500),
+    )
+    recent = IllnessLog(
+        user_id=user.id, symptoms="this week", severity=2, recoveryTime=2,
+        created_at=now - timedelta(days=1),
+    )
+    db_session.add_all([old, recent])
+    db_session.commit()
+    old_id = old.id
+    assert archive_old_reports(db_session) == 1
+
+    headers = headers_for(user.email)
+
+    res = client.get("/api/reports", headers=headers)
+    assert [r["symptoms"] for r in res.json()] == ["this week", "last year"]
+
+    res = client.delete(f"/api/reports/{old_id}", headers=headers)
+    assert res.status_code == 200
+    assert [r["symptoms"] for r in client.get("/api/reports", headers=headers).json()] == [
+        "this week"
+    ]
+
+
+def test_admin_backup_endpoint(
+    client: TestClient, create_user, headers_for, monkeypatch, tmp_path
+):
+    import sqlite3
+
+    source = tmp_path / "live.db"
+    conn = sqlite3.connect(source)
+    conn.execute("CREATE TABLE t (x)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr("app.backup.DATABASE_PATH", str(source))
+    monkeypatch.setattr("app.backup.BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr("app.security.ADMIN_EMAILS", {"ops@example.com"})
+
+    create_user("notops@example.com", "password")
+    res = client.post("/api/admin/backups", headers=headers_for("notops@example.com"))
+    assert res.status_code == 403
+
+    create_user("ops@example.com", "password")
+    admin = headers_for("ops@example.com")
+    res = client.post("/api/admin/backups?compress=true", headers=admin)
+    assert res.status_code == 201
+    assert res.json()["compressed"] is True
+
+    name = res.json()["name"]
+
+    res = client.get("/api/admin/backups", headers=admin)
+    assert [b["name"] for b in res.json()] == [name]
+
+
+def test_class_codes_are_unique_and_forgiving(
+    client: TestClient,
+    create_user,
+    professor_auth_headers,
+    db_session: Session,
+    headers_for,
+):
+    prof = db_session.exec(select(User).where(User.email == "professor@example.com")).one()
+    url = f"/api/professors/{prof.id}/classes"
+    res = client.post(url, headers=professor_auth_headers, json={"name": "Bio", "code": "BIO 101"})
+    assert res.status_code == 201
+    class_id = res.json()["id"]
+
+    res = client.post(url, headers=professor_auth_headers, json={"name": "Dup", "code": "bio101"})
+    assert res.status_code == 409
+
+    def join(email, code):
+        student = create_user(email, "password", privacy="professors")
+        headers = headers_for(email)
+        res = client.post(
+            f"/api/students/{student.id}/join-class",
+            headers=headers,
+            json={"student_id": student.id, "code": code},
+        )
+        return student, headers, res
+
+    first, headers, res = join("joiner@example.com", " bio 101")
+    assert res.json()["message"] == "Successfully joined class"
+    res = client.post(
+        f"/api/students/{first.id}/join-class",
+        headers=headers,
+        json={"student_id": first.id, "code": "BIO101"},
+    )
+    assert res.json()["message"] == "You are already enrolled in this class"
+
+    # a cached summary is dropped when the enrollment insert commits
+    summary = client.get(f"/api/classes/{class_id}/summary", headers=professor_auth_headers)
+    assert len(summary.json()["students"]) == 1
+    second, _, res = join("joiner2@example.com", "Bio101")
+    summary = client.get(f"/api/classes/{class_id}/summary", headers=professor_auth_headers)
+    assert {s["student_id"] for s in summary.json()["students"]} == {first.id, second.id}
+
+    res = client.delete(f"{url}/{class_id}", headers=professor_auth_headers)
+    assert res.status_code == 200
+    _, _, res = join("joiner3@example.com", "BIO101")
+    assert res.status_code == 404
+
+
+def test_forced_trace_covers_auth_and_sql(
+    client: TestClient, student_auth_headers, admin_auth_headers
+):
+    res = client.get("/api/reports", headers={**student_auth_headers, "X-Trace": "1"})
+    assert res.status_code == 200
+    trace_id = res.headers["x-trace-id"]
+    admin = admin_auth_headers
+
+    trace = client.get(f"/api/admin/traces/{trace_id}", headers=admin).json()
+    assert trace["route"] == "/api/reports"
+    assert trace["status"] == 200
+    names = {s["name"] for s in trace["spans"]}
+    assert {"auth.get_current_user", "sql.execute"} <= names
+
+    slowest = client.get("/api/admin/traces/slowest", headers=admin).json()
+    assert [t["id"] for t in slowest["/api/reports"]] == [trace_id]
+
+    chrome = client.get(f"/api/admin/traces/{trace_id}?format=chrome", headers=admin).json()
+    assert chrome["traceEvents"][0]["name"] == "GET /api/reports"
+
+    assert client.get("/api/admin/traces/nope", headers=admin).status_code == 404
+    assert client.get("/api/admin/traces?format=xml", headers=admin).status_code == 400
+
+
+def test_friend_import_json_and_csv(client: TestClient, student_auth_headers):
+    res = client.post(
+        "/friends", json={"friend_name": "Sam", "friend_email": "sam@example.com"},
+        headers=student_auth_headers,
+    )
+    assert res.status_code == 201
+    res = client.post(
+        "/friends", json={"friend_name": "Sam", "friend_email": "SAM@example.com"},
+        headers=student_auth_headers,
+    )
+    assert res.status_code == 409
+
+    res = client.post(
+        "/friends/import",
+        json={"friends": [
+            {"friend_name": "Sam", "friend_email": "Sam@Example.com"},
+            {"friend_name": "Lee", "friend_email": "lee@example.com"},
+            {"friend_name": "Bad", "friend_email": "nope"},
+        ]},
+        headers=student_auth_headers,
+    )
+    assert res.status_code == 200
+    body = res.json()
+    assert [f["friend_email"] for f in body["created"]] == ["lee@example.com"]
+    assert body["duplicates"] == 1
+    assert body["invalid"][0]["row"] == 3
+
+    res = client.post(
+        "/friends/import",
+        content="name,email\nLee,LEE@example.com\nKim,kim@example.com\n",
+        headers={**student_auth_headers, "Content-Type": "text/csv"},
+    )
+    assert [f["friend_name"] for f in res.json()["created"]] == ["Kim"]
+
+    friends = client.get("/friends", headers=student_auth_headers).json()
+    assert sorted(f["friend_email"] for f in friends) == [
+        "kim@example.com", "lee@example.com", "sam@example.com"
+    ]
+
+    res = client.post(
+        "/friends/import", content="name\nSam\n",
+        headers={**student_auth_headers, "Content-Type": "text/csv"},
+    )
+    assert res.status_code == 400
+
+    # a field over the csv module's limit is a bad file, not a server error
+    res = client.post(
+        "/friends/import", content="name,email\n" + "x" * 200_000 + ",a@example.com\n",
+        headers={**student_auth_headers, "Content-Type": "text/csv"},
+    )
+    assert res.status_code == 400
+
+
+def test_friend_import_checks_auth_and_size_before_parsing(
+    client: TestClient, student_auth_headers, monkeypatch
+):
+    parsed = []
+    monkeypatch.setattr("app.main.parse_csv", lambda text: parsed.append(text) or [])
+    csv_headers = {"Content-Type": "text/csv"}
+
+    res = client.post("/friends/import", content="email\na@example.com\n", headers=csv_headers)
+    assert res.status_code == 401
+
+    monkeypatch.setattr("app.main.FRIEND_IMPORT_MAX_BYTES", 64)
+    res = client.post(
+        "/friends/import", content="email\n" + "a@example.com\n" * 10,
+        headers={**student_auth_headers, **csv_headers},
+    )
+    assert res.status_code == 413
+    assert parsed == []
+
+    res = client.post(
+        "/friends/import", content="email\na@example.com\n",
+        headers={**student_auth_headers, **csv_headers},
+    )
+    assert res.status_code == 200
+    assert parsed == ["email\na@example.com\n"]
+
+
+def test_report_with_notify_emails_class(
+    client: TestClient, create_user, student_auth_headers, db_session: Session, monkeypatch
+):
+    sent = []
+    monkeypatch.setattr(
+        "app.fanout.send_email",
+        lambda to, subject, body, from_address=None: sent.append((to, body)),
+    )
+    prof = create_user("fanprof@example.com", "password", role="professor")
+    mate = create_user("fanmate@example.com", "password")
+    student = db_session.exec(select(User).where(User.email == "student@example.com")).one()
+    clazz = Class(name="Physics", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.add_all([
+        ClassEnrollment(class_id=clazz.id, student_id=student.id),
+        ClassEnrollment(class_id=clazz.id, student_id=mate.id),
+    ])
+    db_session.commit()
+    report = {"symptoms": "fever", "severity": 3, "recoveryTime": 2}
+
+    # default privacy is "friends": no automatic fan-out
+    res = client.post("/api/reports?notify=true", json=report, headers=student_auth_headers)
+    assert res.status_code == 201
+    assert sent == []
+
+    client.post(
+        "/api/settings/privacy", json={"notification_privacy": "professors"},
+        headers=student_auth_headers,
+    )
+    client.post("/api/reports?notify=true", json=report, headers=student_auth_headers)
+    assert [to for to, _ in sent] == ["fanprof@example.com"]
+    assert "Physics" in sent[0][1]
+
+    sent.clear()
+    client.post(
+        "/api/settings/privacy", json={"notification_privacy": "everyone"},
+        headers=student_auth_headers,
+    )
+    client.post("/api/reports", json=report, headers=student_auth_headers)
+    assert sent == []
+    client.post("/api/reports?notify=true", json=report, headers=student_auth_headers)
+    assert sorted(to for to, _ in sent) == ["fanmate@example.com", "fanprof@example.com"]
+
+
+def test_notify_friends_in_digest_mode(
+    client: TestClient, create_user, student_auth_headers, headers_for, db_session: Session,
+    monkeypatch,
+):
+    from app.digest import digest_buffer
+
+    sent = []
+    send = lambda to, subject, body, from_address=None: sent.append(to)
+    monkeypatch.setattr("app.main.send_email", send)
+    monkeypatch.setattr("app.digest.send_email", send)
+    monkeypatch.setattr(digest_buffer, "enabled", True)
+
+    create_user("other@example.com", "password")
+
+    for headers in (student_auth_headers, headers_for("other@example.com")):
+        friend = client.post(
+            "/friends", json={"friend_name": "Pat", "friend_email": "pat@example.com"},
+            headers=headers,
+        ).json()
+        res = client.post("/notify-friends", json={"friend_ids": [friend["id"]]}, headers=headers)
+        assert res.json() == {"notified_count": 1}
+
+    assert sent == []
+    assert digest_buffer.flush(db_session, force=True) == 1
+    assert sent == ["pat@example.com"]
+
+
+def test_class_summary_checks_owner_and_privacy(
+    client: TestClient, create_user, db_session: Session, headers_for
+):
+    owner = create_user("owner_prof@example.com", "password", role="professor")
+    create_user("other_prof@example.com", "password", role="professor")
+    open_student = create_user("open@example.com", "password", privacy="everyone")
+    hidden = create_user("hidden@example.com", "password")  # "friends" by default
+    clazz = Class(name="Private", professor_id=owner.id)
+    db_session.add(clazz)
+    db_session.commit()
+    for student, symptoms in ((open_student, "fever"), (hidden, "rash")):
+        db_session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+        db_session.add(IllnessLog(user_id=student.id, symptoms=symptoms, severity=3, recoveryTime=2))
+    db_session.commit()
+
+    owner_headers = headers_for("owner_prof@example.com")
+    summary = client.get(f"/api/classes/{clazz.id}/summary", headers=owner_headers).json()
+    # the hidden student is counted, but not listed
+    assert summary["count"] == 2
+    assert sorted(summary["common_symptoms"]) == ["fever", "rash"]
+    assert [s["email"] for s in summary["students"]] == ["open@example.com"]
+    page = client.get(f"/api/classes/{clazz.id}/students", headers=owner_headers).json()
+    assert page["total"] == 1
+
+    # a cached summary is not served to someone else
+    other_headers = headers_for("other_prof@example.com")
+    assert client.get(f"/api/classes/{clazz.id}/summary", headers=other_headers).status_code == 404
+    assert client.get(f"/api/classes/{clazz.id}/students", headers=other_headers).status_code == 404
+
+    # sharing with professors drops the cached summary
+    res = client.post(
+        "/api/settings/privacy", json={"notification_privacy": "professors"},
+        headers=headers_for("hidden@example.com"),
+    )
+    assert res.status_code == 200
+    summary = client.get(f"/api/classes/{clazz.id}/summary", headers=owner_headers).json()
+    assert len(summary["students"]) == 2
+
+
+def test_changes_feed_endpoint(
+    client: TestClient, student_auth_headers, admin_auth_headers
+):
+    for symptoms in ("fever", "cough", "rash"):
+        res = client.post(
+            "/api/reports",
+            json={"symptoms": symptoms, "severity": 2, "recoveryTime": 1},
+            headers=student_auth_headers,
+        )
+        assert res.status_code in (200, 201)
+
+    assert client.get("/api/changes", headers=student_auth_headers).status_code == 403
+
+    admin = admin_auth_headers
+
+    first = client.get("/api/changes?limit=2", headers=admin).json()
+    assert [c["op"] for c in first["changes"]] == ["insert", "insert"]
+    assert first["has_more"] is True
+    rest = client.get(f"/api/changes?since={first['next_cursor']}", headers=admin).json()
+    assert [c["data"]["symptoms"] for c in rest["changes"]] == ["rash"]
+    assert rest["has_more"] is False
+    assert client.get("/api/changes?limit=0", headers=admin).status_code == 422
+    assert client.get("/api/metrics", headers=admin).json()["changes"]["served"] == 3
+    # operational internals are for admins only
+    assert client.get("/api/metrics", headers=student_auth_headers).status_code == 403
+    assert client.get("/api/metrics").status_code == 401
+
+
+def test_repeat_requests_reuse_validated_claims(
+    client: TestClient, student_auth_headers, admin_auth_headers
+):
+    for _ in range(3):
+        assert client.get("/api/reports", headers=student_auth_headers).status_code == 200
+    stats = client.get("/api/metrics", headers=admin_auth_headers).json()["auth_claims"]
+    # the student's token and the admin's, first seen by this request
+    assert stats["entries"] == 2
+    assert stats["hits"] == 2
+
+    bad = {"Authorization": student_auth_headers["Authorization"] + "x"}
+    assert client.get("/api/reports", headers=bad).status_code == 401
+
+
+def test_class_severity_endpoint(
+    client: TestClient,
+    db_session: Session,
+    professor_auth_headers,
+    student_auth_headers,
+    admin_auth_headers,
+):
+    professor = db_session.exec(select(User).where(User.email == "professor@example.com")).one()
+    student = db_session.exec(select(User).where(User.email == "student@example.com")).one()
+    clazz = Class(name="Sev", professor_id=professor.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    db_session.commit()
+    res = client.post(
+        "/api/reports",
+        json={"symptoms": "fever", "severity": 4, "recoveryTime": 2},
+        headers=student_auth_headers,
+    )
+    assert res.status_code in (200, 201)
+
+    res = client.get(f"/api/classes/{clazz.id}/severity", headers=professor_auth_headers)
+    assert res.status_code == 200
+    assert res.json() == {
+        "class_id": clazz.id,
+        "count": 1,
+        "avg_severity": 4.0,
+        "severity_histogram": [0, 0, 0, 1, 0],
+        "severity_p50": 4,
+        "severity_p90": 4,
+    }
+    res = client.get(f"/api/classes/{clazz.id}/severity", headers=student_auth_headers)
+    assert res.status_code == 404
+
+    admin_headers = admin_auth_headers
+    res = client.get("/api/admin/severity-counts/verify", headers=admin_headers)
+    assert res.json() == {"mismatched": {}}
+
+    db_session.exec(text("UPDATE classseveritycount SET students = 7"))
+    db_session.commit()
+    drift = {str(clazz.id): {"expected": {"4": 1}, "counted": {"4": 7}}}
+    # verifying is read-only, whatever the query string says
+    for _ in range(2):
+        res = client.get("/api/admin/severity-counts/verify?repair=true", headers=admin_headers)
+        assert res.json() == {"mismatched": drift}
+    assert client.get("/api/admin/severity-counts/rebuild", headers=admin_headers).status_code == 405
+
+    res = client.post("/api/admin/severity-counts/rebuild", headers=admin_headers)
+    assert res.json() == {"mismatched": drift, "rebuilt": True}
+    res = client.get("/api/admin/severity-counts/verify", headers=admin_headers)
+    assert res.json() == {"mismatched": {}}
+    res = client.post("/api/admin/severity-counts/rebuild", headers=student_auth_headers)
+    assert res.status_code == 403
+
+
+def test_episodes_endpoint_and_trend_source(
+    client: TestClient, create_user, db_session: Session, student_auth_headers, headers_for
+):
+    from app.episodes import episode_index
+    from app.models import EpisodeSync
+
+    for symptoms, severity in (("fever", 3), ("fever cough", 5)):
+        res = client.post(
+            "/api/reports",
+            json={"symptoms": symptoms, "severity": severity, "recoveryTime": 2},
+            headers=student_auth_headers,
+        )
+        assert res.status_code in (200, 201)
+
+    # before the background sync: built from reports, nothing written
+    res = client.get("/api/episodes", headers=student_auth_headers)
+    assert res.status_code == 200
+    episode, = res.json()
+    assert episode["id"] is None
+    assert (episode["report_count"], episode["peak_severity"], episode["last_severity"]) == (2, 5, 5)
+    assert episode["symptoms"] == ["cough", "fever"]
+    assert db_session.get(EpisodeSync, 1) is None
+
+    episode_index.sync(db_session)
+    synced, = client.get("/api/episodes", headers=student_auth_headers).json()
+    assert synced["id"] is not None
+    assert {**synced, "id": None} == episode
+
+    prof = create_user("episodeprof@example.com", "password", role="professor")
+    student = db_session.exec(select(User).where(User.email == "student@example.com")).one()
+    clazz = Class(name="Episodes", code="EPIS", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=student.id))
+    db_session.commit()
+    headers = headers_for(prof.email)
+
+    trends = [
+        client.get(f"/api/classes/{clazz.id}/trend?days=7&source={source}", headers=headers).json()
+        for source in ("episodes", "reports")
+    ]
+    assert trends[0] == trends[1]
+    assert episode_index.stats()["stale_reads"] == 1
+
+    # a pending report by a student outside the class does not matter
+    create_user("episodeother@example.com", "password")
+    client.post(
+        "/api/reports",
+        json={"symptoms": "flu", "severity": 4, "recoveryTime": 3},
+        headers=headers_for("episodeother@example.com"),
+    )
+    assert client.get(f"/api/classes/{clazz.id}/trend?days=7", headers=headers).json() == trends[0]
+    assert episode_index.stats()["stale_reads"] == 1
+
+    # a report the background job has not folded in yet: read from reports
+    client.post(
+        "/api/reports",
+        json={"symptoms": "rash", "severity": 1, "recoveryTime": 1},
+        headers=student_auth_headers,
+    )
+    trend = client.get(f"/api/classes/{clazz.id}/trend?days=7", headers=headers).json()
+    assert trend["buckets"][-1]["new_reports"] == 3
+    assert episode_index.stats()["stale_reads"] == 2
+    assert trends[0]["buckets"][-1]["sick_count"] == 1
+    res = client.get(f"/api/classes/{clazz.id}/trend?source=rows", headers=headers)
+    assert res.status_code == 422
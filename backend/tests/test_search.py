@@ -0,0 +1,142 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.db import init_db
+from app.models import Class, ClassEnrollment, IllnessLog
+from app.search import InvalidSearchQuery, search_reports
+
+
+def _seed(db_session: Session, create_user):
+    prof = create_user("searchprof@example.com", "password", role="professor")
+    clazz = Class(name="SearchClass", code="SRCH", professor_id=prof.id)
+    other = Class(name="OtherClass", code="SRCH2", professor_id=prof.id)
+    db_session.add_all([clazz, other])
+    db_session.commit()
+
+    inside = create_user("in@example.com", "password", privacy="professors")
+    outside = create_user("out@example.com", "password", privacy="everyone")
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=inside.id))
+    db_session.add(ClassEnrollment(class_id=other.id, student_id=outside.id))
+    db_session.add_all([
+        IllnessLog(user_id=inside.id, symptoms="fever and a rash", severity=3, recoveryTime=2),
+        IllnessLog(user_id=inside.id, symptoms="fever fever fever", severity=2, recoveryTime=2),
+        IllnessLog(user_id=inside.id, symptoms="coughing all night", severity=1, recoveryTime=2),
+        IllnessLog(user_id=outside.id, symptoms="fever and rash", severity=4, recoveryTime=2),
+    ])
+    db_session.commit()
+    return clazz, other
+
+
+def test_search_boolean_prefix_and_stemming(client, create_user, db_session: Session):
+    clazz, other = _seed(db_session, create_user)
+
+    both = search_reports(db_session, "fever AND rash", [clazz.id])
+    assert both.total == 1
+    assert both.hits[0].symptoms == "fever and a rash"
+    assert "[fever]" in both.hits[0].snippet
+
+    # ranked by bm25: the report that repeats the term comes first
+    fever = search_reports(db_session, "fever", [clazz.id])
+    assert [h.symptoms for h in fever.hits] == ["fever fever fever", "fever and a rash"]
+
+    assert search_reports(db_session, "fev*", [clazz.id]).total == 2
+    assert search_reports(db_session, "cough", [clazz.id]).total == 1  # porter stemming
+
+    # other classes are only searched when asked for
+    assert search_reports(db_session, "fever AND rash", [clazz.id, other.id]).total == 2
+
+    with pytest.raises(InvalidSearchQuery):
+        search_reports(db_session, "fever AND", [clazz.id])
+
+
+def test_search_index_follows_updates_and_deletes(client, create_user, db_session: Session):
+    clazz, _ = _seed(db_session, create_user)
+    log = search_reports(db_session, "coughing", [clazz.id]).hits[0]
+
+    row = db_session.get(IllnessLog, log.log_id)
+    row.symptoms = "sneezing"
+    db_session.add(row)
+    db_session.commit()
+    assert search_reports(db_session, "cough", [clazz.id]).total == 0
+    assert search_reports(db_session, "sneeze", [clazz.id]).total == 1
+
+    db_session.delete(row)
+    db_session.commit()
+    assert search_reports(db_session, "sneeze", [clazz.id]).total == 0
+
+
+def test_search_pagination(client, create_user, db_session: Session):
+    clazz, _ = _seed(db_session, create_user)
+    first = search_reports(db_session, "fever", [clazz.id], page=1, page_size=1)
+    second = search_reports(db_session, "fever", [clazz.id], page=2, page_size=1)
+    assert first.total == second.total == 2
+    assert first.hits[0].log_id != second.hits[0].log_id
+
+
+def test_init_db_indexes_existing_reports(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # simulate a database created before the search index existed
+        conn.exec_driver_sql("DROP TABLE illnesslog_fts")
+        conn.exec_driver_sql("DROP TRIGGER illnesslog_fts_insert")
+        conn.exec_driver_sql(
+            "INSERT INTO illnesslog (user_id, symptoms, severity, recoveryTime, created_at)"
+            " VALUES (1, 'sore throat', 2, 2, '2026-01-01 00:00:00')"
+        )
+        conn.exec_driver_sql("INSERT INTO classenrollment (class_id, student_id) VALUES (1, 1)")
+        conn.exec_driver_sql(
+            "INSERT INTO user (id, email, role, hashed_password, created_at, notification_privacy)"
+            " VALUES (1, 's@example.com', 'student', 'x', '2026-01-01 00:00:00', 'everyone')"
+        )
+
+    init_db(engine)
+    with Session(engine) as session:
+        assert search_reports(session, '"sore throat"', [1]).total == 1
+
+
+def test_privacy_filter_stays_index_backed(client, create_user, db_session: Session):
+    from sqlalchemy import bindparam, text
+
+    from app.search import _SEARCH
+    from app.summary import PROFESSOR_VISIBLE_PRIVACY
+
+    clazz, _ = _seed(db_session, create_user)
+    plan = db_session.connection().execute(
+        text(f"EXPLAIN QUERY PLAN {_SEARCH}").bindparams(
+            bindparam("class_ids", expanding=True), bindparam("visible", expanding=True)
+        ),
+        {"query": "fever", "class_ids": [clazz.id], "visible": list(PROFESSOR_VISIBLE_PRIVACY),
+         "limit": 20, "offset": 0},
+    ).all()
+    steps = [row[3] for row in plan]
+    # only the FTS index itself is scanned
+    assert [s for s in steps if s.startswith("SCAN")] == [
+        s for s in steps if s.startswith("SCAN illnesslog_fts VIRTUAL TABLE")
+    ]
+    assert any("SEARCH e USING" in s and "class_id=?" in s for s in steps), steps
+    assert any(s.startswith("SEARCH v USING INTEGER PRIMARY KEY") for s in steps), steps
+
+
+def test_search_skips_students_hidden_from_professors(client, create_user, db_session: Session):
+    clazz, other = _seed(db_session, create_user)
+    hidden = create_user("hidden@example.com", "password")  # default privacy "friends"
+    db_session.add(ClassEnrollment(class_id=clazz.id, student_id=hidden.id))
+    db_session.add(IllnessLog(user_id=hidden.id, symptoms="measles", severity=3, recoveryTime=2))
+    db_session.commit()
+
+    assert search_reports(db_session, "measles", [clazz.id]).total == 0
+
+
+def test_only_malformed_queries_are_invalid(client, create_user, db_session: Session):
+    clazz, _ = _seed(db_session, create_user)
+    for query in ('"fever', "fever AND", "(fever", "nosuch:fever", "-fever"):
+        with pytest.raises(InvalidSearchQuery):
+            search_reports(db_session, query, [clazz.id])
+
+    # a broken index is a server error, not a bad query
+    db_session.connection().exec_driver_sql("DROP TABLE illnesslog_fts")
+    with pytest.raises(OperationalError, match="no such table"):
+        search_reports(db_session, "fever", [clazz.id])
+    db_session.rollback()
@@ -0,0 +1,221 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.archive import archive_old_reports
+from app.classes import enroll
+from app.models import Class, ClassEnrollment, ClassSeverityCount, IllnessLog, SickStudent
+from app.severity import _CLASS_DUE, rebuild, severity_counters
+from app.summary import summarize_class
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _report(student_id: int, severity: int, age: timedelta = timedelta(0)) -> IllnessLog:
+    return IllnessLog(
+        user_id=student_id, symptoms="fever", severity=severity, recoveryTime=2,
+        created_at=_now() - age,
+    )
+
+
+def _setup(db_session: Session, create_user, students: int = 4):
+    prof = create_user("sevprof@example.com", "password", role="professor")
+    clazz = Class(name="Sev", code="SEV1", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    users = [create_user(f"sev{i}@example.com", "password") for i in range(students)]
+    db_session.add_all(ClassEnrollment(class_id=clazz.id, student_id=u.id) for u in users)
+    db_session.commit()
+    return clazz, users
+
+
+def _histogram(db_session: Session, class_id: int, now=None) -> list[int]:
+    return severity_counters.distribution(db_session, class_id, now=now).severity_histogram
+
+
+def _matches_summary(db_session: Session, class_id: int) -> None:
+    student_ids = [
+        e.student_id
+        for e in db_session.exec(
+            select(ClassEnrollment).where(ClassEnrollment.class_id == class_id)
+        ).all()
+    ]
+    summary = summarize_class(db_session, student_ids, engine="python", include_students=False)
+    dist = severity_counters.distribution(db_session, class_id)
+    if not student_ids:
+        assert dist.count == 0
+        return
+    assert dist.severity_histogram == summary.severity_histogram
+    assert (dist.count, dist.avg_severity) == (summary.count, summary.avg_severity)
+    assert (dist.severity_p50, dist.severity_p90) == (summary.severity_p50, summary.severity_p90)
+
+
+def test_counters_follow_reports(client, create_user, db_session: Session):
+    clazz, (a, b, c, d) = _setup(db_session, create_user)
+    db_session.add_all([
+        _report(a.id, 2, timedelta(days=3)),
+        _report(a.id, 4),  # a's latest
+        _report(b.id, 4),
+        _report(c.id, 5, timedelta(days=8)),  # recovered
+    ])
+    db_session.commit()
+
+    dist = severity_counters.distribution(db_session, clazz.id)
+    assert dist.severity_histogram == [0, 0, 0, 2, 0]
+    assert (dist.count, dist.severity_p50, dist.avg_severity) == (2, 4, 4.0)
+
+    # a's latest report goes away: the older one counts again
+    latest = db_session.exec(
+        select(IllnessLog).where(IllnessLog.user_id == a.id, IllnessLog.severity == 4)
+    ).one()
+    db_session.delete(latest)
+    db_session.commit()
+    assert _histogram(db_session, clazz.id) == [0, 1, 0, 1, 0]
+
+    # editing a report moves its student between buckets
+    report = db_session.exec(select(IllnessLog).where(IllnessLog.user_id == b.id)).one()
+    report.severity = 1
+    db_session.add(report)
+    db_session.commit()
+    assert _histogram(db_session, clazz.id) == [1, 1, 0, 0, 0]
+
+    # an older report does not replace the latest one
+    db_session.add(_report(b.id, 5, timedelta(days=1)))
+    db_session.commit()
+    assert _histogram(db_session, clazz.id) == [1, 1, 0, 0, 0]
+
+    assert severity_counters.verify(db_session) == {}
+    _matches_summary(db_session, clazz.id)
+
+
+def test_counters_follow_enrollments(client, create_user, db_session: Session):
+    clazz, (a, b, *_) = _setup(db_session, create_user)
+    other = Class(name="Other", code="SEV2", professor_id=clazz.professor_id)
+    db_session.add(other)
+    db_session.commit()
+    db_session.add_all([_report(a.id, 3), _report(b.id, 5)])
+    db_session.commit()
+
+    enroll(db_session, other.id, a.id)
+    assert _histogram(db_session, other.id) == [0, 0, 1, 0, 0]
+
+    enrollment = db_session.exec(
+        select(ClassEnrollment).where(
+            ClassEnrollment.class_id == clazz.id, ClassEnrollment.student_id == b.id
+        )
+    ).one()
+    db_session.delete(enrollment)
+    db_session.commit()
+    assert _histogram(db_session, clazz.id) == [0, 0, 1, 0, 0]
+
+    db_session.exec(text("DELETE FROM classenrollment WHERE class_id = :c"), params={"c": other.id})
+    db_session.delete(db_session.get(Class, other.id))
+    db_session.commit()
+    assert db_session.exec(
+        select(ClassSeverityCount).where(ClassSeverityCount.class_id == other.id)
+    ).all() == []
+    assert severity_counters.verify(db_session) == {}
+
+
+def test_status_expiry(client, create_user, db_session: Session):
+    clazz, (a, b, *_) = _setup(db_session, create_user)
+    db_session.add_all([_report(a.id, 2, timedelta(days=6)), _report(b.id, 3)])
+    db_session.commit()
+    assert _histogram(db_session, clazz.id) == [0, 1, 1, 0, 0]
+
+    # a recovers on day 7; reads account for it before any sweep
+    later = _now() + timedelta(days=1, minutes=1)
+    assert _histogram(db_session, clazz.id, now=later) == [0, 0, 1, 0, 0]
+    assert severity_counters.verify(db_session, now=later) == {}
+
+    assert severity_counters.expire(db_session, now=later) == 1
+    assert db_session.exec(select(SickStudent.student_id)).all() == [b.id]
+    assert _histogram(db_session, clazz.id, now=later) == [0, 0, 1, 0, 0]
+    assert severity_counters.verify(db_session, now=later) == {}
+
+    much_later = _now() + timedelta(days=30)
+    assert severity_counters.expire(db_session, now=much_later) == 1
+    assert db_session.exec(select(ClassSeverityCount)).all() == []
+    assert severity_counters.distribution(db_session, clazz.id, now=much_later).count == 0
+
+
+def test_verify_detects_drift_and_rebuild_repairs(client, create_user, db_session: Session):
+    clazz, (a, b, *_) = _setup(db_session, create_user)
+    db_session.add_all([_report(a.id, 3), _report(b.id, 3)])
+    db_session.commit()
+
+    db_session.exec(text("UPDATE classseveritycount SET students = 7"))
+    db_session.commit()
+    assert severity_counters.verify(db_session) == {
+        clazz.id: {"expected": {3: 2}, "counted": {3: 7}}
+    }
+
+    rebuild(db_session)
+    assert severity_counters.verify(db_session) == {}
+    assert _histogram(db_session, clazz.id) == [0, 0, 2, 0, 0]
+
+
+def test_random_writes_keep_counters_exact(client, create_user, db_session: Session):
+    rng = random.Random(49)
+    prof = create_user("randprof@example.com", "password", role="professor")
+    classes = [Class(name=f"R{i}", code=f"RND{i}", professor_id=prof.id) for i in range(3)]
+    db_session.add_all(classes)
+    db_session.commit()
+    students = [create_user(f"rand{i}@example.com", "password") for i in range(8)]
+
+    for _ in range(150):
+        op = rng.random()
+        student = rng.choice(students)
+        if op < 0.4:
+            db_session.add(_report(student.id, rng.randint(1, 5), timedelta(hours=rng.randint(0, 240))))
+        elif op < 0.55:
+            logs = db_session.exec(select(IllnessLog)).all()
+            if logs:
+                db_session.delete(rng.choice(logs))
+        elif op < 0.65:
+            logs = db_session.exec(select(IllnessLog)).all()
+            if logs:
+                log = rng.choice(logs)
+                log.severity = rng.randint(1, 5)
+                log.created_at = _now() - timedelta(hours=rng.randint(0, 240))
+                db_session.add(log)
+        elif op < 0.85:
+            enroll(db_session, rng.choice(classes).id, student.id)
+        else:
+            db_session.exec(
+                text("DELETE FROM classenrollment WHERE student_id = :s AND class_id = :c"),
+                params={"s": student.id, "c": rng.choice(classes).id},
+            )
+        db_session.commit()
+
+    assert severity_counters.verify(db_session) == {}
+    for clazz in classes:
+        _matches_summary(db_session, clazz.id)
+
+
+def test_archiving_keeps_counters_exact(client, create_user, db_session: Session):
+    clazz, (a, *_) = _setup(db_session, create_user)
+    db_session.add_all([_report(a.id, 5, timedelta(days=500)), _report(a.id, 2)])
+    db_session.commit()
+    assert archive_old_reports(db_session, horizon_days=400) == 1
+    assert _histogram(db_session, clazz.id) == [0, 1, 0, 0, 0]
+    assert severity_counters.verify(db_session) == {}
+
+
+def test_reads_are_index_backed(client, create_user, db_session: Session):
+    clazz, _ = _setup(db_session, create_user)
+    conn = db_session.connection()
+    plans = [
+        [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)]
+        for statement, params in (
+            ("SELECT severity, students FROM classseveritycount WHERE class_id = ?", (clazz.id,)),
+            (_CLASS_DUE.replace(":now", "?").replace(":class_id", "?"), ("2026-01-01", clazz.id)),
+        )
+    ]
+    for plan in plans:
+        assert not [step for step in plan if step.startswith("SCAN")], plan
+    assert any("sick_until" in step for step in plans[1]), plans[1]
@@ -0,0 +1,139 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+from app.models import IllnessLog, SketchSnapshot
+from app.sketch import SpaceSaving, SymptomSketches
+
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _zipf_stream(n: int, vocabulary: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    words = [f"symptom{i}" for i in range(vocabulary)]
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    return rng.choices(words, weights=weights, k=n)
+
+
+def _check_bounds(sketch: SpaceSaving, exact: Counter, capacity: int):
+    bound = sketch.total / capacity
+    for item, count in sketch.counts.items():
+        error = sketch.errors[item]
+        assert count - error <= exact[item] <= count
+        assert error <= bound
+    # every item above the bound must be tracked
+    for item, true_count in exact.items():
+        if true_count > bound:
+            assert item in sketch.counts
+
+
+def test_space_saving_bounds_against_exact_counts():
+    stream = _zipf_stream(20000, 500, seed=1)
+    sketch = SpaceSaving(capacity=32)
+    for word in stream:
+        sketch.add(word)
+
+    exact = Counter(stream)
+    assert sketch.total == len(stream)
+    _check_bounds(sketch, exact, 32)
+
+    # the head of a Zipf stream is recovered in order
+    assert [item for item, _, _ in sketch.top(3)] == [
+        item for item, _ in exact.most_common(3)
+    ]
+
+
+def test_space_saving_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for word in ["fever", "fever", "cough"]:
+        sketch.add(word)
+    assert sketch.top(5) == [("fever", 2, 0), ("cough", 1, 0)]
+
+
+def test_merged_daily_sketches_keep_bounds():
+    exact = Counter()
+    days = []
+    for day in range(7):
+        stream = _zipf_stream(3000, 300, seed=day)
+        sketch = SpaceSaving(capacity=24)
+        for word in stream:
+            sketch.add(word)
+        exact.update(stream)
+        days.append(sketch)
+
+    merged = SpaceSaving.merged(days, capacity=24)
+    assert merged.total == sum(exact.values())
+    _check_bounds(merged, exact, 24)
+
+
+def test_round_trip_through_dict():
+    sketch = SpaceSaving(capacity=3)
+    for word in ["a", "b", "c", "d", "a"]:
+        sketch.add(word)
+    restored = SpaceSaving.from_dict(sketch.to_dict())
+    assert restored.top(3) == sketch.top(3)
+    assert restored.total == sketch.total
+
+
+def test_symptom_sketches_window_snapshot_and_replay(client, create_user, db_session: Session):
+    user = create_user("sketch@example.com", "password")
+    db_session.add_all([
+        IllnessLog(user_id=user.id, symptoms="fever, cough", severity=3,
+                   recoveryTime=2, created_at=NOW),
+        IllnessLog(user_id=user.id, symptoms="Fever", severity=3,
+                   recoveryTime=2, created_at=NOW - timedelta(days=3)),
+        IllnessLog(user_id=user.id, symptoms="rash", severity=3,
+                   recoveryTime=2, created_at=NOW - timedelta(days=10)),
+    ])
+    db_session.commit()
+
+    sketches = SymptomSketches(capacity=8, snapshot_seconds=60)
+    assert sketches.refresh(db_session, now=NOW) == 3
+    assert db_session.get(SketchSnapshot, SymptomSketches.SNAPSHOT_NAME) is None
+
+    week, total, error_bound = sketches.top(days=7, k=5, now=NOW)
+    assert [(s.symptom, s.count) for s in week] == [("fever", 2), ("cough", 1)]
+    assert total == 3
+    assert error_bound == 0
+
+    month, _, _ = sketches.top(days=30, k=5, now=NOW)
+    assert "rash" in [s.symptom for s in month]
+
+    # once the interval has passed a snapshot is written; a fresh instance
+    # resumes from it and only replays reports filed after its cursor
+    sketches.refresh(db_session, now=NOW + timedelta(minutes=2))
+    snapshot = db_session.get(SketchSnapshot, SymptomSketches.SNAPSHOT_NAME)
+    assert snapshot is not None
+
+    db_session.add(IllnessLog(user_id=user.id, symptoms="cough", severity=2,
+                              recoveryTime=1, created_at=NOW))
+    db_session.commit()
+
+    restarted = SymptomSketches(capacity=8)
+    assert restarted.refresh(db_session, now=NOW) == 1
+    week, _, _ = restarted.top(days=7, k=5, now=NOW)
+    assert [(s.symptom, s.count) for s in week] == [("fever", 2), ("cough", 2)]
+
+
+def test_symptom_sketches_count_report_filed_after_newest_was_deleted(
+    client, create_user, db_session: Session
+):
+    user = create_user("sketchreuse@example.com", "password")
+    first = IllnessLog(user_id=user.id, symptoms="cough", severity=2, recoveryTime=1, created_at=NOW)
+    db_session.add(first)
+    db_session.commit()
+    sketches = SymptomSketches(capacity=8, snapshot_seconds=60)
+    assert sketches.refresh(db_session, now=NOW) == 1
+
+    db_session.delete(first)
+    db_session.commit()
+    db_session.add(IllnessLog(user_id=user.id, symptoms="measles", severity=4,
+                              recoveryTime=3, created_at=NOW))
+    db_session.commit()
+
+    assert sketches.refresh(db_session, now=NOW) == 1
+    week, _, _ = sketches.top(days=7, k=5, now=NOW)
+    assert "measles" in [s.symptom for s in week]
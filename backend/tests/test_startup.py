@@ -0,0 +1,41 @@
+from sqlalchemy import event
+from sqlmodel import create_engine
+
+from app import db
+from app.db import init_db, schema_version
+from bench_startup import STARTUP_BUDGET_SECONDS, time_import
+
+
+def test_import_within_budget_and_lazy():
+    elapsed, loaded = time_import()
+    assert loaded == [], f"{loaded} imported by app.main; import them on first use"
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
+
+def test_init_db_skips_current_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    init_db(engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == schema_version()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    init_db(engine)
+    assert statements == ["PRAGMA user_version"]
+
+    # a stale version runs every check again and records the new one
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+    statements.clear()
+    init_db(engine)
+    assert len(statements) > 10
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == schema_version()
+    engine.dispose()
+
+
+def test_schema_version_tracks_migrations(monkeypatch):
+    before = schema_version()
+    assert schema_version() == before
+    monkeypatch.setattr(db, "MIGRATIONS_REVISION", db.MIGRATIONS_REVISION + 1)
+    assert schema_version() != before
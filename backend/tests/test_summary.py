@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models import Class, ClassEnrollment, IllnessLog, User
+from app.summary import (
+    build_summary,
+    severity_percentile,
+    student_page,
+    summarize_class,
+)
+
+np = pytest.importorskip("numpy")
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, settings, strategies as st  # noqa: E402
+
+from app.vectorized import build_summary_vectorized  # noqa: E402
+
+
+NOW = datetime(2026, 3, 18, 12, 0, tzinfo=timezone.utc)
+
+WORDS = ["fever", "Cough", "headache", "rash,", "sore", "throat", "FEVER"]
+
+
+def test_severity_percentile_nearest_rank():
+    assert severity_percentile([0, 0, 0, 0, 0], 0.5) is None
+    assert severity_percentile([1, 0, 0, 0, 0], 0.9) == 1
+    # severities 1, 2, 2, 5
+    assert severity_percentile([1, 2, 0, 0, 1], 0.5) == 2
+    assert severity_percentile([1, 2, 0, 0, 1], 0.9) == 5
+
+
+log_strategy = st.tuples(
+    st.integers(min_value=0, max_value=7),  # student index
+    st.integers(min_value=-2 * 86400, max_value=20 * 86400),  # seconds before NOW
+    st.integers(min_value=1, max_value=5),
+    st.lists(st.sampled_from(WORDS), min_size=1, max_size=4),
+)
+
+
+@settings(max_examples=200, deadline=None)
+@given(
+    n_students=st.integers(min_value=1, max_value=8),
+    missing_user=st.booleans(),
+    raw_logs=st.lists(log_strategy, max_size=40),
+)
+def test_vectorized_matches_reference(n_students, missing_user, raw_logs):
+    student_ids = list(range(100, 100 + n_students))
+    users = [
+        User(
+            id=sid,
+            email=f"student{sid}@example.com",
+            full_name=f"Student {sid}",
+            hashed_password="x",
+        )
+        for sid in student_ids
+    ]
+    if missing_user:
+        # enrolled, but hidden from professors or without a User row
+        users = users[1:]
+
+    logs = []
+    for i, (idx, seconds_ago, severity, words) in enumerate(raw_logs):
+        logs.append(
+            IllnessLog(
+                id=i + 1,
+                user_id=100 + idx,  # some logs belong to students outside the class
+                symptoms=" ".join(words),
+                severity=severity,
+                recoveryTime=3,
+                # SQLite hands back naive UTC datetimes
+                created_at=(NOW - timedelta(seconds=seconds_ago)).replace(tzinfo=None),
+            )
+        )
+    # the SQL query orders by created_at desc; ties keep insertion order
+    logs.sort(key=lambda log: log.created_at, reverse=True)
+
+    expected = build_summary(student_ids, users, logs, NOW)
+
+    symptoms = {log.id: log.symptoms for log in logs}
+    actual = build_summary_vectorized(
+        student_ids,
+        users,
+        [log.id for log in logs],
+        [log.user_id for log in logs],
+        [log.created_at for log in logs],
+        [log.severity for log in logs],
+        lambda ids: {i: symptoms[i] for i in ids},
+        NOW,
+    )
+
+    assert actual.model_dump() == expected.model_dump()
+
+
+def test_summarize_class_engines_agree_on_db(client, create_user, db_session: Session):
+    prof = create_user("vecprof@example.com", "password", role="professor")
+    clazz = Class(name="VecClass", code="VEC", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.refresh(clazz)
+
+    students = [create_user(f"vec{i}@example.com", "password") for i in range(5)]
+    db_session.add_all(
+        ClassEnrollment(class_id=clazz.id, student_id=s.id) for s in students
+    )
+    for i, s in enumerate(students[:4]):
+        db_session.add(
+            IllnessLog(
+                user_id=s.id,
+                symptoms="fever, cough",
+                severity=i + 1,
+                recoveryTime=2,
+                created_at=NOW - timedelta(days=2 * i),
+            )
+        )
+    db_session.commit()
+
+    student_ids = [s.id for s in students]
+    python = summarize_class(db_session, student_ids, now=NOW, engine="python")
+    vectorized = summarize_class(db_session, student_ids, now=NOW, engine="numpy")
+
+    assert vectorized.model_dump() == python.model_dump()
+    assert python.count == 4
+    assert python.severity_histogram == [1, 1, 1, 1, 0]
+    assert python.severity_p50 == 2
+    assert python.severity_p90 == 4
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_enrolled_student_without_user_row(client, create_user, db_session: Session, engine):
+    student = create_user("withuser@example.com", "password", privacy="professors")
+    orphan_id = student.id + 1000  # enrolled and reporting, but no User row
+    db_session.add_all([
+        IllnessLog(user_id=sid, symptoms="fever", severity=3, recoveryTime=2,
+                   created_at=NOW - timedelta(days=1))
+        for sid in (student.id, orphan_id)
+    ])
+    db_session.commit()
+
+    summary = summarize_class(db_session, [student.id, orphan_id], now=NOW, engine=engine)
+    assert summary.count == 2
+    assert summary.severity_histogram == [0, 0, 2, 0, 0]
+    # counted, but listed nowhere: there is no name or email to show
+    assert [s.student_id for s in summary.students] == [student.id]
+
+
+def _page_class(db_session: Session, create_user):
+    prof = create_user("pageprof@example.com", "password", role="professor")
+    clazz = Class(name="PageClass", code="PAGE", professor_id=prof.id)
+    db_session.add(clazz)
+    db_session.commit()
+    db_session.refresh(clazz)
+
+    names = ["Dana", "Ari", "Cam", "Bo", "Eli"]
+    students = []
+    for i, name in enumerate(names):
+        user = create_user(f"page{i}@example.com", "password", privacy="professors")
+        db_user = db_session.get(User, user.id)
+        db_user.full_name = name
+        db_session.add(db_user)
+        students.append(user)
+    db_session.add_all(
+        ClassEnrollment(class_id=clazz.id, student_id=s.id) for s in students
+    )
+
+    # Dana: sick sev 2 (older report sev 5), Ari: sick sev 4,
+    # Cam: recovered (report 10 days ago), Bo and Eli: no reports
+    db_session.add_all([
+        IllnessLog(user_id=students[0].id, symptoms="old", severity=5,
+                   recoveryTime=1, created_at=NOW - timedelta(days=3)),
+        IllnessLog(user_id=students[0].id, symptoms="cough", severity=2,
+                   recoveryTime=1, created_at=NOW - timedelta(days=1)),
+        IllnessLog(user_id=students[1].id, symptoms="fever", severity=4,
+                   recoveryTime=1, created_at=NOW - timedelta(hours=2)),
+        IllnessLog(user_id=students[2].id, symptoms="rash", severity=3,
+                   recoveryTime=1, created_at=NOW - timedelta(days=10)),
+    ])
+    db_session.commit()
+    return clazz
+
+
+def test_student_page_sorting_and_paging(client, create_user, db_session: Session):
+    clazz = _page_class(db_session, create_user)
+
+    by_name = student_page(db_session, clazz.id, page=1, page_size=2, now=NOW)
+    assert by_name.total == 5
+    assert [s.full_name for s in by_name.students] == ["Ari", "Bo"]
+
+    second = student_page(db_session, clazz.id, page=2, page_size=2, now=NOW)
+    assert [s.full_name for s in second.students] == ["Cam", "Dana"]
+
+    by_severity = student_page(
+        db_session, clazz.id, sort="severity", order="desc", now=NOW
+    )
+    # latest report only, students without reports last
+    assert [s.full_name for s in by_severity.students][:3] == ["Ari", "Cam", "Dana"]
+    assert by_severity.students[2].latest_symptoms == "cough"
+
+    by_latest = student_page(db_session, clazz.id, sort="latest", order="desc", now=NOW)
+    assert [s.full_name for s in by_latest.students][:3] == ["Ari", "Dana", "Cam"]
+
+
+def test_student_page_sick_only_matches_summary(client, create_user, db_session: Session):
+    clazz = _page_class(db_session, create_user)
+
+    sick = student_page(db_session, clazz.id, sick_only=True, now=NOW)
+    assert sick.total == 2
+    assert {s.full_name for s in sick.students} == {"Ari", "Dana"}
+    assert all(s.is_sick for s in sick.students)
+
+    student_ids = [
+        e.student_id
+        for e in db_session.exec(
+            select(ClassEnrollment).where(ClassEnrollment.class_id == clazz.id)
+        ).all()
+    ]
+    full = summarize_class(db_session, student_ids, now=NOW, engine="python")
+    rows = {s.student_id: s for s in full.students}
+    everyone = student_page(db_session, clazz.id, now=NOW)
+    for s in everyone.students:
+        assert s.model_dump() == rows[s.student_id].model_dump()
+
+    headline = summarize_class(
+        db_session, student_ids, now=NOW, engine="python", include_students=False
+    )
+    assert headline.students == []
+    assert headline.count == full.count == 2
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_hidden_students_only_count_in_aggregates(
+    client, create_user, db_session: Session, engine
+):
+    clazz = _page_class(db_session, create_user)
+    dana = db_session.exec(select(User).where(User.full_name == "Dana")).one()
+    dana.notification_privacy = "friends"
+    db_session.add(dana)
+    db_session.commit()
+    student_ids = [
+        e.student_id
+        for e in db_session.exec(
+            select(ClassEnrollment).where(ClassEnrollment.class_id == clazz.id)
+        ).all()
+    ]
+
+    summary = summarize_class(db_session, student_ids, now=NOW, engine=engine)
+    assert summary.count == 2
+    assert summary.severity_histogram == [0, 1, 0, 1, 0]
+    assert dana.id not in {s.student_id for s in summary.students}
+    assert len(summary.students) == 4
+
+    page = student_page(db_session, clazz.id, sick_only=True, now=NOW)
+    assert [s.full_name for s in page.students] == ["Ari"]
+
+
+def _query_plans(session: Session, work) -> list[tuple[str, list[str]]]:
+    """
+    Run `work` and return the SQLite query plan of every statement it ran.
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        work()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    conn = session.connection()
+    return [
+        (statement, [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)])
+        for statement, params in statements
+    ]
+
+
+def test_privacy_and_ownership_predicates_stay_index_backed(
+    client, create_user, db_session: Session
+):
+    from app.summary import owns_class
+
+    clazz = _page_class(db_session, create_user)
+    student_ids = [
+        e.student_id
+        for e in db_session.exec(
+            select(ClassEnrollment).where(ClassEnrollment.class_id == clazz.id)
+        ).all()
+    ]
+
+    def work():
+        owns_class(db_session, clazz.id, clazz.professor_id)
+        summarize_class(db_session, student_ids, now=NOW, engine="python")
+        student_page(db_session, clazz.id, sick_only=True, now=NOW)
+
+    plans = _query_plans(db_session, work)
+    assert len(plans) == 5
+    for statement, plan in plans:
+        # every table is reached through an index or the rowid, never scanned
+        assert not [step for step in plan if step.startswith("SCAN")], (statement, plan)
+    class_plan = plans[0][1]
+    assert class_plan == ["SEARCH class USING INTEGER PRIMARY KEY (rowid=?)"]
+    user_plan = plans[1][1]
+    assert user_plan == ["SEARCH user USING INTEGER PRIMARY KEY (rowid=?)"]
@@ -0,0 +1,88 @@
+import time
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+
+from app import security
+from app.security import create_access_token, decode_token, set_secret_keys
+from app.token_cache import ClaimsCache, claims_cache, token_digest
+
+
+@pytest.fixture(autouse=True)
+def fresh_keys():
+    current, previous = security.SECRET_KEY, security.PREVIOUS_SECRET_KEYS
+    claims_cache.clear()
+    claims_cache.reset_stats()
+    yield
+    set_secret_keys(current, previous)
+
+
+def test_repeat_token_skips_verification(monkeypatch):
+    token = create_access_token({"sub": "7"})
+    assert decode_token(token)["sub"] == "7"
+
+    from jose import jwt
+
+    def fail(*args, **kwargs):
+        raise AssertionError("verified twice")
+
+    monkeypatch.setattr(jwt, "decode", fail)
+    assert decode_token(token)["sub"] == "7"
+    assert claims_cache.stats()["hits"] == 1
+
+
+def test_cache_respects_exp_and_bound():
+    cache = ClaimsCache(max_entries=2)
+    now = time.time()
+    cache.put(b"a", {"sub": "1", "exp": now + 60}, cache.generation)
+    cache.put(b"b", {"sub": "2", "exp": now + 60}, cache.generation)
+    assert cache.get(b"a", now=now)["sub"] == "1"
+    cache.put(b"c", {"sub": "3", "exp": now + 60}, cache.generation)
+    # b was the least recently used
+    assert cache.get(b"b", now=now) is None
+    assert cache.get(b"a", now=now + 61) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "expired": 1}
+
+    # no exp, nothing to bound the entry by
+    cache.put(b"d", {"sub": "4"}, cache.generation)
+    assert cache.get(b"d") is None
+
+
+def test_expired_and_forged_tokens_are_rejected():
+    expired = create_access_token({"sub": "7"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(JWTError):
+        decode_token(expired)
+
+    token = create_access_token({"sub": "7"})
+    forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    with pytest.raises(JWTError):
+        decode_token(forged)
+    assert claims_cache.stats()["entries"] == 0
+
+
+def test_rotation_keeps_previous_keys_and_drops_revoked_ones():
+    set_secret_keys("old-key")
+    old_token = create_access_token({"sub": "7"})
+    decode_token(old_token)
+
+    set_secret_keys("new-key", previous=["old-key"])
+    assert claims_cache.stats()["entries"] == 0
+    assert decode_token(old_token)["sub"] == "7"
+    new_token = create_access_token({"sub": "8"})
+    assert decode_token(new_token)["sub"] == "8"
+
+    # old-key revoked: its tokens fail even though they were cached
+    set_secret_keys("new-key")
+    with pytest.raises(JWTError):
+        decode_token(old_token)
+    assert decode_token(new_token)["sub"] == "8"
+
+
+def test_decode_racing_a_rotation_is_not_cached():
+    token = create_access_token({"sub": "7"})
+    digest = token_digest(token)
+    generation = claims_cache.generation
+    claims_cache.clear()
+    claims_cache.put(digest, {"sub": "7", "exp": time.time() + 60}, generation)
+    assert claims_cache.get(digest) is None
@@ -0,0 +1,72 @@
+import json
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.tracing import Tracer, chrome_trace, span, traced
+
+
+def run_request(tracer, route, work):
+    trace, token = tracer.start("GET", route)
+    try:
+        work()
+    finally:
+        trace.route = route
+        tracer.finish(trace, token)
+    return trace
+
+
+def test_spans_nest_and_are_noops_outside_a_trace():
+    @traced("outer")
+    def outer():
+        with span("inner", n=1):
+            pass
+
+    # no active trace: nothing is recorded and nothing fails
+    outer()
+
+    trace = run_request(Tracer(), "/x", outer)
+    spans = {s["name"]: s for s in trace.spans}
+    assert spans["inner"]["parent"] == spans["outer"]["id"]
+    assert spans["outer"]["parent"] is None
+    assert spans["inner"]["attrs"] == {"n": 1}
+
+
+def test_sql_statements_are_traced():
+    engine = create_engine("sqlite://")
+
+    def query():
+        with engine.connect() as conn, span("summary"):
+            conn.execute(text("SELECT 1")).all()
+
+    trace = run_request(Tracer(), "/x", query)
+    sql = [s for s in trace.spans if s["name"] == "sql.execute"]
+    assert [s["attrs"]["statement"] for s in sql] == ["SELECT 1"]
+    summary = next(s for s in trace.spans if s["name"] == "summary")
+    assert sql[0]["parent"] == summary["id"]
+
+
+def test_buffer_is_bounded_but_slowest_per_route_survive():
+    tracer = Tracer(buffer_size=3, slowest_per_route=2)
+    traces = [
+        run_request(tracer, "/a", lambda: time.sleep(seconds))
+        for seconds in (0.05, 0.04, 0, 0, 0)
+    ]
+
+    assert tracer.recent() == traces[:1:-1]
+    assert tracer.slowest()["/a"] == traces[:2]
+    # evicted from the ring buffer, still reachable as a slow outlier
+    assert tracer.get(traces[0].id) is traces[0]
+
+
+def test_chrome_export():
+    def work():
+        with span("auth.verify_password"):
+            pass
+
+    trace = run_request(Tracer(), "/x", work)
+    events = chrome_trace([trace])["traceEvents"]
+    assert [e["name"] for e in events] == ["GET /x", "auth.verify_password"]
+    assert events[1]["cat"] == "auth"
+    assert all(e["ph"] == "X" and e["ts"] >= events[0]["ts"] for e in events)
+    json.dumps(events)